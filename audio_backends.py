@@ -0,0 +1,559 @@
+"""
+Audio Backends - Astrazione dei dispositivi audio usati dal ProMixer
+Contiene il backend reale (sounddevice/PortAudio) e dei dispositivi sostitutivi
+locali per far girare l'engine senza hardware audio (CI, Linux headless, test):
+
+- WavFileInputDevice: input che legge da un file WAV
+- WavSinkOutputDevice: output che scrive su un file WAV
+- NullDevice: input silenzioso / output che scarta l'audio
+- LoopbackDevice: ciò che viene suonato sull'output torna sull'input (come VB-Cable)
+
+Ogni dispositivo sostitutivo gira nel proprio thread di callback al block size
+configurato, con la stessa firma di callback di sounddevice.
+"""
+import threading
+import time
+from collections import deque, namedtuple
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import sounddevice as sd
+    SOUNDDEVICE_AVAILABLE = True
+except (ImportError, OSError):
+    # OSError: libreria PortAudio non trovata (es. Linux headless)
+    sd = None
+    SOUNDDEVICE_AVAILABLE = False
+
+
+@dataclass
+class AudioDevice:
+    """Rappresenta un dispositivo audio"""
+    id: int
+    name: str
+    input_channels: int
+    output_channels: int
+    sample_rate: float
+    is_default_input: bool = False
+    is_default_output: bool = False
+
+
+# Stessa struttura di time_info passato da sounddevice alle callback
+StreamTime = namedtuple('StreamTime', ['currentTime', 'inputBufferAdcTime', 'outputBufferDacTime'])
+
+
+class CallbackFlags:
+    """Equivalente minimale di sd.CallbackFlags per i dispositivi sostitutivi"""
+
+    def __init__(self, input_underflow=False, input_overflow=False,
+                 output_underflow=False, output_overflow=False):
+        self.input_underflow = input_underflow
+        self.input_overflow = input_overflow
+        self.output_underflow = output_underflow
+        self.output_overflow = output_overflow
+
+    def __bool__(self):
+        return (self.input_underflow or self.input_overflow or
+                self.output_underflow or self.output_overflow)
+
+    def __repr__(self):
+        active = [name for name in ('input_underflow', 'input_overflow',
+                                    'output_underflow', 'output_overflow')
+                  if getattr(self, name)]
+        return ', '.join(active) if active else 'ok'
+
+
+class AudioBackend:
+    """Interfaccia comune dei backend audio"""
+
+    name = "base"
+
+    def query_devices(self) -> List[AudioDevice]:
+        """Ritorna la lista dei dispositivi utilizzabili dal mixer"""
+        raise NotImplementedError
+
+    def device_info(self, device_id: int) -> dict:
+        """Ritorna info dispositivo (stesse chiavi di sd.query_devices(id))"""
+        raise NotImplementedError
+
+    def open_input_stream(self, device: int, samplerate: int, blocksize: int, channels: int,
+                          callback: Callable, dtype: str = 'float32'):
+        """Crea (senza avviarlo) uno stream di input"""
+        raise NotImplementedError
+
+    def open_output_stream(self, device: int, samplerate: int, blocksize: int, channels: int,
+                           callback: Callable, dtype: str = 'float32'):
+        """Crea (senza avviarlo) uno stream di output"""
+        raise NotImplementedError
+
+    def open_duplex_stream(self, device: int, samplerate: int, blocksize: int, channels: tuple,
+                           callback: Callable, dtype: str = 'float32'):
+        """Crea (senza avviarlo) uno stream input+output sullo stesso dispositivo
+
+        Args:
+            channels: (canali di input, canali di output)
+            callback: callback(indata, outdata, frames, time, status) come sd.Stream
+        """
+        raise NotImplementedError
+
+
+class SoundDeviceBackend(AudioBackend):
+    """Backend reale basato su sounddevice (PortAudio)"""
+
+    name = "sounddevice"
+
+    def __init__(self, preferred_hostapi: str = 'WASAPI'):
+        if sd is None:
+            raise RuntimeError("sounddevice/PortAudio non disponibile")
+        self.preferred_hostapi = preferred_hostapi
+
+    def query_devices(self) -> List[AudioDevice]:
+        """Dispositivi dell'host API preferita (WASAPI su Windows per evitare duplicati MME/DirectSound)
+
+        Se l'host API preferita non esiste (Linux, macOS) usa quella di default del sistema.
+        """
+        devices = []
+        default_in, default_out = sd.default.device
+
+        all_devices = sd.query_devices()
+        host_apis = sd.query_hostapis()
+
+        preferred = [i for i, api in enumerate(host_apis) if self.preferred_hostapi in api['name']]
+        if not preferred:
+            try:
+                preferred = [sd.default.hostapi]
+            except Exception:
+                preferred = list(range(len(host_apis)))
+
+        for i, dev in enumerate(all_devices):
+            if dev['hostapi'] not in preferred:
+                continue
+            devices.append(AudioDevice(
+                id=i,
+                name=dev['name'],
+                input_channels=dev['max_input_channels'],
+                output_channels=dev['max_output_channels'],
+                sample_rate=dev['default_samplerate'],
+                is_default_input=(i == default_in),
+                is_default_output=(i == default_out)
+            ))
+
+        return devices
+
+    def device_info(self, device_id: int) -> dict:
+        return sd.query_devices(device_id)
+
+    def open_input_stream(self, device, samplerate, blocksize, channels, callback, dtype='float32'):
+        return sd.InputStream(
+            samplerate=samplerate,
+            blocksize=blocksize,
+            device=device,
+            channels=channels,
+            dtype=dtype,
+            callback=callback,
+            dither_off=True  # Disabilita dithering per ridurre rumore
+        )
+
+    def open_output_stream(self, device, samplerate, blocksize, channels, callback, dtype='float32'):
+        return sd.OutputStream(
+            samplerate=samplerate,
+            blocksize=blocksize,
+            device=device,
+            channels=channels,
+            dtype=dtype,
+            callback=callback,
+            dither_off=True
+        )
+
+    def open_duplex_stream(self, device, samplerate, blocksize, channels, callback, dtype='float32'):
+        # Input sempre float32 (come gli InputStream), output nel dtype del bus
+        return sd.Stream(
+            samplerate=samplerate,
+            blocksize=blocksize,
+            device=(device, device),
+            channels=channels,
+            dtype=('float32', dtype),
+            callback=callback,
+            dither_off=True
+        )
+
+
+# ========== DISPOSITIVI SOSTITUTIVI ==========
+
+class StandInDevice:
+    """Dispositivo audio locale (nessun hardware)"""
+
+    kind = "standin"
+
+    def __init__(self, name: str, input_channels: int = 0, output_channels: int = 0,
+                 sample_rate: int = 48000):
+        self.name = name
+        self.input_channels = input_channels
+        self.output_channels = output_channels
+        self.sample_rate = sample_rate
+
+    def read(self, frames: int, channels: int, samplerate: int) -> np.ndarray:
+        """Produce un blocco di input (float32, shape frames x channels)"""
+        return np.zeros((frames, channels), dtype=np.float32)
+
+    def write(self, block: np.ndarray, samplerate: int):
+        """Consuma un blocco di output"""
+        pass
+
+    def open(self, samplerate: int, channels: int, is_output: bool):
+        """Chiamato all'avvio di uno stream sul dispositivo"""
+        pass
+
+    def close(self, is_output: bool):
+        """Chiamato alla chiusura di uno stream sul dispositivo"""
+        pass
+
+
+class NullDevice(StandInDevice):
+    """Input silenzioso e output che scarta tutto"""
+
+    kind = "null"
+
+    def __init__(self, name: str = "Null Device", channels: int = 2, sample_rate: int = 48000):
+        super().__init__(name, channels, channels, sample_rate)
+
+
+class WavFileInputDevice(StandInDevice):
+    """Input che riproduce un file audio (come se fosse un microfono)"""
+
+    kind = "wav_input"
+
+    def __init__(self, file_path: str, name: Optional[str] = None, loop: bool = True):
+        import soundfile as sf
+        info = sf.info(file_path)
+        super().__init__(name or f"WAV In: {file_path}", min(info.channels, 2), 0, int(info.samplerate))
+        self.file_path = file_path
+        self.loop = loop
+        self._audio = None
+        self._position = 0
+
+    def open(self, samplerate, channels, is_output):
+        import soundfile as sf
+        audio, sr = sf.read(self.file_path, dtype='float32', always_2d=True)
+
+        if int(sr) != samplerate:
+            from scipy.signal import resample_poly
+            from math import gcd
+            g = gcd(samplerate, int(sr))
+            audio = resample_poly(audio, samplerate // g, int(sr) // g, axis=0).astype(np.float32)
+
+        # Adatta il numero di canali a quelli richiesti dallo stream
+        if audio.shape[1] < channels:
+            audio = np.repeat(audio[:, :1], channels, axis=1)
+        self._audio = np.ascontiguousarray(audio[:, :channels], dtype=np.float32)
+        self._position = 0
+
+    def read(self, frames, channels, samplerate):
+        block = np.zeros((frames, channels), dtype=np.float32)
+        if self._audio is None or len(self._audio) == 0:
+            return block
+
+        filled = 0
+        while filled < frames:
+            chunk = self._audio[self._position:self._position + frames - filled]
+            block[filled:filled + len(chunk)] = chunk
+            filled += len(chunk)
+            self._position += len(chunk)
+            if self._position >= len(self._audio):
+                if not self.loop:
+                    break
+                self._position = 0
+        return block
+
+
+class WavSinkOutputDevice(StandInDevice):
+    """Output che scrive tutto ciò che riceve su un file WAV"""
+
+    kind = "wav_sink"
+
+    def __init__(self, file_path: str, name: Optional[str] = None, channels: int = 2,
+                 sample_rate: int = 48000, subtype: str = 'FLOAT'):
+        super().__init__(name or f"WAV Out: {file_path}", 0, channels, sample_rate)
+        self.file_path = file_path
+        self.subtype = subtype
+        self.frames_written = 0
+        self._file = None
+        self._open_count = 0
+        self._lock = threading.Lock()
+
+    def open(self, samplerate, channels, is_output):
+        # Più stream sullo stesso device (es. hot-swap) scrivono sullo stesso file
+        with self._lock:
+            if self._file is None:
+                import soundfile as sf
+                self._file = sf.SoundFile(self.file_path, 'w', samplerate=samplerate,
+                                          channels=channels, subtype=self.subtype)
+                self.frames_written = 0
+            self._open_count += 1
+
+    def write(self, block, samplerate):
+        with self._lock:
+            if self._file is not None:
+                if block.dtype.kind == 'i':
+                    block = block.astype(np.float32) / np.iinfo(block.dtype).max
+                self._file.write(block[:, :self._file.channels])
+                self.frames_written += len(block)
+
+    def close(self, is_output):
+        with self._lock:
+            self._open_count = max(0, self._open_count - 1)
+            if self._file is not None and self._open_count == 0:
+                self._file.close()
+                self._file = None
+
+
+class LoopbackDevice(StandInDevice):
+    """Cavo virtuale in-process: l'audio scritto sull'output torna sull'input"""
+
+    kind = "loopback"
+
+    def __init__(self, name: str = "Loopback Cable", channels: int = 2, sample_rate: int = 48000,
+                 max_blocks: int = 32):
+        super().__init__(name, channels, channels, sample_rate)
+        self._blocks = deque(maxlen=max_blocks)
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def write(self, block, samplerate):
+        with self._lock:
+            self._blocks.append(np.array(block, dtype=np.float32))
+
+    def read(self, frames, channels, samplerate):
+        out = np.zeros((frames, channels), dtype=np.float32)
+        filled = 0
+        with self._lock:
+            while filled < frames:
+                if self._pending is None:
+                    if not self._blocks:
+                        break
+                    self._pending = self._blocks.popleft()
+                take = min(frames - filled, len(self._pending))
+                cols = min(channels, self._pending.shape[1])
+                out[filled:filled + take, :cols] = self._pending[:take, :cols]
+                filled += take
+                self._pending = self._pending[take:] if take < len(self._pending) else None
+        return out
+
+
+class StandInStream:
+    """Stream con thread di callback proprio (stessa interfaccia di sd.InputStream/OutputStream)"""
+
+    # Block size usato quando viene richiesto blocksize=0 (ottimale del driver)
+    DEFAULT_BLOCKSIZE = 256
+
+    def __init__(self, device: StandInDevice, samplerate: int, blocksize: int, channels: int,
+                 callback: Callable, dtype: str = 'float32', is_output: bool = True,
+                 realtime: bool = True):
+        self.device = device
+        self.samplerate = samplerate
+        self.blocksize = blocksize or self.DEFAULT_BLOCKSIZE
+        self.channels = channels
+        self.dtype = dtype
+        self.callback = callback
+        self.is_output = is_output
+        self.realtime = realtime  # False = il più veloce possibile (profiling)
+        self.latency = self.blocksize / samplerate
+
+        self.callback_count = 0
+        self.xrun_count = 0
+
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._opened = False
+        self._closed = False
+
+    @property
+    def active(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def stopped(self) -> bool:
+        return not self.active
+
+    def start(self):
+        if self._closed:
+            raise RuntimeError("Stream chiuso")
+        if self.active:
+            return
+        if not self._opened:
+            self.device.open(self.samplerate, self.channels, self.is_output)
+            self._opened = True
+        self._stop_event.clear()
+        kind = "out" if self.is_output else "in"
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name=f"standin-{self.device.kind}-{kind}")
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+    def close(self):
+        self.stop()
+        if self._opened:
+            self.device.close(self.is_output)
+            self._opened = False
+        self._closed = True
+
+    def _process_block(self, stream_time, status):
+        """Un blocco: chiama la callback e scambia i dati con il dispositivo"""
+        if self.is_output:
+            outdata = np.zeros((self.blocksize, self.channels), dtype=self.dtype)
+            self.callback(outdata, self.blocksize, stream_time, status)
+            self.device.write(outdata, self.samplerate)
+        else:
+            indata = self.device.read(self.blocksize, self.channels, self.samplerate)
+            if self.dtype != 'float32':
+                indata = (indata * np.iinfo(self.dtype).max).astype(self.dtype)
+            self.callback(indata, self.blocksize, stream_time, status)
+
+    def _run(self):
+        period = self.blocksize / self.samplerate
+        start_time = time.perf_counter()
+        next_deadline = start_time
+        pending_xrun = False
+
+        while not self._stop_event.is_set():
+            now = time.perf_counter()
+            status = CallbackFlags()
+            if pending_xrun:
+                if self.is_output:
+                    status.output_underflow = True
+                else:
+                    status.input_overflow = True
+                pending_xrun = False
+
+            stream_time = StreamTime(now - start_time, now - start_time,
+                                     next_deadline - start_time + self.latency)
+
+            try:
+                self._process_block(stream_time, status)
+            except Exception as e:
+                print(f"❌ Errore callback stream {self.device.name}: {e}")
+                break
+
+            self.callback_count += 1
+
+            if not self.realtime:
+                continue
+
+            # Ritmo in tempo reale: attendi la prossima scadenza del blocco
+            next_deadline += period
+            delay = next_deadline - time.perf_counter()
+            if delay > 0:
+                self._stop_event.wait(delay)
+            else:
+                # Callback oltre la scadenza: segnala xrun alla prossima chiamata
+                self.xrun_count += 1
+                pending_xrun = True
+                if -delay > period:
+                    # Troppo indietro: riallinea l'orologio invece di recuperare a raffica
+                    next_deadline = time.perf_counter()
+
+
+class StandInDuplexStream(StandInStream):
+    """Stream input+output sullo stesso dispositivo: una callback per blocco (come sd.Stream)"""
+
+    def __init__(self, device: StandInDevice, samplerate: int, blocksize: int, channels: tuple,
+                 callback: Callable, dtype: str = 'float32', realtime: bool = True):
+        self.input_channels, self.output_channels = channels
+        super().__init__(device, samplerate, blocksize, self.output_channels, callback,
+                         dtype=dtype, is_output=True, realtime=realtime)
+
+    def start(self):
+        if not self._opened and not self._closed:
+            self.device.open(self.samplerate, self.input_channels, False)
+        super().start()
+
+    def close(self):
+        was_opened = self._opened
+        super().close()
+        if was_opened:
+            self.device.close(False)
+
+    def _process_block(self, stream_time, status):
+        indata = self.device.read(self.blocksize, self.input_channels, self.samplerate)
+        outdata = np.zeros((self.blocksize, self.output_channels), dtype=self.dtype)
+        self.callback(indata, outdata, self.blocksize, stream_time, status)
+        self.device.write(outdata, self.samplerate)
+
+
+class StandInBackend(AudioBackend):
+    """Backend senza hardware: dispositivi locali registrati a runtime"""
+
+    name = "standin"
+
+    def __init__(self, realtime: bool = True):
+        self.realtime = realtime
+        self.devices: Dict[int, StandInDevice] = {}
+        self._next_id = 0
+
+    def add_device(self, device: StandInDevice) -> int:
+        """Registra un dispositivo e ritorna il suo device_id"""
+        device_id = self._next_id
+        self.devices[device_id] = device
+        self._next_id += 1
+        return device_id
+
+    def query_devices(self) -> List[AudioDevice]:
+        devices = []
+        first_in = next((i for i, d in self.devices.items() if d.input_channels > 0), None)
+        first_out = next((i for i, d in self.devices.items() if d.output_channels > 0), None)
+        for device_id, dev in self.devices.items():
+            devices.append(AudioDevice(
+                id=device_id,
+                name=dev.name,
+                input_channels=dev.input_channels,
+                output_channels=dev.output_channels,
+                sample_rate=float(dev.sample_rate),
+                is_default_input=(device_id == first_in),
+                is_default_output=(device_id == first_out)
+            ))
+        return devices
+
+    def device_info(self, device_id: int) -> dict:
+        if device_id not in self.devices:
+            raise ValueError(f"Dispositivo {device_id} non esiste")
+        dev = self.devices[device_id]
+        return {
+            'name': dev.name,
+            'max_input_channels': dev.input_channels,
+            'max_output_channels': dev.output_channels,
+            'default_samplerate': float(dev.sample_rate),
+            'hostapi': 0,
+        }
+
+    def open_input_stream(self, device, samplerate, blocksize, channels, callback, dtype='float32'):
+        return StandInStream(self.devices[device], samplerate, blocksize, channels, callback,
+                             dtype=dtype, is_output=False, realtime=self.realtime)
+
+    def open_output_stream(self, device, samplerate, blocksize, channels, callback, dtype='float32'):
+        return StandInStream(self.devices[device], samplerate, blocksize, channels, callback,
+                             dtype=dtype, is_output=True, realtime=self.realtime)
+
+    def open_duplex_stream(self, device, samplerate, blocksize, channels, callback, dtype='float32'):
+        dev = self.devices[device]
+        if dev.input_channels == 0 or dev.output_channels == 0:
+            raise ValueError(f"Dispositivo {device} non è full-duplex")
+        return StandInDuplexStream(dev, samplerate, blocksize, channels, callback,
+                                   dtype=dtype, realtime=self.realtime)
+
+
+def get_default_backend() -> AudioBackend:
+    """Backend sounddevice se PortAudio è disponibile, altrimenti un backend con un NullDevice"""
+    if SOUNDDEVICE_AVAILABLE:
+        return SoundDeviceBackend()
+
+    print("⚠️ sounddevice/PortAudio non disponibile: uso dispositivi sostitutivi (Null Device)")
+    backend = StandInBackend()
+    backend.add_device(NullDevice())
+    return backend
@@ -1,14 +1,16 @@
 """
 Audio Engine - Gestisce il processamento audio in tempo reale
 """
-import sounddevice as sd
 import soundfile as sf
 import numpy as np
 from scipy import signal
 import threading
 import queue
+import time
 from typing import Dict, List, Optional
 
+from disk_recorder import StreamingRecorder
+
 
 class AudioClip:
     """Rappresenta una clip audio con controlli"""
@@ -48,6 +50,26 @@ class AudioClip:
             self.sample_rate = target_sample_rate
             print(f" ✓")
         
+        self._init_playback_state()
+    
+    @classmethod
+    def from_array(cls, samples: np.ndarray, name: str, sample_rate: int, file_path: str = None) -> 'AudioClip':
+        """Crea una clip da campioni già in memoria (nessuna lettura/decodifica di file)"""
+        clip = cls.__new__(cls)
+        clip.name = name
+        clip.file_path = file_path
+        
+        samples = np.asarray(samples, dtype=np.float32)
+        if samples.ndim == 1:
+            samples = np.column_stack([samples, samples])
+        clip.samples = np.ascontiguousarray(samples[:, :2])
+        clip.sample_rate = sample_rate
+        
+        clip._init_playback_state()
+        return clip
+    
+    def _init_playback_state(self):
+        """Stato di riproduzione comune a tutti i costruttori"""
         self.volume = 1.0
         self.is_playing = False
         self.is_looping = False
@@ -57,6 +79,18 @@ class AudioClip:
         self.hotkey = None
         self.lock = threading.Lock()  # Lock per thread-safety con dual output
     
+    def prewarm(self, head_frames: int) -> int:
+        """Tocca l'inizio della clip (page fault e cache prima del primo trigger)
+        
+        Returns:
+            Numero di frame toccati
+        """
+        head = self.samples[:head_frames]
+        if len(head):
+            # Stesse operazioni di get_samples sul primo blocco, senza cambiare lo stato
+            np.abs(head * self.volume).max()
+        return len(head)
+    
     def play(self):
         """Avvia la riproduzione"""
         self.is_playing = True
@@ -151,7 +185,10 @@ class AudioMixer:
         self.master_volume = 1.0  # Volume massimo (100%)
         self.secondary_volume = 1.0  # Volume separato per bus secondari (A2+)
         self.is_recording = False
-        self.recorded_frames = []
+        self.recorder: Optional[StreamingRecorder] = None  # Registrazione in streaming su disco
+        
+        # Blocchi generati senza nessuna clip in riproduzione (fast path del silenzio)
+        self.skipped_blocks = 0
         
         # Effetti
         self.reverb_enabled = False
@@ -167,6 +204,27 @@ class AudioMixer:
         if name in self.clips:
             del self.clips[name]
     
+    def prewarm_clips(self, clip_names=None, head_seconds: float = 0.5) -> int:
+        """Scalda l'inizio delle clip (tipicamente quelle con hotkey) prima degli stream
+        
+        Args:
+            clip_names: Clip da scaldare (None = tutte)
+            head_seconds: Secondi iniziali da toccare per ogni clip
+        
+        Returns:
+            Numero di clip scaldate
+        """
+        names = list(self.clips) if clip_names is None else [n for n in clip_names if n in self.clips]
+        for name in names:
+            clip = self.clips[name]
+            clip.prewarm(int(head_seconds * clip.sample_rate))
+        # Primo mix a vuoto: scalda il percorso di get_audio (solo se nessuna clip suona)
+        if not any(clip.is_playing for clip in self.clips.values()):
+            self._generate_mix(self.buffer_size, stream_id='prewarm')
+        if names:
+            print(f"🔥 Pre-warm clip: {len(names)} clip con hotkey pronte")
+        return len(names)
+    
     # === CALLBACK RIMOSSI ===
     # AudioMixer funziona SOLO in modalità ProMixer integrato
     # Il ProMixer chiama direttamente get_audio() - nessun callback necessario
@@ -184,10 +242,18 @@ class AudioMixer:
         """Genera il mix audio (usato sia per device che per virtual output)"""
         mix = np.zeros((frames, 2), dtype=np.float32)
         
-        for clip in self.clips.values():
-            if clip.is_playing:
-                clip_samples = clip.get_samples(frames, stream_id=stream_id)
-                mix += clip_samples
+        playing = [clip for clip in self.clips.values() if clip.is_playing]
+        if not playing:
+            # Nessuna clip: effetti e limiter lavorano solo su blocchi intra-blocco,
+            # quindi non c'è coda da completare e il mix è silenzio
+            self.skipped_blocks += 1
+            if stream_id in ('primary', 'A1') and self.is_recording:
+                self.recorder.push('mix', mix)
+            return mix
+        
+        for clip in playing:
+            clip_samples = clip.get_samples(frames, stream_id=stream_id)
+            mix += clip_samples
         
         # Applica effetti
         if self.reverb_enabled:
@@ -208,7 +274,7 @@ class AudioMixer:
         
         # Registrazione (solo dal primario/A1)
         if stream_id in ('primary', 'A1') and self.is_recording:
-            self.recorded_frames.append(mix.copy())
+            self.recorder.push('mix', mix)
         
         return mix
     
@@ -232,27 +298,29 @@ class AudioMixer:
         # Il ProMixer gestisce i suoi stream
         pass
     
-    def start_recording(self):
-        """Avvia la registrazione"""
+    def start_recording(self, output_path: Optional[str] = None, subtype: str = 'PCM_16') -> str:
+        """Avvia la registrazione del mix (primario/A1) in streaming su disco
+        
+        Args:
+            output_path: File .wav/.flac (default output_<timestamp>.wav)
+            subtype: 'PCM_16', 'PCM_24' o 'FLOAT' (solo WAV)
+        """
+        if self.is_recording:
+            self.stop_recording()
+        recorder = StreamingRecorder(self.sample_rate)
+        track = recorder.add_track('mix', output_path or f"output_{int(time.time())}.wav", subtype)
+        recorder.start()
+        self.recorder = recorder
         self.is_recording = True
-        self.recorded_frames = []
+        return track.path
     
-    def stop_recording(self, output_path: str = "output.wav"):
-        """Ferma la registrazione e salva il file"""
-        self.is_recording = False
+    def stop_recording(self, output_path: Optional[str] = None) -> Optional[str]:
+        """Ferma subito la registrazione (il file viene chiuso in background)
         
-        if self.recorded_frames:
-            # Concatena tutti i frame
-            recording = np.vstack(self.recorded_frames)
-            
-            # Converti in int16
-            recording = (recording * 32767).astype(np.int16)
-            
-            # Salva usando scipy
-            from scipy.io import wavfile
-            wavfile.write(output_path, self.sample_rate, recording)
-            
-            self.recorded_frames = []
-            return output_path
-        
-        return None
+        Args:
+            output_path: Nuovo nome del file, applicato dopo la chiusura
+        """
+        if not self.is_recording or self.recorder is None:
+            return None
+        self.is_recording = False
+        return self.recorder.stop({'mix': output_path} if output_path else None)[0]
@@ -0,0 +1,102 @@
+"""
+Audio FIFO - Ring buffer di campioni tra le callback dei dispositivi e l'engine
+Le callback scrivono/leggono blocchi della dimensione decisa dal driver, l'engine
+lavora sempre a quanti fissi: la FIFO adatta le due cadenze senza perdere campioni
+(a parte l'overflow, dove viene scartato l'audio più vecchio).
+"""
+import threading
+from typing import Optional
+
+import numpy as np
+
+
+class AudioFifo:
+    """Ring buffer preallocato di frame audio (float32, n canali)"""
+
+    def __init__(self, capacity: int, channels: int = 2):
+        self.capacity = int(capacity)
+        self.channels = channels
+        self._buffer = np.zeros((self.capacity, channels), dtype=np.float32)
+        self._read_pos = 0
+        self._available = 0
+        self._lock = threading.Lock()
+
+        # Statistiche
+        self.overflows = 0  # Frame scartati perché la FIFO era piena
+        self.underruns = 0  # Letture con meno frame del richiesto
+        self.max_block = 0  # Blocco più grande scritto finora (cadenza del produttore)
+
+    @property
+    def available(self) -> int:
+        return self._available
+
+    def write(self, block: np.ndarray) -> int:
+        """Accoda un blocco; se non c'è spazio scarta i frame più vecchi
+
+        Returns:
+            Numero di frame scartati
+        """
+        n = len(block)
+        if n == 0:
+            return 0
+        self.max_block = max(self.max_block, n)
+        if block.ndim == 1:
+            block = block[:, None]
+        if n > self.capacity:
+            # Blocco più grande dell'intera FIFO: tieni solo la coda
+            block = block[-self.capacity:]
+            dropped = n - self.capacity
+            n = self.capacity
+        else:
+            dropped = 0
+
+        with self._lock:
+            overflow = self._available + n - self.capacity
+            if overflow > 0:
+                self._read_pos = (self._read_pos + overflow) % self.capacity
+                self._available -= overflow
+                dropped += overflow
+            write_pos = (self._read_pos + self._available) % self.capacity
+            first = min(n, self.capacity - write_pos)
+            self._buffer[write_pos:write_pos + first] = block[:first, :self.channels]
+            if first < n:
+                self._buffer[:n - first] = block[first:, :self.channels]
+            self._available += n
+
+        self.overflows += dropped
+        return dropped
+
+    def read(self, frames: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Estrae `frames` frame; se non bastano completa con silenzio"""
+        if out is None:
+            out = np.empty((frames, self.channels), dtype=np.float32)
+        with self._lock:
+            n = min(frames, self._available)
+            first = min(n, self.capacity - self._read_pos)
+            out[:first] = self._buffer[self._read_pos:self._read_pos + first]
+            if first < n:
+                out[first:n] = self._buffer[:n - first]
+            self._read_pos = (self._read_pos + n) % self.capacity
+            self._available -= n
+        if n < frames:
+            out[n:] = 0.0
+            self.underruns += 1
+        return out
+
+    def discard(self, frames: int) -> int:
+        """Scarta i `frames` frame più vecchi (per limitare la latenza)"""
+        with self._lock:
+            n = min(frames, self._available)
+            self._read_pos = (self._read_pos + n) % self.capacity
+            self._available -= n
+        return n
+
+    def trim(self, max_frames: int) -> int:
+        """Se in coda ci sono più di `max_frames` frame, scarta i più vecchi"""
+        excess = self._available - max_frames
+        return self.discard(excess) if excess > 0 else 0
+
+    def clear(self):
+        with self._lock:
+            self._read_pos = 0
+            self._available = 0
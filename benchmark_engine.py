@@ -0,0 +1,638 @@
+"""
+Benchmark Engine - Misura le prestazioni di audio_engine e mixer_engine
+Esegue scenari realistici senza dispositivi audio (stesso codice delle callback)
+e riporta tempo per ciclo, real-time factor, margine rispetto alla deadline e
+allocazioni di memoria. I risultati possono essere salvati come baseline e
+confrontati con una soglia per individuare regressioni di prestazioni.
+
+Uso da riga di comando:
+    python benchmark_engine.py                      # Tutte le suite
+    python benchmark_engine.py --suite clips --quick
+    python benchmark_engine.py --save-baseline      # Salva i risultati come baseline
+    python benchmark_engine.py --threshold 0.25     # Fallisce se >25% più lento della baseline
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+import soundfile as sf
+
+from audio_backends import NullDevice, StandInBackend
+from audio_engine import AudioClip, AudioMixer
+from mixer_engine import ProMixer
+from realtime_audio import GcScheduler
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+
+@dataclass
+class Scenario:
+    """Configurazione di uno scenario di benchmark del ciclo audio"""
+    name: str
+    clips: int = 0  # Clip della soundboard in riproduzione contemporanea
+    fx_channels: int = 0  # Canali hardware con gate + EQ + compressore attivi
+    channels: int = 0  # Canali hardware aggiunti senza effetti (solo fader/pan)
+    buses: int = 2  # Bus renderizzati per ciclo (A1, A2, A3, B1, B2, poi bus aggiunti)
+    block_size: int = 256
+    sample_rate: int = 48000
+    extra: Dict = field(default_factory=dict)
+
+
+def build_mixer(scenario: Scenario):
+    """Costruisce ProMixer + soundboard per uno scenario (nessun dispositivo)
+
+    Returns:
+        (pro_mixer, soundboard, bus_names, feed) dove feed() inietta un blocco
+        di input nei canali hardware come farebbe la callback di input
+    """
+    sr = scenario.sample_rate
+    pro_mixer = ProMixer(sample_rate=sr, buffer_size=scenario.block_size, backend=StandInBackend())
+    soundboard = AudioMixer(sample_rate=sr, buffer_size=scenario.block_size)
+    pro_mixer.channels['SOUNDBOARD'].audio_source = soundboard
+
+    # Bus oltre ai 5 predefiniti e canali oltre HW1/HW2 creati come farebbe l'utente
+    # (log di creazione silenziati: con decine di strip coprirebbero i risultati)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(len(pro_mixer.buses), scenario.buses):
+            pro_mixer.add_bus(f"BUS{i + 1}")
+        for i in range(2, scenario.fx_channels):
+            pro_mixer.add_channel(f"BENCH{i + 1}", channel_type="hardware")
+        plain_ids = [f"STRIP{i + 1}" for i in range(scenario.channels)]
+        for ch_id in plain_ids:
+            pro_mixer.add_channel(ch_id, channel_type="hardware")
+
+    bus_names = list(pro_mixer.buses.keys())[:scenario.buses]
+    rng = np.random.default_rng(1234)
+
+    # Clip sintetiche lunghe 10s in loop (nessuna lettura da disco)
+    for i in range(scenario.clips):
+        t = np.arange(sr * 10) / sr
+        tone = 0.05 * np.sin(2 * np.pi * (110 + 37 * i) * t).astype(np.float32)
+        clip = AudioClip.from_array(tone, f"clip_{i}", sr)
+        clip.is_looping = True
+        soundboard.add_clip(clip)
+        clip.play()
+
+    # Canali hardware con processing completo
+    fx_ids = []
+    for i in range(scenario.fx_channels):
+        ch_id = f"HW{i + 1}" if i < 2 else f"BENCH{i + 1}"
+        proc = pro_mixer.channels[ch_id].processor
+        proc.gate_enabled = True
+        proc.comp_enabled = True
+        proc.eq_low, proc.eq_mid, proc.eq_high = 3.0, -2.0, 4.0
+        fx_ids.append(ch_id)
+
+    for ch_id in ['SOUNDBOARD'] + fx_ids + plain_ids:
+        for bus_name in bus_names:
+            pro_mixer.channels[ch_id].routing[bus_name] = True
+
+    noise = (rng.standard_normal((scenario.block_size, 2)) * 0.1).astype(np.float32)
+    if scenario.extra.get('silent_input'):
+        # Microfono aperto ma muto (blocchi di zeri dal driver)
+        noise[:] = 0.0
+
+    def feed():
+        for ch_id in fx_ids + plain_ids:
+            pro_mixer.channels[ch_id].jitter_buffer.write(noise)
+
+    return pro_mixer, soundboard, bus_names, feed
+
+
+def summarize(name: str, times: List[float], frames: int, sample_rate: int, extra: Optional[dict] = None) -> dict:
+    """Calcola le statistiche di un benchmark del ciclo audio"""
+    times_ms = np.array(times) * 1000.0
+    deadline_ms = frames / sample_rate * 1000.0
+    mean_ms = float(times_ms.mean())
+    p99_ms = float(np.percentile(times_ms, 99))
+    result = {
+        'name': name,
+        'mean_ms': mean_ms,
+        'p50_ms': float(np.percentile(times_ms, 50)),
+        'p99_ms': p99_ms,
+        'max_ms': float(times_ms.max()),
+        'deadline_ms': deadline_ms,
+        'realtime_factor': deadline_ms / mean_ms if mean_ms > 0 else float('inf'),
+        'headroom_pct': (1.0 - p99_ms / deadline_ms) * 100.0,
+    }
+    if extra:
+        result.update(extra)
+    return result
+
+
+def device_block(pro_mixer: ProMixer, bus_names: List[str], frames: int, sample_rate: int):
+    """Un blocco del driver su tutti i bus, come lo chiedono i dispositivi di output
+
+    Ogni bus riceve uno stream (su un NullDevice, mai avviato) e la sua callback di
+    output viene chiamata a mano: legge `frames` frame dalla FIFO del bus e l'engine
+    esegue i cicli a quanto fisso che servono (nessuno, uno o più di uno per blocco).
+
+    Returns:
+        block() che esegue le callback di tutti i bus per un blocco
+    """
+    device_id = pro_mixer.backend.add_device(NullDevice(sample_rate=sample_rate))
+    # Stesso lavoro per tutti i blocchi: niente degradazione degli effetti
+    pro_mixer.set_governor_enabled(False)
+    callbacks = []
+    for name in bus_names:
+        bus = pro_mixer.buses[name]
+        bus.stream = pro_mixer.backend.open_output_stream(device_id, sample_rate, frames, 2,
+                                                          lambda *args: None)
+        bus.sample_rate = sample_rate
+        callbacks.append(pro_mixer.audio_output_callback(name, sample_rate))
+    outdata = np.zeros((frames, 2), dtype=np.float32)
+
+    def block():
+        for callback in callbacks:
+            callback(outdata, frames, None, None)
+
+    return block
+
+
+def run_cycle_benchmark(scenario: Scenario, cycles: int = 200, warmup: int = 20) -> dict:
+    """Misura il tempo per blocco del driver (callback di tutti i bus) e le allocazioni"""
+    pro_mixer, _, bus_names, feed = build_mixer(scenario)
+    frames = scenario.block_size
+    block = device_block(pro_mixer, bus_names, frames, scenario.sample_rate)
+
+    def cycle():
+        feed()
+        block()
+
+    for i in range(warmup):
+        cycle()
+
+    # 1) Tempi (senza tracemalloc, che rallenta tutto)
+    times = []
+    gc.collect()
+    for i in range(cycles):
+        t0 = time.perf_counter()
+        cycle()
+        times.append(time.perf_counter() - t0)
+
+    # 2) Allocazioni: picco di memoria allocata per ciclo
+    alloc_cycles = max(10, cycles // 10)
+    tracemalloc.start()
+    peaks = []
+    for i in range(alloc_cycles):
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        cycle()
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - base)
+    tracemalloc.stop()
+
+    blocks = warmup + cycles + alloc_cycles
+    extra = {
+        'alloc_peak_kb': float(np.mean(peaks) / 1024.0),
+        'buses': len(bus_names),
+        'quanta_per_block': pro_mixer.audio_cycle_counter / blocks,
+    }
+    if scenario.extra.get('report_silence'):
+        stats = pro_mixer.get_silence_stats()
+        processed = sum(v.get('processed', 0) for k, v in stats.items() if k in pro_mixer.channels)
+        skipped = sum(v.get('skipped', 0) for k, v in stats.items() if k in pro_mixer.channels)
+        bus_skipped = sum(stats[b]['skipped'] for b in bus_names)
+        total_cycles = pro_mixer.audio_cycle_counter
+        extra['channel_skipped_pct'] = skipped / max(1, processed + skipped) * 100.0
+        extra['bus_skipped_pct'] = bus_skipped / max(1, total_cycles * len(bus_names)) * 100.0
+    pro_mixer.close()
+    return summarize(scenario.name, times, frames, scenario.sample_rate, extra)
+
+
+def run_stem_benchmark(scenario: Scenario, cycles: int = 200, warmup: int = 20) -> dict:
+    """Registrazione multitraccia: costo per ciclo della cattura e throughput del writer
+
+    Tracce: soundboard + canali dello scenario + bus renderizzati. L'engine gira
+    alla massima velocità (rallentato solo se i ring del registratore superano
+    metà capacità), quindi il writer deve scrivere molto più veloce del tempo reale.
+    """
+    pro_mixer, _, bus_names, feed = build_mixer(scenario)
+    frames = scenario.block_size
+    sr = scenario.sample_rate
+    file_format = scenario.extra.get('format', 'wav')
+    subtype = scenario.extra.get('subtype', 'PCM_24')
+    channels = [ch_id for ch_id, ch in pro_mixer.channels.items() if any(ch.routing.values())]
+    audio_cycles = max(cycles * 6, warmup)
+
+    for i in range(warmup):
+        feed()
+        with pro_mixer.lock:
+            pro_mixer.render_cycle(frames, bus_names)
+
+    output_dir = tempfile.mkdtemp(prefix="bench_stems_")
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            pro_mixer.start_multitrack(output_dir, channels=channels, buses=bus_names,
+                                       subtype=subtype, file_format=file_format)
+        session = pro_mixer.stem_session
+        rings = [track.ring for track in session.recorder.tracks.values()]
+        half = rings[0].capacity // 2
+
+        times = []
+        wall_start = time.perf_counter()
+        for i in range(audio_cycles):
+            while any(ring.available > half for ring in rings):
+                time.sleep(0.001)
+            feed()
+            t0 = time.perf_counter()
+            with pro_mixer.lock:
+                pro_mixer.render_cycle(frames, bus_names)
+            times.append(time.perf_counter() - t0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            pro_mixer.stop_multitrack()
+        session.wait(timeout=60.0)
+        wall = time.perf_counter() - wall_start
+
+        stats = session.recorder.get_stats()
+        audio_sec = audio_cycles * frames / sr
+        bytes_written = sum(os.path.getsize(os.path.join(session.session_dir, t['file'])) for t in session.tracks)
+        extra = {
+            'stems': len(session.tracks),
+            'write_rtf': audio_sec * len(session.tracks) / wall,
+            'write_mb_s': bytes_written / wall / 1e6,
+            'dropped_frames': sum(v['dropped_frames'] for v in stats.values()),
+            'buses': len(bus_names),
+        }
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+        pro_mixer.close()
+    return summarize(scenario.name, times, frames, sr, extra)
+
+
+def _garbage_load(stop_event: threading.Event, gc_scheduler: Optional[GcScheduler]):
+    """Simula UI/app: produce garbage ciclico (e, se attivo, fa da thread UI per il GC)"""
+    while not stop_event.is_set():
+        for _ in range(200):
+            node = {'data': [0.0] * 20}
+            node['self'] = node
+        if gc_scheduler is not None and not gc_scheduler.collect_if_idle():
+            time.sleep(0.0005)
+            continue
+        time.sleep(0.002)
+
+
+def run_jitter_benchmark(scenario: Scenario, cycles: int = 200, warmup: int = 20) -> dict:
+    """Jitter delle callback su uno stream in tempo reale sotto carico di garbage
+
+    scenario.extra['realtime'] attiva priorità real-time del thread audio e GC
+    nelle finestre idle; senza, il GC automatico può scattare dentro la callback.
+    """
+    realtime = scenario.extra.get('realtime', False)
+    pro_mixer, _, bus_names, feed = build_mixer(scenario)
+    sr = scenario.sample_rate
+    frames = scenario.block_size
+    period = frames / sr
+
+    device_id = pro_mixer.backend.add_device(NullDevice(sample_rate=sr))
+    pro_mixer.configure_realtime(realtime)
+    # Stesso lavoro in entrambe le modalità: niente degradazione degli effetti
+    pro_mixer.set_governor_enabled(False)
+    gc_scheduler = GcScheduler(pro_mixer) if realtime else None
+
+    bus_callback = pro_mixer.audio_output_callback(bus_names[0])
+    starts, durations = [], []
+    done = threading.Event()
+
+    def callback(outdata, n_frames, time_info, status):
+        t0 = time.perf_counter()
+        feed()
+        bus_callback(outdata, n_frames, time_info, status)
+        starts.append(t0)
+        durations.append(time.perf_counter() - t0)
+        if len(starts) >= warmup + cycles:
+            done.set()
+
+    stream = pro_mixer.backend.open_output_stream(device_id, sr, frames, 2, callback)
+    stop_load = threading.Event()
+    load_thread = threading.Thread(target=_garbage_load, args=(stop_load, gc_scheduler), daemon=True)
+
+    if gc_scheduler is not None:
+        gc_scheduler.freeze()
+    try:
+        load_thread.start()
+        stream.start()
+        done.wait(timeout=(warmup + cycles) * period * 4 + 5.0)
+    finally:
+        stream.close()
+        stop_load.set()
+        load_thread.join(timeout=2.0)
+        if gc_scheduler is not None:
+            gc_scheduler.release()
+        pro_mixer.close()
+
+    starts = np.array(starts[warmup:])
+    durations = durations[warmup:]
+    # Jitter: scostamento dell'inizio callback dal periodo ideale
+    jitter_ms = np.abs(np.diff(starts) - period) * 1000.0 if len(starts) > 1 else np.zeros(1)
+
+    return summarize(scenario.name, durations, frames, sr, {
+        'jitter_mean_ms': float(jitter_ms.mean()),
+        'jitter_p99_ms': float(np.percentile(jitter_ms, 99)),
+        'jitter_max_ms': float(jitter_ms.max()),
+        'xruns': stream.xrun_count,
+        'gc_pause_max_ms': gc_scheduler.max_pause_ms if gc_scheduler else None,
+    })
+
+
+def run_stretch_benchmark(scenario: Scenario, cycles: int = 200, warmup: int = 20) -> dict:
+    """Media player (HW3) con velocità/pitch: ciclo completo dell'engine con lo stretcher attivo
+
+    Il file (44.1kHz, quindi anche ricampionato) viene decodificato dal thread del
+    media player; prima di ogni ciclo si aspetta che il decoder abbia riempito il
+    ring, così si misura la CPU del ciclo e non la contesa del GIL con il decoder.
+    """
+    pro_mixer, _, bus_names, feed = build_mixer(scenario)
+    frames = scenario.block_size
+    sr = scenario.sample_rate
+    speed = scenario.extra.get('speed', 1.0)
+    pitch = scenario.extra.get('pitch', 0.0)
+    preset = scenario.extra.get('preset', 'balanced')
+    for bus_name in bus_names:
+        pro_mixer.channels['HW3'].routing[bus_name] = True
+
+    file_rate = 44100
+    t = np.arange(file_rate * 30) / file_rate
+    music = (0.2 * np.sin(2 * np.pi * 220 * t) + 0.1 * np.sin(2 * np.pi * 331 * t)
+             + 0.05 * np.sin(2 * np.pi * 1250 * t * (1 + 0.01 * np.sin(2 * np.pi * 0.5 * t))))
+    fd, path = tempfile.mkstemp(prefix="bench_stretch_", suffix=".wav")
+    os.close(fd)
+    player = pro_mixer.media_player
+    try:
+        sf.write(path, np.stack([music, music], axis=1).astype(np.float32), file_rate)
+        player.set_stretch_preset(preset)
+        player.set_speed(speed)
+        player.set_pitch(pitch)
+        stream = player.load(path)
+        player.play()
+        # Ring pieno: il decoder è fermo finché non si libera un chunk intero
+        ready = stream.ring.capacity - stream._max_chunk_out
+
+        def cycle():
+            while stream.buffered_frames < ready and not stream.eof:
+                time.sleep(0.0005)
+            feed()
+            t0 = time.perf_counter()
+            with pro_mixer.lock:
+                pro_mixer.render_cycle(frames, bus_names)
+            return time.perf_counter() - t0
+
+        for i in range(warmup):
+            cycle()
+        hops_before = player.stretcher.hops
+        gc.collect()
+        times = [cycle() for i in range(cycles)]
+        extra = {
+            'preset': preset,
+            'speed': speed,
+            'pitch': pitch,
+            'hops_per_cycle': (player.stretcher.hops - hops_before) / cycles,
+            'stream_underruns': stream.underruns,
+            'buses': len(bus_names),
+        }
+    finally:
+        pro_mixer.close()
+        os.remove(path)
+    return summarize(scenario.name, times, frames, sr, extra)
+
+
+# ========== SUITE ==========
+
+def suite_clips() -> List[Scenario]:
+    return [Scenario(f"clips/{n}", clips=n) for n in (1, 8, 16, 32, 64)]
+
+
+def suite_channels() -> List[Scenario]:
+    return [Scenario(f"channels_fx/{m}", fx_channels=m) for m in (1, 2, 4, 8)]
+
+
+def suite_buses() -> List[Scenario]:
+    return [Scenario(f"buses/{b}", clips=4, fx_channels=2, buses=b) for b in (1, 2, 3, 4, 5)]
+
+
+def suite_strips() -> List[Scenario]:
+    # Mixer grandi: canali e bus aggiunti a runtime, tutti routati su tutti i bus.
+    # I canali extra sono senza effetti: si misura il costo di struttura dell'engine
+    # (letture, mix, bus), non il DSP per canale già coperto da 'channels'
+    return [Scenario(f"strips/{c}ch_{b}bus", clips=4, fx_channels=2, channels=c, buses=b)
+            for c, b in ((8, 2), (16, 4), (32, 8), (48, 8), (64, 12))]
+
+
+def suite_buffers() -> List[Scenario]:
+    return [
+        Scenario(f"buffers/{block}@{sr}", clips=4, fx_channels=2, block_size=block, sample_rate=sr)
+        for sr in (44100, 48000, 96000)
+        for block in (64, 128, 256, 512, 1024, 2048)
+    ]
+
+
+def suite_silence() -> List[Scenario]:
+    report = {'report_silence': True}
+    return [
+        Scenario("silence/idle", fx_channels=2, extra={**report, 'silent_input': True}),
+        Scenario("silence/mic_only", fx_channels=2, extra=report),
+        Scenario("silence/clips_only", clips=4, fx_channels=2, extra={**report, 'silent_input': True}),
+    ]
+
+
+def suite_jitter() -> List[Scenario]:
+    return [
+        Scenario(f"jitter/{mode}", clips=8, fx_channels=1, buses=1, block_size=512,
+                 extra={'realtime': mode == 'realtime'})
+        for mode in ('default', 'realtime')
+    ]
+
+
+def suite_stems() -> List[Scenario]:
+    # Tracce = soundboard + canali + bus A1
+    scenarios = [Scenario(f"stems/{n}", clips=2, channels=n - 2, buses=1) for n in (4, 8, 16, 24)]
+    scenarios.append(Scenario("stems/8_flac", clips=2, channels=6, buses=1, extra={'format': 'flac'}))
+    return scenarios
+
+
+def suite_stretch() -> List[Scenario]:
+    # 1x = stretcher in bypass (riferimento); poi i tre preset nel caso peggiore
+    # (2x con pitch -12: rapporto di stretch massimo) e usi tipici
+    scenarios = [Scenario("stretch/off", buses=1, extra={'speed': 1.0})]
+    for preset in ('fast', 'balanced', 'quality'):
+        scenarios.append(Scenario(f"stretch/{preset}_1.5x", buses=1, extra={'preset': preset, 'speed': 1.5}))
+        scenarios.append(Scenario(f"stretch/{preset}_+5st", buses=1, extra={'preset': preset, 'pitch': 5.0}))
+        scenarios.append(Scenario(f"stretch/{preset}_worst", buses=1,
+                                  extra={'preset': preset, 'speed': 2.0, 'pitch': -12.0}))
+    scenarios.append(Scenario("stretch/balanced_0.75x_a1a2", buses=2,
+                              extra={'preset': 'balanced', 'speed': 0.75, 'pitch': -2.0}))
+    return scenarios
+
+
+# Nome suite -> (generatore scenari, runner)
+SUITES: Dict[str, tuple] = {
+    'clips': (suite_clips, run_cycle_benchmark),
+    'channels': (suite_channels, run_cycle_benchmark),
+    'buses': (suite_buses, run_cycle_benchmark),
+    'strips': (suite_strips, run_cycle_benchmark),
+    'buffers': (suite_buffers, run_cycle_benchmark),
+    'silence': (suite_silence, run_cycle_benchmark),
+    'jitter': (suite_jitter, run_jitter_benchmark),
+    'stems': (suite_stems, run_stem_benchmark),
+    'stretch': (suite_stretch, run_stretch_benchmark),
+}
+
+
+# ========== BASELINE ==========
+
+def load_baseline(path: str) -> Dict[str, dict]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return {r['name']: r for r in data.get('results', [])}
+
+
+def save_baseline(path: str, results: List[dict], merge: bool = True):
+    existing = load_baseline(path) if merge else {}
+    for r in results:
+        existing[r['name']] = r
+    data = {
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'results': sorted(existing.values(), key=lambda r: r['name']),
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+
+
+def compare(results: List[dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """Confronta con la baseline (metrica: mean_ms). Ritorna la lista delle regressioni"""
+    regressions = []
+    for r in results:
+        base = baseline.get(r['name'])
+        if not base:
+            continue
+        ratio = r['mean_ms'] / base['mean_ms'] if base['mean_ms'] > 0 else 1.0
+        r['vs_baseline'] = ratio
+        if ratio > 1.0 + threshold:
+            regressions.append(f"{r['name']}: {r['mean_ms']:.3f}ms vs {base['mean_ms']:.3f}ms (+{(ratio - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_results(results: List[dict]):
+    header = f"{'scenario':<28}{'mean ms':>9}{'p99 ms':>9}{'deadline':>10}{'RTF':>8}{'headroom':>10}{'alloc KB':>10}{'vs base':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        vs = f"{r['vs_baseline']:.2f}x" if 'vs_baseline' in r else "-"
+        alloc = f"{r['alloc_peak_kb']:.1f}" if 'alloc_peak_kb' in r else "-"
+        flag = " ⚠️" if r['headroom_pct'] < 0 else ""
+        print(f"{r['name']:<28}{r['mean_ms']:>9.3f}{r['p99_ms']:>9.3f}{r['deadline_ms']:>10.2f}"
+              f"{r['realtime_factor']:>8.1f}{r['headroom_pct']:>9.0f}%{alloc:>10}{vs:>9}{flag}")
+
+    silence = [r for r in results if 'channel_skipped_pct' in r]
+    if silence:
+        print()
+        header = f"{'scenario':<28}{'canali saltati':>16}{'bus saltati':>13}"
+        print(header)
+        print("-" * len(header))
+        for r in silence:
+            print(f"{r['name']:<28}{r['channel_skipped_pct']:>15.0f}%{r['bus_skipped_pct']:>12.0f}%")
+
+    jitter = [r for r in results if 'jitter_p99_ms' in r]
+    if jitter:
+        print()
+        header = f"{'scenario':<28}{'jitter avg':>11}{'jitter p99':>11}{'jitter max':>11}{'xrun':>6}{'GC max ms':>11}"
+        print(header)
+        print("-" * len(header))
+        for r in jitter:
+            gc_pause = f"{r['gc_pause_max_ms']:.3f}" if r.get('gc_pause_max_ms') is not None else "-"
+            print(f"{r['name']:<28}{r['jitter_mean_ms']:>11.3f}{r['jitter_p99_ms']:>11.3f}"
+                  f"{r['jitter_max_ms']:>11.3f}{r['xruns']:>6}{gc_pause:>11}")
+
+
+    stems = [r for r in results if 'write_rtf' in r]
+    if stems:
+        print()
+        header = f"{'scenario':<28}{'tracce':>8}{'writer RTF':>12}{'MB/s':>8}{'frame persi':>13}"
+        print(header)
+        print("-" * len(header))
+        for r in stems:
+            print(f"{r['name']:<28}{r['stems']:>8}{r['write_rtf']:>11.1f}x{r['write_mb_s']:>8.1f}"
+                  f"{r['dropped_frames']:>13}")
+
+    stretch = [r for r in results if 'hops_per_cycle' in r]
+    if stretch:
+        print()
+        header = f"{'scenario':<28}{'preset':>10}{'speed':>7}{'pitch':>7}{'hop/ciclo':>11}{'underrun':>10}"
+        print(header)
+        print("-" * len(header))
+        for r in stretch:
+            print(f"{r['name']:<28}{r['preset']:>10}{r['speed']:>6.2f}x{r['pitch']:>+7.0f}"
+                  f"{r['hops_per_cycle']:>11.2f}{r['stream_underruns']:>10}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark prestazioni engine audio")
+    parser.add_argument("--suite", action="append", choices=sorted(SUITES.keys()),
+                        help="Suite da eseguire (ripetibile, default: tutte)")
+    parser.add_argument("--quick", action="store_true", help="Meno cicli per scenario (controllo rapido)")
+    parser.add_argument("--cycles", type=int, default=None, help="Cicli misurati per scenario")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="File JSON della baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="Salva i risultati come nuova baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Regressione tollerata rispetto alla baseline (0.25 = +25%%)")
+    parser.add_argument("--json", default=None, help="Salva i risultati grezzi in un file JSON")
+    args = parser.parse_args(argv)
+
+    cycles = args.cycles or (40 if args.quick else 300)
+    suites = args.suite or list(SUITES.keys())
+
+    print(f"=== BENCHMARK ENGINE AUDIO ({cycles} cicli per scenario) ===\n")
+    results = []
+    for suite_name in suites:
+        make_scenarios, runner = SUITES[suite_name]
+        for scenario in make_scenarios():
+            results.append(runner(scenario, cycles=cycles))
+
+    baseline = load_baseline(args.baseline)
+    regressions = compare(results, baseline, args.threshold) if baseline else []
+
+    print()
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"\n💾 Baseline salvata: {args.baseline}")
+        return 0
+
+    if not baseline:
+        print("\nℹ️ Nessuna baseline trovata: esegui con --save-baseline per crearla")
+        return 0
+
+    if regressions:
+        print(f"\n❌ REGRESSIONI (soglia +{args.threshold * 100:.0f}%):")
+        for line in regressions:
+            print(f"   {line}")
+        return 1
+
+    print(f"\n✓ Nessuna regressione (soglia +{args.threshold * 100:.0f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Bus Taps - Bus consumabili nel processo, senza dispositivo
+Un tap riceve ogni blocco renderizzato di un bus come vista in sola lettura
+(nessuna copia): registratore, uscite di rete/IPC e canali di ritorno leggono
+lo stesso array prodotto dall'engine. I bus virtuali (es. B1/B2) diventano
+submix utilizzabili senza aprire altri stream PortAudio.
+
+- Tap sincroni (ProMixer.add_bus_tap): callback(block) nel thread audio, deve
+  essere veloce e non tenere il lock
+- TapReader: ring buffer per consumatori su un altro thread (rete, IPC)
+- VirtualBusClock: fa girare l'engine a tempo reale quando nessun dispositivo
+  di output lo sta già facendo
+"""
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+from audio_fifo import AudioFifo
+
+
+def readonly_view(block: np.ndarray) -> np.ndarray:
+    """Vista in sola lettura (senza copia) di un blocco renderizzato"""
+    view = block.view()
+    view.flags.writeable = False
+    return view
+
+
+class TapReader:
+    """Consumatore di un bus su un thread separato (rete, IPC, encoder)
+
+    Il tap scrive i blocchi in un ring buffer preallocato (l'unica copia,
+    necessaria per attraversare i thread); il consumatore legge con read().
+    Se il consumatore resta indietro vengono scartati i frame più vecchi.
+    """
+
+    def __init__(self, bus_name: str, capacity: int = 48000):
+        self.bus_name = bus_name
+        self.fifo = AudioFifo(capacity)
+        self._data_ready = threading.Condition()
+        self.closed = False
+
+    def __call__(self, block: np.ndarray):
+        """Tap del bus (thread audio)"""
+        with self._data_ready:
+            self.fifo.write(block)
+            self._data_ready.notify()
+
+    @property
+    def available(self) -> int:
+        return self.fifo.available
+
+    @property
+    def overflows(self) -> int:
+        """Frame scartati perché il consumatore era troppo lento"""
+        return self.fifo.overflows
+
+    def read(self, frames: int, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        """Legge `frames` frame, aspettando al massimo `timeout` secondi
+
+        Returns:
+            Blocco (frames, 2) oppure None se scade il timeout o il reader è chiuso
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._data_ready:
+            while self.fifo.available < frames:
+                if self.closed:
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._data_ready.wait(remaining)
+            return self.fifo.read(frames)
+
+    def read_available(self) -> np.ndarray:
+        """Legge tutto quello che è in coda (anche 0 frame) senza aspettare"""
+        with self._data_ready:
+            return self.fifo.read(self.fifo.available)
+
+    def close(self):
+        """Sblocca un read() in attesa (il tap va rimosso con ProMixer.close_bus_reader)"""
+        with self._data_ready:
+            self.closed = True
+            self._data_ready.notify_all()
+
+
+class VirtualBusClock:
+    """Clock software per i bus virtuali
+
+    Quando almeno un bus ha consumatori nel processo (tap, registrazione,
+    canali di ritorno) ma nessuno stream di output sta facendo girare
+    l'engine, esegue i cicli a tempo reale (un quanto per periodo). Con un
+    dispositivo di output attivo resta fermo: i bus virtuali vengono
+    renderizzati negli stessi cicli dei bus fisici, sul clock del dispositivo.
+    """
+
+    # Ritardo massimo recuperato dopo uno stallo (oltre si riparte da adesso)
+    MAX_CATCH_UP = 0.1
+
+    def __init__(self, mixer):
+        self.mixer = mixer
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.cycles = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="VirtualBusClock", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def _run(self):
+        mixer = self.mixer
+        next_cycle = time.perf_counter()
+        while not self._stop.is_set():
+            period = mixer.quantum / mixer.sample_rate
+            now = time.perf_counter()
+            if now < next_cycle:
+                self._stop.wait(next_cycle - now)
+                continue
+            if not mixer.run_virtual_cycle():
+                # Engine guidato da un dispositivo (o nessun consumatore): controlla più tardi
+                self._stop.wait(0.01)
+                next_cycle = time.perf_counter()
+                continue
+            self.cycles += 1
+            next_cycle += period
+            if time.perf_counter() - next_cycle > self.MAX_CATCH_UP:
+                next_cycle = time.perf_counter()
@@ -0,0 +1,121 @@
+"""
+Clip Capture - Cattura di un canale o di un bus direttamente in una clip
+Il thread audio copia i blocchi in un buffer float32 preallocato (durata
+massima fissa, nessuna allocazione); allo stop il silenzio iniziale e finale
+viene tagliato e i campioni diventano subito un AudioClip in memoria, senza
+passare da file e decodifica. Il file della clip viene scritto dopo, su un
+thread separato.
+"""
+import os
+import threading
+from typing import Callable, Optional
+
+import numpy as np
+import soundfile as sf
+
+
+def trim_silence(samples: np.ndarray, threshold_db: float = -50.0, pad_ms: float = 20.0,
+                 sample_rate: int = 48000) -> np.ndarray:
+    """Taglia il silenzio all'inizio e alla fine (vista, nessuna copia)
+
+    Args:
+        samples: Audio (frames, canali)
+        threshold_db: Livello sotto il quale un frame è considerato silenzio
+        pad_ms: Margine lasciato prima del primo e dopo l'ultimo frame udibile
+
+    Returns:
+        Porzione udibile (vuota se è tutto silenzio)
+    """
+    if len(samples) == 0:
+        return samples
+    threshold = 10 ** (threshold_db / 20.0)
+    loud = np.flatnonzero(np.abs(samples).max(axis=1) > threshold)
+    if len(loud) == 0:
+        return samples[:0]
+    pad = int(pad_ms * sample_rate / 1000)
+    start = max(0, loud[0] - pad)
+    end = min(len(samples), loud[-1] + 1 + pad)
+    return samples[start:end]
+
+
+class ClipCapture:
+    """Cattura di una sorgente (canale o bus) in un buffer preallocato"""
+
+    def __init__(self, source: str, kind: str, sample_rate: int, max_seconds: float = 30.0):
+        """
+        Args:
+            source: ID del canale o nome del bus
+            kind: 'channel' o 'bus'
+            sample_rate: Sample rate dell'engine
+            max_seconds: Durata massima (oltre, i blocchi vengono ignorati)
+        """
+        if kind not in ('channel', 'bus'):
+            raise ValueError(f"Sorgente '{kind}' non valida (ammesse: 'channel', 'bus')")
+        self.source = source
+        self.kind = kind
+        self.max_seconds = max_seconds
+        self.sample_rate = sample_rate
+        self.buffer = np.zeros((max(1, int(max_seconds * sample_rate)), 2), dtype=np.float32)
+        self.frames = 0
+
+    def reset(self, sample_rate: Optional[int] = None):
+        """Riparte da vuota (cambio di sample rate: niente clip con due rate mescolati)"""
+        if sample_rate and sample_rate != self.sample_rate:
+            self.sample_rate = sample_rate
+            self.buffer = np.zeros((max(1, int(self.max_seconds * sample_rate)), 2), dtype=np.float32)
+        else:
+            self.buffer[:self.frames] = 0.0
+        self.frames = 0
+
+    @property
+    def is_full(self) -> bool:
+        return self.frames >= len(self.buffer)
+
+    @property
+    def seconds(self) -> float:
+        return self.frames / self.sample_rate
+
+    def __call__(self, block: np.ndarray):
+        """Accoda un blocco (thread audio): solo una copia nel buffer"""
+        n = min(len(block), len(self.buffer) - self.frames)
+        if n <= 0:
+            return
+        self.buffer[self.frames:self.frames + n] = block[:n]
+        self.frames += n
+
+    def skip(self, frames: int):
+        """Ciclo in cui la sorgente non ha suonato: il buffer è già a zero, avanza e basta"""
+        self.frames = min(len(self.buffer), self.frames + frames)
+
+    def finish(self, threshold_db: float = -50.0, pad_ms: float = 20.0) -> np.ndarray:
+        """Campioni catturati senza il silenzio iniziale e finale (copia)"""
+        audio = trim_silence(self.buffer[:self.frames], threshold_db, pad_ms, self.sample_rate)
+        return audio.copy()
+
+
+def persist_clip(clip, path: str, sample_rate: int,
+                 on_done: Optional[Callable[[Optional[str]], None]] = None) -> threading.Thread:
+    """Scrive i campioni di una clip su file (WAV/FLAC) su un thread separato
+
+    Args:
+        on_done: Chiamata dal thread di scrittura con il percorso (None in caso di errore)
+    """
+    samples = clip.samples
+
+    def run():
+        saved = None
+        try:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            # Conversione PCM_16 fuori dal thread UI (picchi oltre 0 dBFS limitati)
+            sf.write(path, np.clip(samples, -1.0, 1.0), sample_rate, subtype='PCM_16')
+            saved = path
+            print(f"💾 Clip '{clip.name}' salvata: {path}")
+        except Exception as e:
+            print(f"✗ Salvataggio clip '{clip.name}': {e}")
+        if on_done is not None:
+            on_done(saved)
+
+    thread = threading.Thread(target=run, name="ClipPersist", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,176 @@
+"""
+CPU Governor - Degradazione controllata della catena effetti
+Confronta il tempo di ogni callback audio con un budget (frazione della
+deadline del blocco). Se il budget viene superato per alcuni blocchi di fila
+disattiva/semplifica gli stadi in ordine di priorità (compressore → EQ →
+metering → resampling di alta qualità); quando torna margine per un po' di
+tempo li ripristina uno alla volta, con isteresi.
+Ogni cambio viene registrato come evento (per la UI e il log).
+"""
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+
+class CpuGovernor:
+    """Governor del carico CPU per il ProMixer"""
+
+    # Ordine di degradazione: il primo stadio è il primo a essere sacrificato
+    DEFAULT_STAGES = ('compressor', 'eq', 'metering', 'resampling')
+
+    STAGE_LABELS = {
+        'compressor': "Compressore",
+        'eq': "EQ",
+        'metering': "Metering",
+        'resampling': "Resampling HQ",
+    }
+
+    def __init__(self, stages=DEFAULT_STAGES, budget: float = 0.7,
+                 restore_load: float = 0.4, degrade_after: int = 3,
+                 restore_after: float = 3.0,
+                 is_stage_active: Optional[Callable[[str], bool]] = None,
+                 on_change: Optional[Callable[[dict], None]] = None):
+        """
+        Args:
+            stages: Stadi degradabili in ordine di priorità
+            budget: Frazione della deadline oltre cui un blocco è "fuori budget"
+            restore_load: Sotto questo carico il blocco conta come margine per il ripristino
+            degrade_after: Blocchi fuori budget consecutivi prima di degradare
+            restore_after: Secondi continui di margine prima di ripristinare uno stadio
+            is_stage_active: Ritorna False se uno stadio non ha nulla da risparmiare
+                (es. nessun compressore attivo): viene saltato
+            on_change: Chiamata (dal thread audio!) a ogni degradazione/ripristino
+        """
+        self.stages = tuple(stages)
+        self.budget = budget
+        self.restore_load = restore_load
+        self.degrade_after = degrade_after
+        self.restore_after = restore_after
+        self.is_stage_active = is_stage_active
+        self.on_change = on_change
+        self.enabled = True
+
+        # Stadi attualmente degradati (in ordine di degradazione)
+        self.degraded: List[str] = []
+
+        # Storico eventi e contatore (la UI confronta il contatore per sapere se ci sono novità)
+        self.events = deque(maxlen=100)
+        self.event_count = 0
+
+        self._over_blocks = 0
+        self._headroom_since = None
+        self._busy = 0.0
+        self._worst_block = 0.0
+        self._period_start = None
+
+    def is_degraded(self, stage: str) -> bool:
+        return stage in self.degraded
+
+    @property
+    def level(self) -> int:
+        """Numero di stadi degradati (0 = qualità piena)"""
+        return len(self.degraded)
+
+    def report(self, duration: float, deadline: float, now: Optional[float] = None):
+        """Registra la durata di una callback audio (chiamato dalla callback di output)
+
+        Le callback dei vari bus si contendono lo stesso lock e la stessa CPU: il
+        carico viene valutato una volta per periodo di blocco, come il massimo tra
+        la callback peggiore e il tempo occupato da tutte le callback del periodo.
+
+        Args:
+            duration: Tempo impiegato dalla callback in secondi
+            deadline: Durata del blocco audio in secondi
+            now: Timestamp (perf_counter) per i test, default: ora
+        """
+        if not self.enabled or deadline <= 0:
+            return
+        now = time.perf_counter() if now is None else now
+
+        self._busy += duration
+        self._worst_block = max(self._worst_block, duration / deadline)
+        if self._period_start is None:
+            self._period_start = now - duration
+        elapsed = now - self._period_start
+        if elapsed < deadline:
+            return
+
+        load = max(self._busy / elapsed, self._worst_block)
+        self._busy = 0.0
+        self._worst_block = 0.0
+        self._period_start = now
+        self._evaluate(load, now)
+
+    def _evaluate(self, load: float, now: float):
+        if load > self.budget:
+            self._headroom_since = None
+            self._over_blocks += 1
+            if self._over_blocks >= self.degrade_after:
+                self._over_blocks = 0
+                self._degrade(load)
+            return
+
+        self._over_blocks = 0
+        if load < self.restore_load:
+            if self._headroom_since is None:
+                self._headroom_since = now
+            elif self.degraded and now - self._headroom_since >= self.restore_after:
+                # Un solo stadio per volta, poi si riparte a contare il margine
+                self._headroom_since = now
+                self._restore(load)
+        else:
+            # Zona di isteresi: né degrada né ripristina
+            self._headroom_since = None
+
+    def _next_stage(self) -> Optional[str]:
+        for stage in self.stages:
+            if stage in self.degraded:
+                continue
+            if self.is_stage_active is not None and not self.is_stage_active(stage):
+                continue
+            return stage
+        return None
+
+    def _degrade(self, load: float):
+        stage = self._next_stage()
+        if stage is None:
+            return
+        self.degraded.append(stage)
+        self._emit('degrade', stage, load)
+
+    def _restore(self, load: float):
+        stage = self.degraded.pop()
+        self._emit('restore', stage, load)
+
+    def reset(self):
+        """Ripristina subito la qualità piena (es. quando il governor viene disattivato)"""
+        while self.degraded:
+            self._restore(0.0)
+        self._over_blocks = 0
+        self._headroom_since = None
+        self._busy = 0.0
+        self._worst_block = 0.0
+        self._period_start = None
+
+    def _emit(self, action: str, stage: str, load: float):
+        event = {
+            'time': time.strftime('%H:%M:%S'),
+            'action': action,
+            'stage': stage,
+            'load': load,
+            'level': self.level,
+        }
+        self.events.append(event)
+        self.event_count += 1
+        if self.on_change:
+            self.on_change(event)
+
+    def describe(self) -> str:
+        """Testo breve per la UI"""
+        if not self.degraded:
+            return ""
+        names = ", ".join(self.STAGE_LABELS.get(s, s) for s in self.degraded)
+        return f"🐢 CPU al limite: ridotti {names}"
+
+    def get_events(self) -> List[dict]:
+        return list(self.events)
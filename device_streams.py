@@ -0,0 +1,125 @@
+"""
+Device Streams - Uno stream per dispositivo, condiviso da canali e bus
+Un'interfaccia multicanale viene aperta una sola volta: ogni canale di input
+e ogni bus di output ne usa una coppia di canali (1-2, 3-4, ...) tramite una
+vista sul buffer della callback, senza copie. Se il dispositivo ha sia canali
+di input sia bus in uso lo stream è duplex (una callback, clock condiviso).
+Il numero di stream e di callback cresce con i dispositivi, non con i canali
+del mixer.
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def channel_pairs(max_channels: int) -> List[int]:
+    """Primo canale (0-based) di ogni coppia disponibile su un dispositivo"""
+    return list(range(0, max(max_channels, 0), 2))
+
+
+def channel_pair_label(first_channel: int, max_channels: Optional[int] = None) -> str:
+    """Etichetta della coppia per la UI ("1-2", "3-4", oppure "1" su un dispositivo mono)"""
+    if max_channels is not None and first_channel + 1 >= max_channels:
+        return str(first_channel + 1)
+    return f"{first_channel + 1}-{first_channel + 2}"
+
+
+def parse_channel_pair(label: str) -> int:
+    """Primo canale (0-based) da un'etichetta "3-4" / "3" """
+    try:
+        return max(0, int(str(label).split('-')[0]) - 1)
+    except ValueError:
+        return 0
+
+
+def pair_view(block: np.ndarray, first_channel: int) -> np.ndarray:
+    """Vista (senza copia) sulla coppia di canali che parte da `first_channel`"""
+    return block[:, first_channel:first_channel + 2]
+
+
+class DeviceStreamGroup:
+    """Stream di un dispositivo e mappa coppie di canali → canali/bus del mixer"""
+
+    def __init__(self, device_id: int, name: str = "", max_input_channels: int = 0,
+                 max_output_channels: int = 0):
+        self.device_id = device_id
+        self.name = name
+        self.max_input_channels = max_input_channels
+        self.max_output_channels = max_output_channels
+
+        # channel_id / bus_name -> primo canale della coppia sul dispositivo
+        self.inputs: Dict[str, int] = {}
+        self.outputs: Dict[str, int] = {}
+
+        # Con uno stream duplex input_stream e output_stream sono lo stesso oggetto
+        self.input_stream = None
+        self.output_stream = None
+        self.sample_rate: Optional[int] = None  # Sample rate dello stream di output
+        self.dtype = 'float32'
+
+    @property
+    def is_duplex(self) -> bool:
+        return self.output_stream is not None and self.output_stream is self.input_stream
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.inputs and not self.outputs
+
+    def _width(self, mapping: Dict[str, int], max_channels: int) -> int:
+        if not mapping:
+            return 0
+        needed = max(first + 2 for first in mapping.values())
+        return max(1, min(needed, max_channels))
+
+    @property
+    def input_width(self) -> int:
+        """Canali di input da aprire (fino all'ultima coppia usata)"""
+        return self._width(self.inputs, self.max_input_channels)
+
+    @property
+    def output_width(self) -> int:
+        """Canali di output da aprire (fino all'ultima coppia usata)"""
+        return self._width(self.outputs, self.max_output_channels)
+
+    def streams(self) -> list:
+        """Stream aperti (senza duplicati)"""
+        result = []
+        for stream in (self.input_stream, self.output_stream):
+            if stream is not None and all(stream is not s for s in result):
+                result.append(stream)
+        return result
+
+    def close(self):
+        """Ferma e chiude gli stream del gruppo"""
+        for stream in self.streams():
+            try:
+                stream.stop()
+                stream.close()
+            except Exception as e:
+                print(f"⚠️ Device {self.device_id}: errore chiusura stream ({e})")
+        self.input_stream = None
+        self.output_stream = None
+
+    def describe(self) -> dict:
+        """Riepilogo per UI/log"""
+        if self.is_duplex:
+            kind = 'duplex'
+        elif self.input_stream is not None and self.output_stream is not None:
+            kind = 'input+output'
+        elif self.output_stream is not None:
+            kind = 'output'
+        elif self.input_stream is not None:
+            kind = 'input'
+        else:
+            kind = 'closed'
+        return {
+            'device_id': self.device_id,
+            'name': self.name,
+            'kind': kind,
+            'streams': len(self.streams()),
+            'sample_rate': self.sample_rate,
+            'inputs': {ch: channel_pair_label(first, self.max_input_channels)
+                       for ch, first in self.inputs.items()},
+            'outputs': {bus: channel_pair_label(first, self.max_output_channels)
+                        for bus, first in self.outputs.items()},
+        }
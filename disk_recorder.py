@@ -0,0 +1,180 @@
+"""
+Disk Recorder - Registrazione in streaming su disco con memoria costante
+Il thread audio copia ogni blocco in un ring buffer preallocato per traccia
+(nessuna allocazione, nessun I/O); un thread writer svuota i ring e scrive
+su WAV/FLAC con soundfile. La memoria non dipende dalla durata della
+registrazione e stop() ritorna subito: il writer finisce di scrivere la coda
+e chiude i file in background.
+
+Formati: WAV (PCM_16, PCM_24, FLOAT) e FLAC (PCM_16, PCM_24).
+"""
+import os
+import shutil
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import soundfile as sf
+
+from audio_fifo import AudioFifo
+
+
+# Formato soundfile dall'estensione del file
+FORMATS = {'.wav': 'WAV', '.flac': 'FLAC'}
+SUBTYPES = ('PCM_16', 'PCM_24', 'FLOAT')
+
+
+def track_path(base_path: str, track: str) -> str:
+    """Percorso del file di una traccia quando se ne registrano più di una ("rec.wav" -> "rec_B1.wav")"""
+    root, ext = os.path.splitext(base_path)
+    return f"{root}_{track}{ext or '.wav'}"
+
+
+class RecorderTrack:
+    """Una traccia del registratore: ring buffer + file di destinazione"""
+
+    def __init__(self, name: str, path: str, sample_rate: int, channels: int,
+                 subtype: str, ring_frames: int):
+        ext = os.path.splitext(path)[1].lower() or '.wav'
+        if ext not in FORMATS:
+            raise ValueError(f"Formato '{ext}' non supportato (ammessi: {', '.join(FORMATS)})")
+        if subtype not in SUBTYPES:
+            raise ValueError(f"Subtype '{subtype}' non supportato (ammessi: {', '.join(SUBTYPES)})")
+        if FORMATS[ext] == 'FLAC' and subtype == 'FLOAT':
+            raise ValueError("FLAC non supporta campioni float: usa PCM_16 o PCM_24")
+
+        self.name = name
+        self.path = path
+        self.channels = channels
+        self.ring = AudioFifo(ring_frames, channels)
+        self.file = sf.SoundFile(path, 'w', samplerate=sample_rate, channels=channels,
+                                 subtype=subtype, format=FORMATS[ext])
+        self.frames_written = 0
+        self.rename_to: Optional[str] = None
+
+
+class StreamingRecorder:
+    """Registratore multi-traccia: ring buffer limitati → thread writer → file"""
+
+    def __init__(self, sample_rate: int, ring_seconds: float = 4.0, chunk_frames: int = 8192):
+        """
+        Args:
+            sample_rate: Sample rate delle tracce
+            ring_seconds: Audio massimo in coda per traccia (oltre, il writer è in ritardo
+                e i frame più vecchi vengono scartati e contati in dropped_frames)
+            chunk_frames: Frame scritti su disco per volta
+        """
+        self.sample_rate = sample_rate
+        self.ring_frames = int(ring_seconds * sample_rate)
+        self.chunk_frames = chunk_frames
+        self.tracks: Dict[str, RecorderTrack] = {}
+
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.started_at = None
+        self.error: Optional[str] = None
+        # Chiamata dal writer dopo la chiusura dei file (es. manifest della sessione)
+        self.on_complete: Optional[Callable[[], None]] = None
+
+    def add_track(self, name: str, path: str, subtype: str = 'PCM_16', channels: int = 2) -> RecorderTrack:
+        """Aggiunge una traccia (prima di start): il file viene creato subito"""
+        if self._thread is not None:
+            raise RuntimeError("Tracce da aggiungere prima di start()")
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        track = RecorderTrack(name, path, self.sample_rate, channels, subtype, self.ring_frames)
+        self.tracks[name] = track
+        return track
+
+    @property
+    def is_recording(self) -> bool:
+        return self._thread is not None and not self._stopping.is_set()
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="DiskRecorder", daemon=True)
+        self._thread.start()
+
+    def push(self, track: str, block: np.ndarray):
+        """Accoda un blocco (thread audio): solo una copia nel ring, nessun I/O"""
+        if self._stopping.is_set():
+            return
+        ring = self.tracks[track].ring
+        ring.write(block)
+        if ring.available >= self.chunk_frames:
+            self._wake.set()
+
+    def stop(self, rename: Optional[Dict[str, str]] = None) -> List[str]:
+        """Ferma la registrazione senza aspettare la scrittura su disco
+
+        Args:
+            rename: {traccia: percorso finale} da applicare dopo la chiusura dei file
+
+        Returns:
+            Percorsi finali dei file (completi quando wait() ritorna)
+        """
+        for name, target in (rename or {}).items():
+            if name in self.tracks and target and os.path.abspath(target) != os.path.abspath(self.tracks[name].path):
+                self.tracks[name].rename_to = target
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is None:
+            self._finish()
+        return [track.rename_to or track.path for track in self.tracks.values()]
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Aspetta che il writer abbia chiuso i file"""
+        return self._done.wait(timeout)
+
+    def _drain(self, final: bool = False):
+        for track in self.tracks.values():
+            while track.ring.available >= (1 if final else self.chunk_frames):
+                block = track.ring.read(min(track.ring.available, self.chunk_frames))
+                track.file.write(block)
+                track.frames_written += len(block)
+
+    def _run(self):
+        try:
+            while not self._stopping.is_set():
+                self._wake.wait(0.25)
+                self._wake.clear()
+                self._drain()
+            self._drain(final=True)
+        except Exception as e:
+            self.error = str(e)
+            print(f"✗ Registrazione: errore di scrittura ({e})")
+        finally:
+            self._finish()
+
+    def _finish(self):
+        for track in self.tracks.values():
+            try:
+                track.file.close()
+                if track.rename_to:
+                    shutil.move(track.path, track.rename_to)
+                    track.path = track.rename_to
+                    track.rename_to = None
+            except Exception as e:
+                self.error = str(e)
+                print(f"✗ Registrazione {track.name}: {e}")
+        if self.on_complete is not None:
+            try:
+                self.on_complete()
+            except Exception as e:
+                print(f"✗ Registrazione: {e}")
+        self._done.set()
+
+    def get_stats(self) -> dict:
+        """Durata scritta, frame in coda e frame persi per traccia"""
+        return {
+            name: {
+                'path': track.path,
+                'seconds_written': track.frames_written / self.sample_rate,
+                'queued_frames': track.ring.available,
+                'dropped_frames': track.ring.overflows,
+            }
+            for name, track in self.tracks.items()
+        }
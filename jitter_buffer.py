@@ -0,0 +1,192 @@
+"""
+Jitter Buffer - Buffer di input adattivo con compensazione del drift di clock
+Microfono e bus di output girano su clock diversi: anche pochi ppm di differenza
+riempiono o svuotano la FIFO di input fino a un overflow/underrun (click).
+Il jitter buffer mantiene un riempimento obiettivo (latenza target) e corregge
+il drift leggendo l'input con un rapporto di resampling leggermente diverso da
+1 (al massimo qualche migliaio di ppm, inudibile), deciso da un controllo PI
+sul riempimento medio. Dopo un underrun la latenza target cresce, con un lungo
+periodo stabile torna a scendere.
+"""
+from typing import Optional
+
+import numpy as np
+
+from audio_fifo import AudioFifo
+
+
+class JitterBuffer:
+    """Buffer di input adattivo per un canale hardware"""
+
+    def __init__(self, sample_rate: int, target_ms: float = 10.0, max_target_ms: float = 80.0,
+                 capacity: int = 16384, max_ratio_deviation: float = 0.002):
+        """
+        Args:
+            sample_rate: Sample rate dell'engine
+            target_ms: Latenza target iniziale (minimo: un quanto + il blocco del dispositivo)
+            max_target_ms: Latenza target massima raggiungibile dopo underrun ripetuti
+            capacity: Frame massimi in coda
+            max_ratio_deviation: Massima correzione del rapporto di lettura (0.002 = 2000 ppm)
+        """
+        self.fifo = AudioFifo(capacity)
+        self.sample_rate = sample_rate
+        self.base_target_ms = target_ms
+        self.max_target_ms = max_target_ms
+        self.max_ratio_deviation = max_ratio_deviation
+
+        # False = lettura 1:1 senza correzioni (render offline, sorgenti sincrone)
+        self.drift_compensation = True
+
+        # Guadagni del controllo PI (errore normalizzato sul target, per lettura)
+        self.kp = 0.002
+        self.ki = 2e-6
+
+        self.target_frames = 0
+        self._extra_target = 1.0  # Moltiplicatore del target (cresce dopo un underrun)
+        self.ratio = 1.0
+        self._integral = 0.0
+        self._fill_avg = None
+        # Posizione frazionaria del prossimo campione di output rispetto all'ultimo
+        # campione consumato (1.0 = il campione successivo esatto)
+        self._phase = 1.0
+        self._prev = np.zeros((1, 2), dtype=np.float32)
+        self._primed = False
+        self._stable_reads = 0
+
+        # Statistiche
+        self.underruns = 0
+        self.reads = 0
+        self.min_fill = None
+        self.max_fill = 0
+
+    def write(self, block: np.ndarray):
+        """Accoda un blocco dal dispositivo (qualsiasi dimensione)"""
+        self.fifo.write(block)
+
+    def clear(self):
+        """Svuota il buffer e ricomincia ad accumulare (es. cambio di sample rate)"""
+        self.fifo.clear()
+        self._primed = False
+        self._fill_avg = None
+        self._integral = 0.0
+        self._phase = 1.0
+        self.ratio = 1.0
+        self._prev[:] = 0.0
+
+    def set_sample_rate(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.clear()
+
+    def _update_target(self, frames: int):
+        minimum = frames + self.fifo.max_block
+        target = int(self.base_target_ms / 1000.0 * self.sample_rate * self._extra_target)
+        maximum = int(self.max_target_ms / 1000.0 * self.sample_rate)
+        self.target_frames = max(minimum, min(target, maximum))
+
+    def read(self, frames: int) -> Optional[np.ndarray]:
+        """Legge `frames` frame al clock dell'engine
+
+        Returns:
+            Blocco (frames, 2) oppure None finché il buffer non ha raggiunto il target
+        """
+        fifo = self.fifo
+        self._update_target(frames)
+
+        if not self._primed:
+            if fifo.available < self.target_frames:
+                return None
+            self._primed = True
+            self._fill_avg = float(fifo.available)
+
+        # Troppo audio accumulato (es. canale fermo o burst del driver): torna al target
+        if fifo.available > 3 * self.target_frames + frames:
+            fifo.discard(fifo.available - self.target_frames)
+            self._fill_avg = float(self.target_frames)
+
+        ratio = self.ratio if self.drift_compensation else 1.0
+        synchronous = ratio == 1.0 and self._phase == 1.0
+        if synchronous:
+            needed = frames
+        else:
+            needed = max(1, int(np.ceil(self._phase + (frames - 1) * ratio)))
+
+        if fifo.available < needed:
+            out = self._underrun(frames)
+        elif synchronous:
+            # Caso sincrono: copia diretta, nessuna interpolazione
+            out = fifo.read(frames)
+            self._prev[0] = out[-1]
+        else:
+            out = self._read_resampled(frames, needed, ratio)
+
+        self._track(frames)
+        return out
+
+    def _read_resampled(self, frames: int, needed: int, ratio: float) -> np.ndarray:
+        """Interpolazione lineare a rapporto `ratio` (posizione frazionaria mantenuta tra i blocchi)"""
+        x = np.empty((needed + 1, 2), dtype=np.float32)
+        x[0] = self._prev[0]
+        self.fifo.read(needed, out=x[1:])
+
+        positions = self._phase + np.arange(frames) * ratio
+        positions = np.clip(positions, 0.0, needed)
+        index = np.minimum(positions.astype(np.int64), needed - 1)
+        frac = (positions - index).astype(np.float32)[:, None]
+        out = x[index] * (1.0 - frac) + x[index + 1] * frac
+
+        self._phase = self._phase + frames * ratio - needed
+        self._prev[0] = x[needed]
+        return out
+
+    def _underrun(self, frames: int) -> np.ndarray:
+        """Dati insufficienti: consuma il resto, riaccumula e alza la latenza target"""
+        self.underruns += 1
+        self._primed = False
+        self._phase = 1.0
+        self._prev[:] = 0.0
+        self._stable_reads = 0
+        self._extra_target = min(self._extra_target * 1.5, self.max_target_ms / max(self.base_target_ms, 1e-3))
+        return self.fifo.read(frames)
+
+    def _track(self, frames: int):
+        """Statistiche di riempimento e controllo del rapporto di lettura"""
+        fill = self.fifo.available
+        self.reads += 1
+        self.min_fill = fill if self.min_fill is None else min(self.min_fill, fill)
+        self.max_fill = max(self.max_fill, fill)
+
+        if self._fill_avg is None:
+            self._fill_avg = float(fill)
+        self._fill_avg += 0.01 * (fill - self._fill_avg)
+
+        if self.drift_compensation and self._primed:
+            error = (self._fill_avg - self.target_frames) / self.target_frames
+            limit = self.max_ratio_deviation / self.ki
+            self._integral = float(np.clip(self._integral + error, -limit, limit))
+            deviation = self.kp * error + self.ki * self._integral
+            self.ratio = 1.0 + float(np.clip(deviation, -self.max_ratio_deviation, self.max_ratio_deviation))
+
+        # Lungo periodo senza underrun (~30s a 256 frame/48kHz): la latenza target torna a scendere
+        self._stable_reads += 1
+        if self._stable_reads >= 6000 and self._extra_target > 1.0:
+            self._extra_target = max(1.0, self._extra_target * 0.8)
+            self._stable_reads = 0
+
+    def get_stats(self) -> dict:
+        """Riempimento, latenza e drift stimato"""
+        sr = self.sample_rate
+        fill_avg = self._fill_avg if self._fill_avg is not None else float(self.fifo.available)
+        return {
+            'fill': self.fifo.available,
+            'fill_avg': fill_avg,
+            'fill_min': self.min_fill if self.min_fill is not None else 0,
+            'fill_max': self.max_fill,
+            'target_frames': self.target_frames,
+            'latency_ms': fill_avg / sr * 1000.0,
+            'target_ms': self.target_frames / sr * 1000.0,
+            'ratio': self.ratio,
+            'drift_ppm': (self.ratio - 1.0) * 1e6,
+            'underruns': self.underruns,
+            'overflow_frames': self.fifo.overflows,
+            'primed': self._primed,
+        }
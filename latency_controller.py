@@ -0,0 +1,200 @@
+"""
+Adaptive Latency Controller - Sceglie il buffer size dal carico misurato
+Osserva i percentili di durata delle callback e gli xrun di ogni bus del
+ProMixer e sposta il block size dell'engine (128/256/512/1024) verso il
+valore più basso stabile, con isteresi per evitare oscillazioni.
+Ogni decisione viene registrata nello storico e stampata nel log.
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+class AdaptiveLatencyController:
+    """Controller opzionale del buffer size del ProMixer"""
+
+    BUFFER_STEPS = (128, 256, 512, 1024)
+
+    def __init__(self, pro_mixer, interval: float = 2.0, steps=BUFFER_STEPS,
+                 low_load: float = 0.35, high_load: float = 0.75,
+                 stable_windows: int = 3, percentile: float = 99.0,
+                 on_decision: Optional[Callable[[dict], None]] = None):
+        """
+        Args:
+            pro_mixer: ProMixer da controllare
+            interval: Durata (secondi) di ogni finestra di misura
+            steps: Buffer size ammessi, in ordine crescente
+            low_load: Sotto questo carico (p99 / deadline) si può scendere di uno step
+            high_load: Sopra questo carico (o con xrun) si sale subito di uno step
+            stable_windows: Finestre consecutive sotto low_load prima di scendere
+            percentile: Percentile della durata callback usato come carico
+            on_decision: Callback chiamata (dal thread del controller) a ogni cambio
+        """
+        self.pro_mixer = pro_mixer
+        self.interval = interval
+        self.steps = tuple(sorted(steps))
+        self.low_load = low_load
+        self.high_load = high_load
+        self.stable_windows = stable_windows
+        self.percentile = percentile
+        self.on_decision = on_decision
+
+        # Storico decisioni (per UI e debug)
+        self.history = deque(maxlen=200)
+        self.last_window: Dict[str, dict] = {}
+
+        self._good_windows = 0
+        # Isteresi: se una discesa viene annullata subito, servono più finestre stabili la volta dopo
+        self._backoff = 1
+        self._last_step_down = None
+        self._last_xruns: Dict[str, int] = {}
+
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def available(self) -> bool:
+        """False con il block size scelto dal driver (driver_blocksize): gli stream vengono
+        aperti con blocksize=0, cambiare il buffer dell'engine non cambia la latenza del device"""
+        return not self.pro_mixer.driver_blocksize
+
+    def start(self):
+        """Avvia il controller in un thread in background"""
+        if self.is_running:
+            return
+        if not self.available:
+            print("🤖 Latenza automatica non disponibile: il block size è scelto dal driver")
+            return
+        self._stop_event.clear()
+        self._reset_window()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="latency-controller")
+        self._thread.start()
+        print(f"🤖 Latenza automatica attiva (buffer {self.pro_mixer.buffer_size}, step {list(self.steps)})")
+
+    def stop(self):
+        """Ferma il controller (il buffer size attuale resta invariato)"""
+        self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.interval + 3.0)
+        self._thread = None
+        print("🤖 Latenza automatica disattivata")
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.evaluate()
+            except Exception as e:
+                print(f"⚠️ Latency controller: {e}")
+
+    def _reset_window(self):
+        """Scarta le statistiche raccolte finora (es. dopo un cambio di buffer)"""
+        for bus_name, bus in self.pro_mixer.buses.items():
+            bus.callback_stats.clear()
+            self._last_xruns[bus_name] = bus.xrun_count
+
+    def _collect_window(self) -> Dict[str, dict]:
+        """Statistiche per bus dell'ultima finestra"""
+        window = {}
+        for bus_name, bus in self.pro_mixer.buses.items():
+            if bus.stream is None:
+                continue
+            samples = []
+            while bus.callback_stats:
+                samples.append(bus.callback_stats.popleft())
+            xruns = bus.xrun_count - self._last_xruns.get(bus_name, 0)
+            self._last_xruns[bus_name] = bus.xrun_count
+            if not samples:
+                continue
+            durations = np.array([d for d, _ in samples])
+            deadline = samples[-1][1]
+            p = float(np.percentile(durations, self.percentile))
+            window[bus_name] = {
+                'callbacks': len(samples),
+                'p50_ms': float(np.percentile(durations, 50)) * 1000,
+                'p99_ms': p * 1000,
+                'deadline_ms': deadline * 1000,
+                'load': p / deadline if deadline > 0 else 0.0,
+                'xruns': xruns,
+            }
+        return window
+
+    def evaluate(self) -> Optional[dict]:
+        """Valuta una finestra e, se serve, cambia il buffer size
+
+        Returns:
+            La decisione presa (dizionario) oppure None se il buffer resta invariato
+        """
+        window = self._collect_window()
+        self.last_window = window
+        if not window or not self.available:
+            return None
+
+        current = self.pro_mixer.buffer_size
+        max_load = max(w['load'] for w in window.values())
+        xruns = sum(w['xruns'] for w in window.values())
+        worst_bus = max(window, key=lambda name: window[name]['load'])
+
+        idx = self._step_index(current)
+        target = None
+        reason = None
+
+        if xruns > 0 or max_load > self.high_load:
+            # Deadline a rischio: sali subito di uno step
+            self._good_windows = 0
+            if idx < len(self.steps) - 1:
+                target = self.steps[idx + 1]
+                reason = (f"{xruns} xrun" if xruns > 0 else
+                          f"carico p{self.percentile:.0f} {max_load:.0%} su {worst_bus}")
+                # Discesa annullata subito: raddoppia le finestre stabili richieste
+                if self._last_step_down == current:
+                    self._backoff = min(self._backoff * 2, 16)
+        elif max_load < self.low_load:
+            self._good_windows += 1
+            if idx > 0 and self._good_windows >= self.stable_windows * self._backoff:
+                target = self.steps[idx - 1]
+                reason = f"margine: carico p{self.percentile:.0f} {max_load:.0%} per {self._good_windows} finestre"
+        else:
+            # Zona di isteresi: nessun cambio
+            self._good_windows = 0
+
+        if target is None:
+            return None
+
+        decision = {
+            'time': time.strftime('%H:%M:%S'),
+            'from': current,
+            'to': target,
+            'reason': reason,
+            'load': max_load,
+            'xruns': xruns,
+            'buses': window,
+        }
+        direction = "⬇️" if target < current else "⬆️"
+        print(f"🤖 {direction} Latenza automatica: {current} → {target} samples ({reason})")
+
+        swapped = self.pro_mixer.hot_swap(buffer_size=target)
+        decision['applied'] = self.pro_mixer.buffer_size == target
+        decision['swapped_buses'] = swapped
+        self.history.append(decision)
+
+        self._last_step_down = target if target < current else None
+        self._good_windows = 0
+        self._reset_window()
+
+        if self.on_decision:
+            self.on_decision(decision)
+        return decision
+
+    def _step_index(self, buffer_size: int) -> int:
+        """Indice dello step più vicino al buffer size attuale"""
+        return int(np.argmin([abs(step - buffer_size) for step in self.steps]))
+
+    def get_history(self) -> List[dict]:
+        return list(self.history)
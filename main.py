@@ -10,9 +10,11 @@ import time
 from audio_engine import AudioMixer, AudioClip
 from youtube_downloader import YouTubeDownloader
 from mixer_engine import ProMixer, MixerChannel, OutputBus
+from media_stream import ProgressiveStream
+from latency_controller import AdaptiveLatencyController
+from realtime_audio import GcScheduler
 from threading import Thread
 from typing import Dict, Optional
-import numpy as np
 import keyboard
 import json
 import sounddevice as sd
@@ -123,10 +125,32 @@ class AudioMixerApp(ctk.CTk):
         
         # Buffer 1024 per stabilità audio (riduce scricchiolii)
         # Latenza: ~21ms @ 48kHz (accettabile per streaming/Discord)
-        self.pro_mixer = ProMixer(sample_rate=primary_sr, buffer_size=1024)
+        # Quanto interno 128/256 (indipendente dai blocchi dei dispositivi)
+        self.pro_mixer = ProMixer(sample_rate=primary_sr, buffer_size=1024,
+                                  quantum=saved_config.get('processing_quantum', 256))
+        # Block size scelto dal driver (blocksize=0) invece del buffer dei preset
+        self.pro_mixer.driver_blocksize = saved_config.get('driver_blocksize', False)
+        # Canali e bus aggiunti dall'utente (prima della UI: le strip vengono create per tutti)
+        self.pro_mixer.apply_layout(saved_config.get('pro_mixer', {}).get('layout', {}))
+        # Jitter buffer dei microfoni: latenza target e correzione del drift di clock
+        if 'input_latency_ms' in saved_config:
+            self.pro_mixer.set_input_latency_target(float(saved_config['input_latency_ms']))
+        if not saved_config.get('input_drift_compensation', True):
+            self.pro_mixer.set_drift_compensation(False)
         self.pro_mixer_widgets = {}  # Widgets mixer tab
         self.pro_mixer_running = False
         
+        # Controller latenza automatica (opzionale, attivabile dal tab Audio)
+        self.latency_controller = AdaptiveLatencyController(
+            self.pro_mixer,
+            on_decision=lambda decision: self.after(0, lambda: self._on_latency_decision(decision))
+        )
+        
+        # Priorità real-time dei thread audio e GC fuori dalle callback (opzionali)
+        self.pro_mixer.configure_realtime(saved_config.get('realtime_audio', False),
+                                          saved_config.get('audio_cpu_affinity'))
+        self.gc_scheduler = GcScheduler(self.pro_mixer)
+        
         # Configura bus del ProMixer
         self.pro_mixer.set_bus_device('A1', output_device if output_device else 61)  # CABLE o default
         
@@ -220,7 +244,11 @@ class AudioMixerApp(ctk.CTk):
         self.create_audio_settings_tab()
         self.create_control_panel()
         
-        # Avvia ProMixer
+        # Carica configurazione salvata (clip e hotkey) prima degli stream, per il pre-warm
+        self.load_config()
+        self.mixer.prewarm_clips(list(self.hotkey_bindings.keys()))
+        
+        # Avvia ProMixer (pre-warm dell'engine incluso)
         print("\n🎛️ Avvio ProMixer...")
         self.pro_mixer.start_all()
         self.pro_mixer_running = True
@@ -228,12 +256,13 @@ class AudioMixerApp(ctk.CTk):
         # Avvia mixer soundboard
         self.mixer.start()
         
+        # Latenza automatica (se attivata in precedenza)
+        if self.adaptive_latency_var.get():
+            self.latency_controller.start()
+        
         # Avvia aggiornamento VU meter
         self.after(100, self.update_meters)
         
-        # Carica configurazione salvata
-        self.load_config()
-        
         # Ripristina configurazione ProMixer dopo il caricamento
         self.restore_promixer_config()
         
@@ -269,12 +298,29 @@ class AudioMixerApp(ctk.CTk):
         except Exception as e:
             logger.error(f"Errore registrazione hotkeys pagine: {e}", exc_info=True)
         
+        # Instant replay: buffer sempre attivo sul bus scelto, hotkey per salvarlo
+        self.replay_hook = None
+        self.setup_instant_replay()
+        
         # Intercepta chiusura finestra per chiudere direttamente
         self.protocol("WM_DELETE_WINDOW", self.quit_app)
         
         # Inizializza system tray se disponibile
         if TRAY_AVAILABLE:
             self.setup_system_tray()
+        
+        # Avvio completato: congela gli oggetti creati finora e sposta il GC nelle finestre idle
+        if self.realtime_audio_var.get():
+            self.gc_scheduler.freeze()
+            self.after(200, self._gc_idle_tick)
+    
+    def _gc_idle_tick(self):
+        """Collezioni del GC dal thread UI, subito dopo una callback audio"""
+        if not self.gc_scheduler.active:
+            return
+        done = self.gc_scheduler.collect_if_idle()
+        # Finestra non idle: riprova a breve, altrimenti controllo normale
+        self.after(200 if done else 3, self._gc_idle_tick)
     
     def create_sidebar(self):
         """Crea la sidebar sinistra"""
@@ -791,6 +837,40 @@ class AudioMixerApp(ctk.CTk):
         )
         self.record_btn.pack(fill="x", pady=(10, 0))
         
+        # Multitraccia: un file per canale (mic, soundboard, media player) e per bus
+        self.multitrack_btn = ctk.CTkButton(
+            rec_frame,
+            text="🎚️ Avvia Multitraccia",
+            command=self.toggle_multitrack,
+            fg_color=COLORS["bg_card"],
+            hover_color=COLORS["accent_hover"],
+            height=32
+        )
+        self.multitrack_btn.pack(fill="x", pady=(6, 0))
+        
+        # Instant replay: ultimi minuti di un bus, salvati con una hotkey
+        self.replay_btn = ctk.CTkButton(
+            rec_frame,
+            text="⏪ Avvia Instant Replay",
+            command=self.toggle_instant_replay,
+            fg_color=COLORS["bg_card"],
+            hover_color=COLORS["accent_hover"],
+            height=32
+        )
+        self.replay_btn.pack(fill="x", pady=(6, 0))
+        
+        # Cattura in clip: dal canale scelto direttamente a una nuova clip della soundboard
+        self.capture_btn = ctk.CTkButton(
+            rec_frame,
+            text="✂️ Cattura Clip",
+            command=self.toggle_clip_capture,
+            fg_color=COLORS["bg_card"],
+            hover_color=COLORS["accent_hover"],
+            height=32
+        )
+        self.capture_btn.pack(fill="x", pady=(6, 0))
+        self.clip_capture = None
+        
         self.is_recording = False
     
     def add_clip(self):
@@ -976,35 +1056,150 @@ class AudioMixerApp(ctk.CTk):
     def toggle_recording(self):
         """Avvia/ferma la registrazione dall'output A1 (Discord/streaming)"""
         if not self.is_recording:
-            # Usa ProMixer invece di AudioMixer per registrare
-            self.pro_mixer.start_recording('A1')
+            # File scelto all'avvio: l'audio viene scritto su disco mentre si registra
+            output_file = filedialog.asksaveasfilename(
+                defaultextension=".wav",
+                filetypes=[("WAV files", "*.wav"), ("FLAC files", "*.flac")],
+                initialfile=f"recording_{int(time.time())}.wav"
+            )
+            if not output_file:
+                return
+            # Formato campioni: PCM_16 (default), PCM_24 o FLOAT (solo WAV)
+            subtype = self.load_config_dict().get('recording_subtype', 'PCM_16')
+            if output_file.lower().endswith('.flac') and subtype == 'FLOAT':
+                subtype = 'PCM_24'
+            try:
+                # Usa ProMixer invece di AudioMixer per registrare
+                self.pro_mixer.start_recording('A1', output_file, subtype)
+            except Exception as e:
+                messagebox.showerror("Errore", f"Impossibile avviare la registrazione:\n{e}")
+                return
             self.is_recording = True
             self.record_btn.configure(
                 text="⏹ Ferma Registrazione",
                 fg_color="#ff0000"
             )
-            messagebox.showinfo("🔴 Registrazione", "Registrazione avviata da bus A1\n(Discord/Streaming output)")
+            messagebox.showinfo("🔴 Registrazione", f"Registrazione avviata da bus A1\n(Discord/Streaming output)\n\n{output_file}")
         else:
-            output_file = filedialog.asksaveasfilename(
-                defaultextension=".wav",
-                filetypes=[("WAV files", "*.wav")],
-                initialfile=f"recording_{int(time.time())}.wav"
-            )
-            
-            if output_file:
-                self.pro_mixer.stop_recording(output_file)
-                messagebox.showinfo("✓ Registrazione", f"File salvato:\n{output_file}")
-            else:
-                # Salva comunque con nome default
-                default_name = f"recording_{int(time.time())}.wav"
-                self.pro_mixer.stop_recording(default_name)
-                messagebox.showinfo("✓ Registrazione", f"File salvato:\n{default_name}")
-            
+            # Stop immediato: il file viene completato in background
+            output_file = self.pro_mixer.stop_recording()
             self.is_recording = False
             self.record_btn.configure(
                 text="⏺ Avvia Registrazione",
                 fg_color=COLORS["accent"]
             )
+            if output_file:
+                messagebox.showinfo("✓ Registrazione", f"File salvato:\n{output_file}")
+    
+    def toggle_multitrack(self):
+        """Avvia/ferma la registrazione multitraccia di canali e bus attivi"""
+        if self.pro_mixer.stem_session is None:
+            output_dir = filedialog.askdirectory(title="Cartella per le sessioni multitraccia")
+            if not output_dir:
+                return
+            config = self.load_config_dict()
+            try:
+                session_dir = self.pro_mixer.start_multitrack(
+                    output_dir,
+                    buses=self.pro_mixer.active_bus_names(),
+                    tap=config.get('stem_tap', 'post'),
+                    subtype=config.get('stem_subtype', 'PCM_24'))
+            except Exception as e:
+                messagebox.showerror("Errore", f"Impossibile avviare la multitraccia:\n{e}")
+                return
+            self.multitrack_btn.configure(text="⏹ Ferma Multitraccia", fg_color="#ff0000")
+            print(f"🎚️ Sessione multitraccia: {session_dir}")
+        else:
+            manifest = self.pro_mixer.stop_multitrack()
+            self.multitrack_btn.configure(text="🎚️ Avvia Multitraccia", fg_color=COLORS["bg_card"])
+            if manifest:
+                messagebox.showinfo("✓ Multitraccia", f"Sessione salvata:\n{os.path.dirname(manifest)}")
+    
+    def get_replay_config(self) -> dict:
+        """Impostazioni instant replay (bus, durata, hotkey, destinazione 'clip' o 'file')"""
+        config = {'enabled': False, 'bus': 'A1', 'seconds': 120, 'hotkey': 'f9', 'target': 'clip'}
+        config.update(self.load_config_dict().get('instant_replay', {}))
+        return config
+    
+    def setup_instant_replay(self):
+        """Avvia il buffer se abilitato e registra la hotkey di salvataggio"""
+        config = self.get_replay_config()
+        if config['enabled']:
+            try:
+                self.pro_mixer.start_replay(config['bus'], config['seconds'])
+                self.replay_btn.configure(text="⏹ Ferma Instant Replay", fg_color=COLORS["accent"])
+            except Exception as e:
+                logger.error(f"Errore avvio instant replay: {e}", exc_info=True)
+        try:
+            # Il callback arriva dal thread di keyboard: il salvataggio passa dal thread UI
+            def replay_callback(e):
+                if e.event_type == 'down':
+                    self.after(0, self.save_instant_replay)
+            self.replay_hook = keyboard.hook_key(config['hotkey'], replay_callback, suppress=False)
+            logger.info(f"Hotkey instant replay registrato: {config['hotkey'].upper()} = Salva replay")
+        except Exception as e:
+            logger.error(f"Errore registrazione hotkey instant replay: {e}", exc_info=True)
+    
+    def toggle_instant_replay(self):
+        """Avvia/ferma il buffer di instant replay sul bus configurato"""
+        config = self.get_replay_config()
+        if config['bus'] in self.pro_mixer.replay_buffers:
+            self.pro_mixer.stop_replay(config['bus'])
+            self.replay_btn.configure(text="⏪ Avvia Instant Replay", fg_color=COLORS["bg_card"])
+            enabled = False
+        else:
+            try:
+                self.pro_mixer.start_replay(config['bus'], config['seconds'])
+            except Exception as e:
+                messagebox.showerror("Errore", f"Impossibile avviare l'instant replay:\n{e}")
+                return
+            self.replay_btn.configure(text="⏹ Ferma Instant Replay", fg_color=COLORS["accent"])
+            enabled = True
+        self.replay_enabled = enabled
+        self.save_config()
+    
+    def save_instant_replay(self):
+        """Salva il replay (hotkey): in una nuova clip della soundboard o in un file"""
+        config = self.get_replay_config()
+        replay = self.pro_mixer.replay_buffers.get(config['bus'])
+        if replay is None:
+            print("⚠️ Instant replay non attivo")
+            return
+        if config['target'] == 'clip':
+            folder = self.clips_folder
+        else:
+            folder = os.path.join(self.base_dir, "replays")
+        output_path = os.path.join(folder, replay.default_filename())
+        
+        def on_done(path):
+            if path and config['target'] == 'clip':
+                self.after(0, lambda: self._add_clip_from_file(path))
+        
+        # Copia e scrittura su un thread separato: il thread audio non viene toccato
+        self.pro_mixer.save_replay(config['bus'], output_path, on_done=on_done)
+    
+    def toggle_clip_capture(self):
+        """Avvia/ferma la cattura del canale configurato (default HW1, microfono) in una clip"""
+        if self.clip_capture is None:
+            source = self.load_config_dict().get('clip_capture_source', 'HW1')
+            try:
+                self.clip_capture = self.pro_mixer.start_clip_capture(source)
+            except Exception as e:
+                messagebox.showerror("Errore", f"Impossibile catturare da {source}:\n{e}")
+                return
+            self.capture_btn.configure(text="⏹ Ferma Cattura", fg_color="#ff0000")
+        else:
+            capture, self.clip_capture = self.clip_capture, None
+            self.capture_btn.configure(text="✂️ Cattura Clip", fg_color=COLORS["bg_card"])
+            # Clip subito disponibile dalla memoria; il file viene scritto in background
+            clip = self.pro_mixer.stop_clip_capture(
+                capture, folder=self.clips_folder,
+                on_saved=lambda path: self.after(0, self.save_config) if path else None)
+            if clip is None:
+                messagebox.showinfo("✂️ Cattura Clip", "Nessun audio catturato (solo silenzio)")
+                return
+            clip.is_looping = self.loop_enabled
+            self._add_clip_widget(clip.name)
     
     def load_project(self):
         """Carica un progetto esistente"""
@@ -1365,6 +1560,39 @@ class AudioMixerApp(ctk.CTk):
         )
         self.latency_label.grid(row=0, column=5, padx=10)
         
+        # Latenza automatica: sceglie il buffer dal carico misurato
+        self.adaptive_latency_var = ctk.BooleanVar(value=self.load_config_dict().get('adaptive_latency', False))
+        ctk.CTkSwitch(
+            latency_frame,
+            text="🤖 Automatica (sceglie il buffer più basso stabile)",
+            variable=self.adaptive_latency_var,
+            command=self.toggle_adaptive_latency,
+            font=ctk.CTkFont(size=11),
+            progress_color=COLORS["accent"],
+            # Block size scelto dal driver: il buffer dell'engine non cambia la latenza del device
+            state="normal" if self.latency_controller.available else "disabled"
+        ).grid(row=1, column=1, columnspan=3, pady=(8, 0), sticky="w")
+        
+        self.latency_decision_label = ctk.CTkLabel(
+            latency_frame,
+            text="" if self.latency_controller.available else
+                 "Non disponibile: block size deciso dal driver (driver_blocksize)",
+            font=ctk.CTkFont(size=10),
+            text_color=COLORS["text_muted"]
+        )
+        self.latency_decision_label.grid(row=1, column=4, columnspan=2, pady=(8, 0), padx=10, sticky="w")
+        
+        # Priorità real-time per i thread audio + GC fuori dalle callback
+        self.realtime_audio_var = ctk.BooleanVar(value=self.pro_mixer.realtime_priority)
+        ctk.CTkSwitch(
+            latency_frame,
+            text="⚡ Priorità real-time ai thread audio (meno xrun con i giochi aperti)",
+            variable=self.realtime_audio_var,
+            command=self.toggle_realtime_audio,
+            font=ctk.CTkFont(size=11),
+            progress_color=COLORS["accent"]
+        ).grid(row=2, column=1, columnspan=4, pady=(8, 0), sticky="w")
+        
         ctk.CTkLabel(
             sr_frame,
             text="ℹ️ Cambia solo se l'audio è distorto/robotico. I bus useranno sempre il sample rate nativo dei dispositivi.",
@@ -1508,7 +1736,7 @@ class AudioMixerApp(ctk.CTk):
             else:
                 msg += "✓ ALTA STABILITÀ:\n• Latenza maggiore ma audio stabile\n• Usa se hai glitch audio\n\n"
             
-            msg += "Il mixer verrà riavviato."
+            msg += "Il cambio avviene senza interrompere l'audio (cross-fade tra gli stream)."
             
             result = messagebox.askyesno("Cambia Buffer Size", msg)
             if not result:
@@ -1516,38 +1744,13 @@ class AudioMixerApp(ctk.CTk):
             
             print(f"🔄 Cambio buffer size: {current_buffer} → {new_buffer_size} samples")
             
-            # Ferma tutti gli stream
+            # Hot-swap: i nuovi stream vengono aperti in background e sostituiscono
+            # i vecchi al confine del blocco, senza buchi nell'audio
             was_running = self.pro_mixer_running
-            active_buses = []
-            
-            if was_running:
-                print(f"   Fermando bus attivi...")
-                for bus_name, bus in self.pro_mixer.buses.items():
-                    if bus.stream and bus.device_id is not None:
-                        try:
-                            bus.stream.stop()
-                            bus.stream.close()
-                            bus.stream = None
-                            active_buses.append(bus_name)
-                            print(f"   ✓ Bus {bus_name} fermato")
-                        except:
-                            pass
-            
-            # Cambia buffer size
-            self.pro_mixer.buffer_size = new_buffer_size
+            active_buses = self.pro_mixer.hot_swap(buffer_size=new_buffer_size)
             self.mixer.buffer_size = new_buffer_size
             print(f"   ✓ Buffer size aggiornato: {new_buffer_size} samples")
             
-            # Riavvia bus attivi
-            if was_running and active_buses:
-                print(f"   Riavvio bus con nuovo buffer size...")
-                for bus_name in active_buses:
-                    try:
-                        self.pro_mixer.start_output(bus_name)
-                        print(f"   ✓ Bus {bus_name} riavviato")
-                    except Exception as e:
-                        print(f"   ✗ Errore riavvio Bus {bus_name}: {e}")
-            
             # Aggiorna label latenza
             latency_ms = (new_buffer_size / self.pro_mixer.sample_rate) * 1000
             self.latency_label.configure(text=f"({latency_ms:.1f}ms @ {self.pro_mixer.sample_rate}Hz)")
@@ -1555,7 +1758,7 @@ class AudioMixerApp(ctk.CTk):
             msg_result = f"✓ Buffer size: {new_buffer_size} samples\n✓ Latenza: {latency_ms:.1f}ms @ {self.pro_mixer.sample_rate}Hz\n\n"
             
             if was_running and active_buses:
-                msg_result += f"✓ Bus audio riavviati: {', '.join(active_buses)}\n\n"
+                msg_result += f"✓ Bus audio aggiornati senza interruzioni: {', '.join(active_buses)}\n\n"
             
             msg_result += "Testa l'audio. Se senti glitch/interruzioni,\naumenta il buffer size."
             
@@ -1565,6 +1768,42 @@ class AudioMixerApp(ctk.CTk):
             messagebox.showerror("Errore", f"Errore cambio buffer size:\n{str(e)}")
             print(f"❌ Errore set_buffer_size: {e}")
     
+    def toggle_adaptive_latency(self):
+        """Attiva/disattiva il controller di latenza automatica"""
+        if self.adaptive_latency_var.get():
+            if not self.latency_controller.available:
+                self.latency_decision_label.configure(
+                    text="Non disponibile: block size deciso dal driver (driver_blocksize)")
+                return
+            self.latency_controller.start()
+            self.latency_decision_label.configure(text="In osservazione del carico...")
+        else:
+            self.latency_controller.stop()
+            self.latency_decision_label.configure(text="")
+        self.save_config()
+    
+    def toggle_realtime_audio(self):
+        """Attiva/disattiva priorità real-time e GC nelle finestre idle"""
+        enabled = self.realtime_audio_var.get()
+        self.pro_mixer.configure_realtime(enabled, self.pro_mixer.cpu_affinity)
+        if enabled:
+            self.gc_scheduler.freeze()
+            self.after(200, self._gc_idle_tick)
+            print("⚡ Priorità real-time attiva (thread audio elevati alla prossima callback)")
+        else:
+            self.gc_scheduler.release()
+            print("⚡ Priorità real-time disattivata (effettiva al riavvio degli stream)")
+        self.save_config()
+    
+    def _on_latency_decision(self, decision):
+        """Aggiorna la UI dopo un cambio di buffer deciso dal controller"""
+        self.mixer.buffer_size = self.pro_mixer.buffer_size
+        latency_ms = (self.pro_mixer.buffer_size / self.pro_mixer.sample_rate) * 1000
+        self.latency_label.configure(text=f"({latency_ms:.1f}ms @ {self.pro_mixer.sample_rate}Hz)")
+        self.latency_decision_label.configure(
+            text=f"{decision['time']}: {decision['from']} → {decision['to']} ({decision['reason']})"
+        )
+    
     def open_windows_audio_settings(self):
         """Apre le impostazioni audio di Windows con istruzioni"""
         import subprocess
@@ -1609,6 +1848,15 @@ class AudioMixerApp(ctk.CTk):
                 messagebox.showinfo("Sample Rate", f"Il sistema usa già {new_samplerate} Hz!")
                 return
             
+            # I file in registrazione hanno il sample rate nell'header
+            blockers = self.pro_mixer.rate_change_blockers()
+            if blockers:
+                messagebox.showwarning(
+                    "Sample Rate",
+                    f"Impossibile cambiare il sample rate durante la {' e la '.join(blockers)}.\n\n"
+                    f"Ferma la registrazione e riprova.")
+                return
+            
             # Avvisa che serve cambiare anche Windows
             result = messagebox.askyesno(
                 "Cambia Sample Rate Sistema",
@@ -1634,58 +1882,21 @@ class AudioMixerApp(ctk.CTk):
             print(f"   ProMixer attuale: {self.pro_mixer.sample_rate} Hz")
             print(f"   Soundboard attuale: {self.mixer.sample_rate} Hz")
             
-            # Se il mixer è attivo, ferma tutti gli stream prima di cambiare
+            # Hot-swap: canali, bus e stream passano al nuovo sample rate al confine
+            # del blocco, mantenendo posizioni di riproduzione e stato degli effetti
             was_running = self.pro_mixer_running
-            active_buses = []
-            
-            if was_running:
-                print(f"   Fermando bus attivi...")
-                for bus_name, bus in self.pro_mixer.buses.items():
-                    if bus.stream and bus.device_id is not None:
-                        try:
-                            bus.stream.stop()
-                            bus.stream.close()
-                            bus.stream = None
-                            active_buses.append(bus_name)
-                            print(f"   ✓ Bus {bus_name} fermato")
-                        except:
-                            pass
-            
-            # Aggiorna sample rate interno
-            self.pro_mixer.sample_rate = new_samplerate
+            active_buses = self.pro_mixer.hot_swap(sample_rate=new_samplerate)
             self.mixer.sample_rate = new_samplerate
             print(f"   ✓ Sample rate processing aggiornato: {new_samplerate} Hz")
             print(f"   ProMixer dopo cambio: {self.pro_mixer.sample_rate} Hz")
             print(f"   Soundboard dopo cambio: {self.mixer.sample_rate} Hz")
             
-            # Aggiorna sample rate anche nei canali del ProMixer
-            for channel_id, channel in self.pro_mixer.channels.items():
-                channel.sample_rate = new_samplerate
-                print(f"   ✓ Canale {channel_id} sample_rate aggiornato")
-            
-            # Aggiorna sample rate nei bus del ProMixer
-            for bus_name, bus in self.pro_mixer.buses.items():
-                bus.sample_rate = new_samplerate
-                print(f"   ✓ Bus {bus_name} sample_rate aggiornato")
-            
-            # Riavvia i bus che erano attivi
-            if was_running and active_buses:
-                print(f"   Riavvio bus con nuovo sample rate...")
-                for bus_name in active_buses:
-                    bus = self.pro_mixer.buses[bus_name]
-                    if bus.device_id is not None:
-                        success = self.pro_mixer.start_output(bus_name)
-                        if success:
-                            print(f"   ✓ Bus {bus_name} riavviato")
-                        else:
-                            print(f"   ✗ Errore riavvio Bus {bus_name}")
-            
             # Aggiorna label
             self.processing_sr_label.configure(text=f"Processing interno: {new_samplerate} Hz")
             
             msg = f"✓ Processing interno: {new_samplerate} Hz\n\n"
             if was_running and active_buses:
-                msg += f"✅ Bus audio riavviati:\n"
+                msg += f"✅ Bus audio aggiornati senza interruzioni:\n"
                 for bus_name in active_buses:
                     bus = self.pro_mixer.buses[bus_name]
                     if bus.stream:
@@ -1899,9 +2110,7 @@ class AudioMixerApp(ctk.CTk):
             bus_a1 = self.pro_mixer.buses['A1']
             if bus_a1.stream:
                 print(f"   Fermando stream esistente Bus A1...")
-                bus_a1.stream.stop()
-                bus_a1.stream.close()
-                bus_a1.stream = None
+                self.pro_mixer.stop_output('A1')
             
             bus_a1.device_id = primary_device
             print(f"   Bus A1 → Device {primary_device}")
@@ -1916,9 +2125,7 @@ class AudioMixerApp(ctk.CTk):
                 bus_a2 = self.pro_mixer.buses['A2']
                 if bus_a2.stream:
                     print(f"   Fermando stream esistente Bus A2...")
-                    bus_a2.stream.stop()
-                    bus_a2.stream.close()
-                    bus_a2.stream = None
+                    self.pro_mixer.stop_output('A2')
                 
                 bus_a2.device_id = secondary_device
                 print(f"   Bus A2 → Device {secondary_device}")
@@ -2099,6 +2306,16 @@ class AudioMixerApp(ctk.CTk):
         )
         info_sync.grid(row=1, column=0, columnspan=2, pady=(5, 0), sticky="w")
         
+        # Stato CPU governor (effetti ridotti quando la CPU non tiene il passo)
+        self.cpu_governor_label = ctk.CTkLabel(
+            header_frame,
+            text="",
+            font=ctk.CTkFont(size=11, weight="bold"),
+            text_color=COLORS["warning"]
+        )
+        self.cpu_governor_label.grid(row=2, column=0, columnspan=2, pady=(2, 0), sticky="w")
+        self._governor_event_count = 0
+        
         # Main mixer container
         mixer_container = ctk.CTkScrollableFrame(
             self.tab_mixer,
@@ -2335,6 +2552,19 @@ class AudioMixerApp(ctk.CTk):
         )
         self.yt_loop_btn.pack(side="left", padx=2)
         
+        # Traccia successiva della playlist (coda dalla libreria)
+        self.yt_next_btn = ctk.CTkButton(
+            controls_frame,
+            text="⏭️",
+            width=45,
+            height=35,
+            fg_color=COLORS["bg_card"],
+            hover_color=COLORS["bg_secondary"],
+            command=self.skip_media_track,
+            font=ctk.CTkFont(size=12, weight="bold")
+        )
+        self.yt_next_btn.pack(side="left", padx=2)
+        
         # Volume slider
         vol_frame = ctk.CTkFrame(yt_frame, fg_color="transparent")
         vol_frame.grid(row=3, column=1, padx=15, pady=10, sticky="ew")
@@ -2363,6 +2593,45 @@ class AudioMixerApp(ctk.CTk):
         )
         self.yt_volume_label.pack(side="left")
         
+        # Velocità e pitch (time-stretch in tempo reale, indipendenti tra loro)
+        ctk.CTkLabel(
+            vol_frame,
+            text="⏩ Velocità:",
+            font=ctk.CTkFont(size=11)
+        ).pack(side="left", padx=(15, 5))
+        
+        self.yt_speed_menu = ctk.CTkOptionMenu(
+            vol_frame,
+            values=["0.5x", "0.75x", "0.9x", "1x", "1.1x", "1.25x", "1.5x", "2x"],
+            width=75,
+            fg_color=COLORS["bg_card"],
+            button_color=COLORS["accent"],
+            button_hover_color=COLORS["accent_hover"],
+            command=self.on_media_speed_change,
+            font=ctk.CTkFont(size=11)
+        )
+        self.yt_speed_menu.set("1x")
+        self.yt_speed_menu.pack(side="left", padx=5)
+        
+        ctk.CTkLabel(
+            vol_frame,
+            text="🎼 Pitch:",
+            font=ctk.CTkFont(size=11)
+        ).pack(side="left", padx=(10, 5))
+        
+        self.yt_pitch_menu = ctk.CTkOptionMenu(
+            vol_frame,
+            values=[f"{st:+d}" if st else "0" for st in range(-12, 13)],
+            width=65,
+            fg_color=COLORS["bg_card"],
+            button_color=COLORS["accent"],
+            button_hover_color=COLORS["accent_hover"],
+            command=self.on_media_pitch_change,
+            font=ctk.CTkFont(size=11)
+        )
+        self.yt_pitch_menu.set("0")
+        self.yt_pitch_menu.pack(side="left", padx=5)
+        
         # Info: routing gestito dal canale HW3
         routing_info = ctk.CTkLabel(
             vol_frame,
@@ -2382,12 +2651,24 @@ class AudioMixerApp(ctk.CTk):
         self.yt_status_label.grid(row=0, column=1, columnspan=4, padx=15, pady=(10, 5), sticky="e")
         
         # Variabili stato media player
-        self.media_player_audio = None  # Dati audio caricati
-        self.media_player_sr = None  # Sample rate
-        self.media_player_positions = {}  # Posizioni per ogni bus (come AudioClip)
-        self.media_player_playing = False
+        # Media player dell'engine (canale HW3): una testina, decodifica in background
+        self.media_player = self.pro_mixer.media_player
+        self.media_player.volume = self.yt_volume_slider.get() / 100.0
+        self.media_player.on_finished = lambda: self.after(0, self._on_playback_finished)
+        self.media_player.on_track_change = lambda path: self.after(0, lambda: self._on_media_track_change(path))
+        # Playlist: tracce decodificate in anticipo e crossfade (0 = gapless)
+        media_config = self.load_config_dict()
+        self.media_player.prefetch_depth = max(1, int(media_config.get('media_prefetch_depth', 1)))
+        self.media_player.set_crossfade(float(media_config.get('media_crossfade_seconds', 0.0)))
+        # Time-stretch: 'fast', 'balanced' o 'quality' (qualità contro CPU per blocco)
+        try:
+            self.media_player.set_stretch_preset(media_config.get('media_stretch_preset', 'balanced'))
+        except ValueError as e:
+            print(f"⚠️ {e}")
         self.media_player_looping = False  # Stato loop media player
-        self.media_player_duration = 0  # Durata totale in samples
+        self.youtube_stream = None  # Download YouTube in riproduzione progressiva
+        self._media_seek_job = None  # Seek del trascinamento in attesa (uno ogni 40ms)
+        self._media_seek_target = 0.0
         
         # Avvia aggiornamento progress bar
         self.update_media_progress()
@@ -2471,7 +2752,7 @@ class AudioMixerApp(ctk.CTk):
         buttons_grid.pack()
         
         strip_frame.routing_buttons = {}
-        for i, bus_name in enumerate(['A1', 'A2', 'A3', 'B1', 'B2']):
+        for i, bus_name in enumerate(self.pro_mixer.buses):
             btn = ctk.CTkButton(
                 buttons_grid,
                 text=bus_name,
@@ -2690,6 +2971,8 @@ class AudioMixerApp(ctk.CTk):
                         y_top = 98 - height
                         meter.coords("level", 2, y_top, 28, 98)
                         meter.itemconfig("level", fill=color)
+            
+            self._update_governor_status()
         except Exception as e:
             pass  # Ignora errori durante update
         
@@ -2697,6 +2980,22 @@ class AudioMixerApp(ctk.CTk):
         if self.pro_mixer_running:
             self.after(50, self.update_meters)
     
+    def _update_governor_status(self):
+        """Mostra gli eventi del CPU governor (solo quando ce ne sono di nuovi)"""
+        governor = self.pro_mixer.governor
+        if governor.event_count == self._governor_event_count:
+            return
+        self._governor_event_count = governor.event_count
+        
+        last = governor.events[-1] if governor.events else None
+        if governor.degraded:
+            text = f"{governor.describe()} (carico {last['load']:.0%}, {last['time']})"
+        elif last is not None:
+            text = f"✓ CPU ok: qualità piena ripristinata ({last['time']})"
+        else:
+            text = ""
+        self.cpu_governor_label.configure(text=text)
+    
     def update_mixer_clips_list(self):
         """Aggiorna la lista delle clip nel mixer"""
         if not hasattr(self, 'mixer_clips_container'):
@@ -2860,57 +3159,19 @@ class AudioMixerApp(ctk.CTk):
             self.yt_status_label.configure(text="⏳ Caricamento file...")
             self.after(100, lambda: self._load_media_file(file_path, os.path.basename(file_path)))
     
+    @property
+    def media_player_playing(self) -> bool:
+        return self.media_player.playing
+    
     def _load_media_file(self, file_path, title):
-        """Carica file audio nel media player"""
+        """Carica file audio nel media player (streaming: decodifica e resampling in background)"""
         try:
-            import soundfile as sf
-            
-            # Carica file audio
-            audio_data, sr = sf.read(file_path, dtype='float32')
-            
-            print(f"📀 Media Player: {int(sr)}Hz", end="")
-            
-            # Converti a stereo se necessario
-            if len(audio_data.shape) == 1:
-                audio_data = np.column_stack([audio_data, audio_data])
-            
-            # Resample se necessario AL SAMPLE RATE DEL MIXER
-            target_sr = self.pro_mixer.sample_rate
-            print(f" → Target: {target_sr}Hz")
-            
-            if sr != target_sr:
-                print(f"   ⚠️ Resampling: {sr}Hz → {target_sr}Hz")
-                from scipy.signal import resample_poly
-                from math import gcd
-                g = gcd(target_sr, int(sr))
-                up = target_sr // g
-                down = int(sr) // g
-                
-                print(f"   Up={up}, Down={down}, GCD={g}")
-                
-                resampled_channels = []
-                for ch in range(audio_data.shape[1]):
-                    resampled_ch = resample_poly(audio_data[:, ch], up, down)
-                    resampled_channels.append(resampled_ch)
-                audio_data = np.column_stack(resampled_channels).astype(np.float32)
-                sr = target_sr
-                print(f" ✓")
-            
-            # STOP playback precedente se attivo
-            if hasattr(self, 'media_player_playing') and self.media_player_playing:
-                self.stop_youtube()
-            
-            # RESET COMPLETO stato media player
-            self.media_player_audio = audio_data
-            self.media_player_sr = target_sr  # USA IL TARGET, NON IL SR ORIGINALE
-            self.media_player_duration = len(audio_data)
-            self.media_player_positions = {}  # Reset posizioni per tutti i bus
-            self._media_positions = {}  # Reset posizioni callback (CRITICO!)
-            self.media_player_playing = False
-            self._media_debug_printed = False  # Reset flag debug
+            # Apre solo l'header: la decodifica parte subito in un thread separato
+            stream = self.media_player.load(file_path)
+            print(f"📀 Media Player: {stream.source_rate}Hz → Target: {stream.sample_rate}Hz (streaming)")
             
             # Aggiorna UI
-            duration_sec = self.media_player_duration / sr
+            duration_sec = stream.duration / stream.sample_rate
             duration_str = f"{int(duration_sec // 60)}:{int(duration_sec % 60):02d}"
             self.yt_duration_label.configure(text=duration_str)
             self.yt_status_label.configure(text=f"✅ {title[:40]}...", text_color=COLORS["success"])
@@ -2918,93 +3179,71 @@ class AudioMixerApp(ctk.CTk):
             self.yt_stop_btn.configure(state="normal")
             self.yt_progress_slider.configure(state="normal")
             
-            # Configura HW3 per ricevere audio
-            self._setup_media_player_hw3()
-            
         except Exception as e:
             messagebox.showerror("Errore", f"Impossibile caricare file:\n{e}")
             self.yt_status_label.configure(text="❌ Errore caricamento", text_color=COLORS["error"])
     
-    def _setup_media_player_hw3(self):
-        """Configura canale HW3 per ricevere audio dal media player"""
-        # Imposta callback per HW3
-        hw3_channel = self.pro_mixer.channels.get('HW3')
-        if hw3_channel:
-            hw3_channel.channel_type = 'python'  # Imposta come canale Python
-            hw3_channel.audio_callback = self._media_player_callback
+    def play_media_folder(self, folder_path):
+        """Riproduce tutti i file audio di una cartella della libreria come playlist"""
+        files = sorted(f for f in os.listdir(folder_path)
+                       if f.lower().endswith(('.mp3', '.wav', '.flac', '.ogg')))
+        if not files:
+            messagebox.showinfo("Playlist", "Nessun file audio nella cartella")
+            return
+        paths = [os.path.join(folder_path, f) for f in files]
+        try:
+            stream = self.media_player.set_playlist(paths)
+        except Exception as e:
+            messagebox.showerror("Errore", f"Impossibile caricare la playlist:\n{e}")
+            return
+        self._on_media_track_change(stream.path)
+        self.yt_play_btn.configure(state="normal")
+        self.yt_stop_btn.configure(state="normal")
+        self.yt_progress_slider.configure(state="normal")
+        print(f"📃 Playlist: {len(paths)} tracce da {folder_path}")
+        self.play_youtube()
+    
+    def enqueue_media(self, file_path):
+        """Aggiunge un file della libreria in coda al media player"""
+        if not self.media_player.is_loaded:
+            self._load_media_file(file_path, os.path.basename(file_path))
+            return
+        self.media_player.enqueue(file_path)
+        self.yt_status_label.configure(
+            text=f"➕ In coda: {os.path.basename(file_path)[:30]} ({len(self.media_player.queued_paths)})",
+            text_color=COLORS["accent"])
     
-    def _media_player_callback(self, frames, bus_name=None):
-        """Callback che fornisce audio al canale HW3
-        
-        Args:
-            frames: Numero di frame richiesti
-            bus_name: Nome del bus che richiede audio (per posizioni indipendenti)
-        """
+    def skip_media_track(self):
+        """Passa alla traccia successiva della playlist"""
         try:
-            if not self.media_player_playing or self.media_player_audio is None:
-                return np.zeros((frames, 2), dtype=np.float32)
-            
-            # POSIZIONI INDIPENDENTI PER OGNI BUS (come AudioClip)
-            # Ogni bus ha la sua posizione, così non si influenzano
-            
-            if not hasattr(self, '_media_positions'):
-                self._media_positions = {}
-                print(f"🎵 Media Player callback inizializzato - Duration: {self.media_player_duration} samples")
-            
-            # Ottieni o crea posizione per questo bus
-            if bus_name not in self._media_positions:
-                self._media_positions[bus_name] = 0
-            
-            position = self._media_positions[bus_name]
-            
-            # Genera audio per questo bus
-            start = position
-            end = min(start + frames, self.media_player_duration)
-            
-            audio = self.media_player_audio[start:end].copy()
-            
-            # Applica volume
-            volume = self.yt_volume_slider.get() / 100.0
-            audio *= volume
-            
-            # Pad se necessario
-            if len(audio) < frames:
-                padding = np.zeros((frames - len(audio), 2), dtype=np.float32)
-                audio = np.vstack([audio, padding])
-                # Fine file per questo bus
-                if position + frames >= self.media_player_duration:
-                    # Se TUTTI i bus hanno finito, ferma la riproduzione
-                    all_finished = all(pos >= self.media_player_duration for pos in self._media_positions.values())
-                    if all_finished:
-                        self.media_player_playing = False
-                        self.after(0, self._on_playback_finished)
-                        print(f"⏹️ Media Player: Fine riproduzione")
-            
-            # Avanza posizione per questo bus
-            self._media_positions[bus_name] = end
-            
-            return audio
+            if not self.media_player.skip():
+                self.yt_status_label.configure(text="Coda vuota", text_color=COLORS["text_muted"])
         except Exception as e:
-            print(f"❌ Errore in _media_player_callback: {e}")
-            import traceback
-            traceback.print_exc()
-            return np.zeros((frames, 2), dtype=np.float32)
+            messagebox.showerror("Errore", f"Impossibile passare alla traccia successiva:\n{e}")
+    
+    def _on_media_track_change(self, path):
+        """Aggiorna titolo e durata quando la playlist passa alla traccia successiva"""
+        duration_sec = self.media_player.duration / self.media_player.sample_rate
+        self.yt_duration_label.configure(text=f"{int(duration_sec // 60)}:{int(duration_sec % 60):02d}")
+        remaining = len(self.media_player.queued_paths)
+        self.yt_status_label.configure(
+            text=f"▶️ {os.path.basename(path)[:40]}" + (f" (+{remaining})" if remaining else ""),
+            text_color=COLORS["success"])
     
     def _on_playback_finished(self):
-        """Gestisce fine riproduzione"""
+        """Gestisce fine riproduzione (fine dell'ultima traccia della playlist)"""
         if self.media_player_looping:
-            # Riavvia la riproduzione se loop è attivo
-            self._media_positions = {}  # Reset posizioni corrette
-            self.media_player_playing = True
+            # Loop: riparte dalla prima traccia della playlist (una sola traccia: dall'inizio)
+            stream = self.media_player.restart()
+            if stream is not None and self.media_player.queued_paths:
+                self._on_media_track_change(stream.path)
+            self.media_player.play()
             self.yt_status_label.configure(text="🔁 Loop attivo", text_color=COLORS["accent"])
             print(f"🔁 Media Player: Riparte in loop")
         else:
+            self.media_player.seek(0)
             self.yt_status_label.configure(text="⏹️ Fine riproduzione", text_color=COLORS["text_muted"])
-            if hasattr(self, '_media_master_position'):
-                self._media_master_position = 0
-            if hasattr(self, '_media_positions'):
-                self._media_positions = {}
-            self.media_player_playing = False
+            print(f"⏹️ Media Player: Fine riproduzione")
     
     def load_youtube_url(self):
         """Carica audio da URL YouTube"""
@@ -3019,6 +3258,8 @@ class AudioMixerApp(ctk.CTk):
         
         # Ottieni formato selezionato
         selected_format = self.yt_format_menu.get().lower()  # 'wav' o 'mp3'
+        # Progressivo: la riproduzione parte mentre il file viene ancora scaricato
+        progressive = self.load_config_dict().get('youtube_progressive', True)
         
         def download_thread():
             try:
@@ -3030,6 +3271,7 @@ class AudioMixerApp(ctk.CTk):
                 ydl_opts_info = {
                     'quiet': True,
                     'no_warnings': True,
+                    'format': 'bestaudio/best',  # URL diretto del flusso audio in info['url']
                 }
                 
                 # Ottieni titolo video
@@ -3050,6 +3292,11 @@ class AudioMixerApp(ctk.CTk):
                     output_file = os.path.join(self.youtube_folder, f"{safe_title}_{counter}.{selected_format}")
                     counter += 1
                 
+                if progressive and info.get('url'):
+                    # Flusso audio → ffmpeg → media player, file della libreria scritto in parallelo
+                    self.after(0, lambda: self._start_progressive_youtube(info, output_file, selected_format, title))
+                    return
+                
                 # Opzioni yt-dlp per download
                 ydl_opts = {
                     'format': 'bestaudio/best',
@@ -3103,6 +3350,48 @@ class AudioMixerApp(ctk.CTk):
         import threading
         threading.Thread(target=download_thread, daemon=True).start()
     
+    def _start_progressive_youtube(self, info, output_file, file_format, title):
+        """Riproduce un audio YouTube mentre viene scaricato nella libreria"""
+        def on_complete(saved):
+            self.after(0, lambda: self._on_progressive_done(stream, saved, title))
+        
+        try:
+            stream = ProgressiveStream(
+                info['url'], self.media_player.sample_rate,
+                output_path=output_file, output_format=file_format,
+                headers=info.get('http_headers'),
+                duration_seconds=info.get('duration'),
+                on_complete=on_complete
+            )
+        except Exception as e:  # es. ffmpeg non installato
+            self._youtube_load_error(str(e))
+            return
+        
+        self.youtube_stream = stream
+        self.media_player.load_stream(stream)
+        print(f"📡 Riproduzione progressiva: {title}")
+        
+        duration_sec = stream.duration / stream.sample_rate
+        duration_str = f"{int(duration_sec // 60)}:{int(duration_sec % 60):02d}"
+        self.yt_duration_label.configure(text=duration_str)
+        self.yt_status_label.configure(text=f"📡 {title[:40]}... (download in corso)", text_color=COLORS["accent"])
+        self.yt_play_btn.configure(state="normal")
+        self.yt_stop_btn.configure(state="normal")
+        self.yt_progress_slider.configure(state="normal")
+        self.play_youtube()
+    
+    def _on_progressive_done(self, stream, saved, title):
+        """Fine del download progressivo: file nella libreria o errore"""
+        if stream is self.youtube_stream:
+            self.youtube_stream = None
+        self.yt_load_btn.configure(state="normal", text="📥 YouTube")
+        if saved:
+            self._library_needs_refresh = True
+            if stream is self.media_player.stream:
+                self.yt_status_label.configure(text=f"✅ {title[:40]}...", text_color=COLORS["success"])
+        elif stream.error:
+            self._youtube_load_error(stream.error)
+    
     def _youtube_load_error(self, error):
         """Gestisce errore caricamento YouTube"""
         messagebox.showerror("Errore", f"Impossibile caricare audio:\n{error}")
@@ -3111,7 +3400,7 @@ class AudioMixerApp(ctk.CTk):
     
     def play_youtube(self):
         """Avvia riproduzione media player"""
-        if self.media_player_audio is not None:
+        if self.media_player.is_loaded:
             # Verifica routing di HW3
             hw3_channel = self.pro_mixer.channels.get('HW3')
             if hw3_channel:
@@ -3127,14 +3416,12 @@ class AudioMixerApp(ctk.CTk):
             else:
                 return
             
-            self.media_player_playing = True
+            self.media_player.play()
             self.yt_status_label.configure(text="▶️ In riproduzione...", text_color=COLORS["success"])
     
     def stop_youtube(self):
         """Ferma riproduzione media player"""
-        self.media_player_playing = False
-        if hasattr(self, '_media_positions'):
-            self._media_positions = {}  # Reset tutte le posizioni
+        self.media_player.stop()  # Ferma e torna all'inizio
         self.yt_status_label.configure(text="⏹️ Fermato", text_color=COLORS["text_muted"])
     
     def toggle_media_loop(self):
@@ -3162,19 +3449,40 @@ class AudioMixerApp(ctk.CTk):
     def on_youtube_volume_change(self, value):
         """Cambia volume media player"""
         volume = int(value)
+        self.media_player.volume = volume / 100.0
         self.yt_volume_label.configure(text=f"{volume}%")
     
+    def on_media_speed_change(self, value):
+        """Velocità del media player senza cambiare il pitch"""
+        self.media_player.set_speed(float(value.rstrip("x")))
+        print(f"⏩ Media Player: velocità {value}")
+    
+    def on_media_pitch_change(self, value):
+        """Trasposizione del media player in semitoni senza cambiare la velocità"""
+        self.media_player.set_pitch(float(value))
+        print(f"🎼 Media Player: pitch {value} semitoni")
+    
     def on_media_seek(self, value):
         """Seek nella posizione del media player"""
-        if self.media_player_audio is not None:
+        if self.media_player.is_loaded:
+            # Trascinamento: gli eventi dello slider vengono raggruppati, si applica
+            # solo l'ultima posizione (il decoder non riparte a ogni pixel)
+            self._media_seek_target = float(value)
+            if self._media_seek_job is None:
+                self._media_seek_job = self.after(40, self._apply_media_seek)
+            target_sec = self._media_seek_target / 100.0 * self.media_player.duration / self.media_player.sample_rate
+            self.yt_time_label.configure(text=f"{int(target_sec // 60)}:{int(target_sec % 60):02d}")
+    
+    def _apply_media_seek(self):
+        self._media_seek_job = None
+        if self.media_player.is_loaded:
             # Converti percentuale in samples
-            position_pct = float(value) / 100.0
-            new_position = int(position_pct * self.media_player_duration)
+            position_pct = self._media_seek_target / 100.0
+            new_position = int(position_pct * self.media_player.duration)
             
-            # Aggiorna tutte le posizioni di tutti i bus
-            if hasattr(self, '_media_positions'):
-                for bus_name in list(self._media_positions.keys()):
-                    self._media_positions[bus_name] = new_position
+            # Seek del decoder (MP3: dal seek index, tempo costante): la testina
+            # (unica per tutti i bus) riparte dalla nuova posizione
+            self.media_player.seek(new_position)
     
     def update_media_progress(self):
         """Aggiorna progress bar del media player"""
@@ -3190,21 +3498,19 @@ class AudioMixerApp(ctk.CTk):
                 print(f"❌ Errore refresh libreria: {e}")
         
         # Aggiorna UI
-        if self.media_player_audio is not None and self.media_player_duration > 0:
-            # Usa la posizione media di tutti i bus attivi
-            if hasattr(self, '_media_positions') and self._media_positions:
-                current_pos = sum(self._media_positions.values()) / len(self._media_positions)
-            else:
-                current_pos = 0
+        duration = self.media_player.duration
+        if duration > 0 and self._media_seek_job is None:
+            # Posizione esatta della testina (frame effettivamente riprodotti)
+            current_pos = self.media_player.position
             
             # Calcola percentuale
-            progress_pct = (current_pos / self.media_player_duration) * 100.0
+            progress_pct = (current_pos / duration) * 100.0
             
             # Aggiorna slider senza triggerare callback
             self.yt_progress_slider.set(progress_pct)
             
             # Aggiorna label tempo
-            current_sec = current_pos / self.media_player_sr
+            current_sec = current_pos / self.media_player.sample_rate
             current_str = f"{int(current_sec // 60)}:{int(current_sec % 60):02d}"
             self.yt_time_label.configure(text=current_str)
         
@@ -3321,6 +3627,16 @@ class AudioMixerApp(ctk.CTk):
             keyboard.remove_hotkey('pause')
         except:
             pass
+        if self.replay_hook is not None:
+            try:
+                keyboard.unhook(self.replay_hook)
+            except:
+                pass
+        
+        # Download progressivo in corso: niente file parziali nella libreria
+        if self.youtube_stream is not None and not self.youtube_stream.download_done:
+            self.youtube_stream.on_complete = None
+            self.youtube_stream.cancel()
         
         # Rimuovi tutti gli hotkey bindings delle clip usando i riferimenti salvati
         for clip_name in list(self.hotkey_bindings.keys()):
@@ -3816,9 +4132,11 @@ class AudioMixerApp(ctk.CTk):
         if hasattr(self, 'mixer'):
             self.mixer.stop()
         
-        # Ferma ProMixer
+        # Ferma controller latenza e ProMixer
+        if hasattr(self, 'latency_controller') and self.latency_controller.is_running:
+            self.latency_controller.stop()
         if hasattr(self, 'pro_mixer'):
-            self.pro_mixer.stop_all()
+            self.pro_mixer.close()
         
         # Ferma system tray
         if TRAY_AVAILABLE and self.tray_icon is not None:
@@ -3827,35 +4145,43 @@ class AudioMixerApp(ctk.CTk):
         # Chiudi finestra
         self.destroy()
     
+    def _add_clip_from_file(self, file_path) -> str:
+        """Crea clip e widget della soundboard per un file e salva la configurazione"""
+        clip_name = os.path.basename(file_path)
+        
+        # Crea clip
+        clip = AudioClip(file_path, clip_name, target_sample_rate=self.mixer.sample_rate)
+        self.mixer.add_clip(clip)
+        return self._add_clip_widget(clip_name)
+    
+    def _add_clip_widget(self, clip_name) -> str:
+        """Crea il widget di una clip già registrata nel mixer e salva la configurazione"""
+        # Crea widget
+        row = len(self.clip_widgets) // 3
+        col = len(self.clip_widgets) % 3
+        
+        clip_widget = ClipButton(
+            self.clips_container,
+            clip_name,
+            on_play=self.play_clip,
+            on_stop=self.stop_clip,
+            on_remove=self.remove_clip,
+            on_volume_change=self.set_clip_volume,
+            on_hotkey_change=self.start_hotkey_assignment,
+            app=self
+        )
+        clip_widget.grid(row=row, column=col, padx=10, pady=10, sticky="nsew")
+        
+        self.clip_widgets[clip_name] = clip_widget
+        
+        # Salva configurazione
+        self.save_config()
+        return clip_name
+    
     def _add_downloaded_clip(self, file_path):
         """Aggiunge la clip scaricata alla soundboard"""
         try:
-            clip_name = os.path.basename(file_path)
-            
-            # Crea clip
-            clip = AudioClip(file_path, clip_name, target_sample_rate=self.mixer.sample_rate)
-            self.mixer.add_clip(clip)
-            
-            # Crea widget
-            row = len(self.clip_widgets) // 3
-            col = len(self.clip_widgets) % 3
-            
-            clip_widget = ClipButton(
-                self.clips_container,
-                clip_name,
-                on_play=self.play_clip,
-                on_stop=self.stop_clip,
-                on_remove=self.remove_clip,
-                on_volume_change=self.set_clip_volume,
-                on_hotkey_change=self.start_hotkey_assignment,
-                app=self
-            )
-            clip_widget.grid(row=row, column=col, padx=10, pady=10, sticky="nsew")
-            
-            self.clip_widgets[clip_name] = clip_widget
-            
-            # Salva configurazione
-            self.save_config()
+            clip_name = self._add_clip_from_file(file_path)
             
             # Vai alla tab soundboard
             self.tabview.set("🎮 Soundboard")
@@ -3896,6 +4222,8 @@ class AudioMixerApp(ctk.CTk):
             # Ripristina dispositivi input
             input_devices = mixer_config.get('input_devices', {})
             print(f"   📋 input_devices da caricare: {input_devices}")
+            # Coppie di canali sui dispositivi multicanale (default 1-2)
+            self.pro_mixer.input_channel_offsets.update(mixer_config.get('input_channel_offsets', {}))
             for channel_id, device_id in input_devices.items():
                 if channel_id in self.pro_mixer.channels:
                     success = self.pro_mixer.start_input(channel_id, device_id)
@@ -3916,9 +4244,10 @@ class AudioMixerApp(ctk.CTk):
             
             # Ripristina dispositivi output
             output_devices = mixer_config.get('output_devices', {})
+            output_offsets = mixer_config.get('output_channel_offsets', {})
             for bus_name, device_id in output_devices.items():
                 if bus_name in self.pro_mixer.buses:
-                    self.pro_mixer.set_bus_device(bus_name, device_id)
+                    self.pro_mixer.set_bus_device(bus_name, device_id, first_channel=output_offsets.get(bus_name))
                     print(f"   ✓ Bus {bus_name} → Device {device_id}")
             
             # Ripristina routing
@@ -3989,6 +4318,12 @@ class AudioMixerApp(ctk.CTk):
             config['hotkeys'] = {}
             config['clips_folder'] = self.clips_folder  # Salva la cartella personalizzata
             config['clip_pages'] = self.clip_pages  # Salva le pagine delle clip
+            if hasattr(self, 'adaptive_latency_var'):
+                config['adaptive_latency'] = bool(self.adaptive_latency_var.get())
+            if hasattr(self, 'realtime_audio_var'):
+                config['realtime_audio'] = bool(self.realtime_audio_var.get())
+            if hasattr(self, 'replay_enabled'):
+                config.setdefault('instant_replay', {})['enabled'] = self.replay_enabled
             
             # Salva le clip e le loro impostazioni
             for clip_name, widget in self.clip_widgets.items():
@@ -4014,6 +4349,8 @@ class AudioMixerApp(ctk.CTk):
                 
                 # Salva dispositivi input (usa input_device_map)
                 mixer_config['input_devices'] = self.pro_mixer.input_device_map.copy()
+                mixer_config['input_channel_offsets'] = self.pro_mixer.input_channel_offsets.copy()
+                mixer_config['layout'] = self.pro_mixer.get_layout()
                 print(f"   📝 Salvataggio input_devices: {mixer_config['input_devices']}")
                 
                 # Salva routing e fader
@@ -4037,9 +4374,11 @@ class AudioMixerApp(ctk.CTk):
                     }
                 
                 # Salva dispositivi output
+                mixer_config['output_channel_offsets'] = {}
                 for bus_name, bus in self.pro_mixer.buses.items():
                     if bus.device_id is not None:
                         mixer_config['output_devices'][bus_name] = bus.device_id
+                        mixer_config['output_channel_offsets'][bus_name] = bus.channel_offset
                 
                 config['pro_mixer'] = mixer_config
             
@@ -0,0 +1,939 @@
+"""
+Media Stream - Riproduzione in streaming per il media player (canale HW3)
+Un thread decoder legge il file a blocchi (soundfile), lo ricampiona al sample
+rate dell'engine e lo accoda in un ring buffer di pochi secondi: la memoria
+non dipende dalla durata del file e la riproduzione parte appena è pronto il
+primo blocco. Il seek riposiziona il decoder (nessun array dell'intero file).
+
+MediaPlayerSource è la sorgente del canale HW3 nell'engine: una sola testina
+di riproduzione, avanzata una volta per ciclo; il blocco renderizzato è lo
+stesso per tutti i bus su cui HW3 è routato.
+
+ProgressiveStream riproduce un flusso mentre viene ancora scaricato: un
+decoder esterno (ffmpeg) lo converte in PCM su una pipe e in parallelo scrive
+il file della libreria.
+
+Il ricampionamento è un polifase (stesso filtro di resample_poly) applicato a
+segmenti con margini di contesto: il risultato coincide con quello del file
+ricampionato tutto insieme, senza discontinuità ai bordi dei blocchi.
+"""
+import os
+import subprocess
+import tempfile
+import threading
+import urllib.request
+from collections import deque
+from math import gcd
+from typing import Callable, Deque, List, Optional
+
+import numpy as np
+import soundfile as sf
+from scipy import signal
+
+from audio_fifo import AudioFifo
+from seek_index import SeekIndex
+from time_stretch import TimeStretcher
+
+
+class StreamResampler:
+    """Ricampionatore polifase a blocchi (stato tra un blocco e l'altro)"""
+
+    def __init__(self, source_rate: int, target_rate: int, channels: int = 2):
+        g = gcd(int(source_rate), int(target_rate))
+        self.up = int(target_rate) // g
+        self.down = int(source_rate) // g
+        self.channels = channels
+        self.passthrough = self.up == self.down
+        if not self.passthrough:
+            # Stesso filtro progettato da resample_poly (calcolato una volta sola)
+            max_rate = max(self.up, self.down)
+            half_len = 10 * max_rate
+            self.window = signal.firwin(2 * half_len + 1, 1.0 / max_rate, window=('kaiser', 5.0))
+            # Contesto (in campioni di ingresso) su ogni lato: copre il filtro ed è
+            # multiplo di down, così i campioni di uscita restano allineati
+            context = half_len // self.up + 2
+            self.context = -(-context // self.down) * self.down
+        else:
+            self.context = 0
+        self.reset()
+
+    def reset(self):
+        """Ricomincia da capo (dopo un seek): il contesto a sinistra è silenzio"""
+        self._pending = np.zeros((self.context, self.channels), dtype=np.float32)
+        self._in_total = 0
+        self._out_total = 0
+
+    def max_output(self, input_frames: int) -> int:
+        """Frame massimi prodotti da process() per un blocco di `input_frames`"""
+        return (input_frames + 2 * self.context + self.down) * self.up // self.down + 1
+
+    def process(self, block: np.ndarray, final: bool = False) -> np.ndarray:
+        """Ricampiona un blocco; con final=True svuota anche la coda
+
+        Returns:
+            Blocco ricampionato (può essere vuoto se serve altro contesto)
+        """
+        if self.passthrough:
+            return block
+        self._in_total += len(block)
+        pending = np.concatenate((self._pending, block)) if len(block) else self._pending
+        if final:
+            # Silenzio dopo la fine del file: ultimi campioni con il contesto a destra completo
+            pending = np.concatenate((pending, np.zeros((self.context + self.down, self.channels),
+                                                        dtype=np.float32)))
+        usable = (len(pending) - 2 * self.context) // self.down * self.down
+        if usable <= 0:
+            self._pending = pending
+            return np.zeros((0, self.channels), dtype=np.float32)
+
+        segment = pending[:usable + 2 * self.context]
+        resampled = signal.resample_poly(segment, self.up, self.down, axis=0, window=self.window)
+        start = self.context * self.up // self.down
+        out = resampled[start:start + usable * self.up // self.down].astype(np.float32)
+        self._pending = pending[usable:]
+
+        if final:
+            # Lunghezza esatta come resample_poly sull'intero file
+            expected = -(-self._in_total * self.up // self.down)
+            out = out[:max(0, expected - self._out_total)]
+        self._out_total += len(out)
+        return out
+
+
+class MediaStream:
+    """File audio decodificato in background in un ring buffer limitato
+
+    Il thread audio chiama read() (solo una copia dal ring, nessun I/O); il
+    thread decoder mantiene il ring pieno. position è il frame (al sample rate
+    dell'engine) del prossimo campione che verrà riprodotto.
+
+    Per gli MP3 il seek usa un SeekIndex (caricato dalla cache o costruito in
+    background alla prima apertura): tempo costante in qualunque punto del file.
+    """
+
+    def __init__(self, path: str, sample_rate: int, buffer_seconds: float = 4.0,
+                 chunk_frames: int = 4096):
+        """
+        Args:
+            path: File audio (formati supportati da soundfile: WAV, FLAC, OGG, MP3)
+            sample_rate: Sample rate dell'engine (uscita del ricampionatore)
+            buffer_seconds: Audio decodificato in anticipo (memoria massima)
+            chunk_frames: Frame del file decodificati per volta
+        """
+        self.path = path
+        self.file = sf.SoundFile(path)
+        self.source_rate = self.file.samplerate
+        self.sample_rate = sample_rate
+        self.duration = -(-self.file.frames * sample_rate // self.source_rate)
+        self.chunk_frames = chunk_frames
+
+        self.resampler = StreamResampler(self.source_rate, sample_rate)
+        self.ring = AudioFifo(max(int(buffer_seconds * sample_rate),
+                                  2 * self.resampler.max_output(chunk_frames)))
+        self._max_chunk_out = self.resampler.max_output(chunk_frames)
+
+        # Lettore corrente: il file stesso, o un decoder aperto dal seek index
+        self._reader = self.file
+        self._window = None
+        self._source_pos = 0
+        self.index: Optional[SeekIndex] = None
+        if self.file.format == 'MP3':
+            self.index = SeekIndex.load(path)
+            if self.index is None:
+                threading.Thread(target=self._build_index, name="SeekIndex", daemon=True).start()
+
+        self.position = 0
+        self.eof = False        # Decoder arrivato alla fine del file
+        self.finished = False   # Ultimo campione riprodotto
+        self.underruns = 0      # Blocchi con il ring vuoto (decoder in ritardo)
+        self.error: Optional[str] = None
+        self._generation = 0    # Incrementato a ogni seek (scarta letture a cavallo)
+
+        self._lock = threading.Lock()  # Decoder e seek (mai preso dal thread audio)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="MediaDecoder", daemon=True)
+        self._thread.start()
+
+    @property
+    def seconds(self) -> float:
+        return self.position / self.sample_rate
+
+    @property
+    def buffered_frames(self) -> int:
+        return self.ring.available
+
+    def _build_index(self):
+        """Prima apertura di un MP3: costruisce e salva l'indice (il seek nel frattempo
+        resta quello del decoder)"""
+        try:
+            self.index = SeekIndex.for_file(self.path)
+        except Exception as e:
+            print(f"⚠️ Seek index ({os.path.basename(self.path)}): {e}")
+
+    def _decode_chunk(self) -> bool:
+        """Decodifica un chunk nel ring (False se non c'era nulla da decodificare)"""
+        data = self._reader.read(self.chunk_frames, dtype='float32', always_2d=True)
+        if self._reader is not self.file:
+            # Il decoder aperto dall'indice non conosce il padding finale: taglia alla durata reale
+            data = data[:max(0, self.file.frames - self._source_pos)]
+        self._source_pos += len(data)
+        if data.shape[1] == 1:
+            data = np.repeat(data, 2, axis=1)
+        elif data.shape[1] > 2:
+            data = data[:, :2]
+        final = len(data) < self.chunk_frames
+        out = self.resampler.process(data, final=final)
+        if len(out):
+            self.ring.write(out)
+        if final:
+            # Dopo l'ultima scrittura: read() vede eof solo con tutto l'audio in coda
+            self.eof = True
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            decoded = False
+            with self._lock:
+                room = self.ring.capacity - self.ring.available
+                if not self.eof and room >= self._max_chunk_out:
+                    try:
+                        decoded = self._decode_chunk()
+                    except Exception as e:
+                        self.error = str(e)
+                        self.eof = True
+                        print(f"✗ Media Player: errore di decodifica ({e})")
+            if decoded:
+                continue
+            self._wake.wait(0.05)
+            self._wake.clear()
+
+    def read(self, frames: int, out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """Prossimi `frames` frame (thread audio); silenzio se il decoder è in ritardo
+
+        Returns:
+            Blocco (frames, 2), oppure None dopo la fine del file
+        """
+        if self.finished:
+            return None
+        if out is None:
+            out = np.empty((frames, 2), dtype=np.float32)
+        self.read_into(out)
+        return out
+
+    def read_into(self, out: np.ndarray) -> int:
+        """Riempie `out` (thread audio): i frame oltre quelli disponibili sono silenzio
+
+        Returns:
+            Frame di audio effettivamente letti (meno di len(out) a fine file o in underrun)
+        """
+        frames = len(out)
+        if self.finished:
+            out[:] = 0.0
+            return 0
+        generation = self._generation
+        n = min(frames, self.ring.available)
+        self.ring.read(frames, out)
+        if generation != self._generation:
+            # Seek durante la lettura: il blocco appartiene alla posizione precedente
+            out[:] = 0.0
+            return 0
+        self.position = min(self.position + n, self.duration)
+        if n < frames:
+            if self.eof and self.ring.available == 0:
+                self.finished = True
+            else:
+                self.underruns += 1
+        if self.ring.capacity - self.ring.available >= self._max_chunk_out:
+            self._wake.set()
+        return n
+
+    def seek(self, frame: int):
+        """Riposiziona la riproduzione (seek del decoder, il ring riparte vuoto)"""
+        frame = int(min(max(0, frame), self.duration))
+        source_frame = min(self.file.frames, frame * self.source_rate // self.sample_rate)
+        index = self.index
+        with self._lock:
+            self._generation += 1
+            self._close_reader()
+            if index is not None and source_frame > 0:
+                # Decoder aperto direttamente sul frame giusto: nessuna scansione dall'inizio
+                self._reader, self._window = index.open_at(self.path, source_frame)
+            else:
+                self.file.seek(source_frame)
+            self._source_pos = source_frame
+            self.resampler.reset()
+            self.ring.clear()
+            self.position = frame
+            self.eof = False
+            self.finished = False
+        self._wake.set()
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=1.0)
+        with self._lock:
+            self._close_reader()
+            self.file.close()
+
+    def _close_reader(self):
+        if self._reader is not self.file:
+            self._reader.close()
+            self._window.close()
+            self._reader, self._window = self.file, None
+
+
+def ffmpeg_pipe_command(sample_rate: int, output_path: Optional[str] = None,
+                        output_format: Optional[str] = None, ffmpeg: str = 'ffmpeg') -> List[str]:
+    """Comando ffmpeg per la riproduzione progressiva
+
+    Legge il flusso compresso da stdin e produce PCM s16le stereo al sample rate
+    dell'engine su stdout; con output_path scrive in parallelo il file della
+    libreria (stessa decodifica, un solo processo).
+    """
+    cmd = [ffmpeg, '-hide_banner', '-loglevel', 'error', '-i', 'pipe:0',
+           '-map', '0:a:0', '-f', 's16le', '-acodec', 'pcm_s16le',
+           '-ac', '2', '-ar', str(sample_rate), 'pipe:1']
+    if output_path:
+        fmt = output_format or os.path.splitext(output_path)[1].lstrip('.').lower()
+        cmd += ['-map', '0:a:0', '-f', fmt, '-y', output_path]
+    return cmd
+
+
+class ProgressiveStream(MediaStream):
+    """Riproduzione mentre il file viene ancora scaricato
+
+    Tre thread, nessuno dei quali blocca gli altri:
+    - fetch: legge la sorgente (URL http/https/file o percorso locale) e la passa
+      allo stdin del decoder
+    - pump: scarica il PCM del decoder in un file di spool su disco (int16), così
+      il download non rallenta quando il ring del player è pieno o in pausa
+    - decoder (ereditato da MediaStream): dallo spool al ring, alla posizione corrente
+
+    Il seek è possibile in tutta la parte già scaricata. A download completato il
+    file della libreria (scritto dal decoder come `.part`) viene rinominato.
+    """
+
+    RANGE_BYTES = 10 * 1024 * 1024  # Richieste HTTP a blocchi (come yt-dlp)
+
+    def __init__(self, source: str, sample_rate: int, output_path: Optional[str] = None,
+                 output_format: Optional[str] = None, headers: Optional[dict] = None,
+                 duration_seconds: Optional[float] = None, command: Optional[List[str]] = None,
+                 buffer_seconds: float = 4.0, chunk_frames: int = 4096,
+                 on_complete: Optional[Callable[[Optional[str]], None]] = None):
+        """
+        Args:
+            source: URL (http/https/file) o percorso locale del flusso compresso
+            sample_rate: Sample rate dell'engine (il decoder ricampiona)
+            output_path: File della libreria scritto durante il download
+            output_format: Formato del file (default: dall'estensione di output_path)
+            headers: Header HTTP della richiesta (es. `http_headers` di yt-dlp)
+            duration_seconds: Durata nota in anticipo (barra di avanzamento); se manca
+                cresce con il download
+            command: Decoder (default ffmpeg_pipe_command): stdin compresso → stdout s16le stereo
+            on_complete: Chiamata dal thread pump a fine download con il file della
+                libreria (None in caso di errore)
+        """
+        self.source = source
+        self.path = output_path or source
+        self.output_path = output_path
+        self.sample_rate = sample_rate
+        self.source_rate = sample_rate  # Il decoder esce già al sample rate dell'engine
+        self.chunk_frames = chunk_frames
+        self.headers = dict(headers or {})
+        self.on_complete = on_complete
+        self.expected_duration = int(duration_seconds * sample_rate) if duration_seconds else 0
+        self.duration = self.expected_duration
+
+        self.ring = AudioFifo(max(int(buffer_seconds * sample_rate), 2 * chunk_frames))
+        self._max_chunk_out = chunk_frames
+        self.position = 0
+        self.eof = False
+        self.finished = False
+        self.underruns = 0
+        self.error: Optional[str] = None
+        self._generation = 0
+
+        self.downloaded = 0         # Frame PCM nello spool
+        self.bytes_fetched = 0
+        self.total_bytes = 0        # 0 se la sorgente non dichiara la dimensione
+        self.download_done = False
+        self.complete = False       # File della libreria scritto e rinominato
+        self._cancelled = False
+        self._closed = False
+        self._read_frame = 0
+
+        fd, self._spool_path = tempfile.mkstemp(prefix="progressive_", suffix=".pcm")
+        self._spool_out = os.fdopen(fd, 'wb')
+        self._spool_in = open(self._spool_path, 'rb')
+        self._part_path = output_path + '.part' if output_path else None
+        if command is None:
+            command = ffmpeg_pipe_command(sample_rate, self._part_path, output_format)
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.PIPE)
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._fetch_thread = threading.Thread(target=self._fetch, name="ProgressiveFetch", daemon=True)
+        self._pump_thread = threading.Thread(target=self._pump, name="ProgressivePump", daemon=True)
+        self._thread = threading.Thread(target=self._run, name="MediaDecoder", daemon=True)
+        self._fetch_thread.start()
+        self._pump_thread.start()
+        self._thread.start()
+
+    @property
+    def download_progress(self) -> float:
+        """Frazione scaricata (0-1), 0 se la dimensione non è nota"""
+        if self.download_done:
+            return 1.0
+        return min(1.0, self.bytes_fetched / self.total_bytes) if self.total_bytes else 0.0
+
+    def _fetch(self):
+        stdin = self.process.stdin
+        try:
+            if '://' not in self.source:
+                with open(self.source, 'rb') as f:
+                    self.total_bytes = os.path.getsize(self.source)
+                    for chunk in iter(lambda: f.read(65536), b''):
+                        if self._cancelled:
+                            return
+                        stdin.write(chunk)
+                        self.bytes_fetched += len(chunk)
+                return
+            while True:
+                # Range a blocchi: se il server lo ignora (200) arriva tutto in una risposta
+                offset = self.bytes_fetched
+                headers = dict(self.headers)
+                headers['Range'] = f"bytes={offset}-{offset + self.RANGE_BYTES - 1}"
+                with urllib.request.urlopen(urllib.request.Request(self.source, headers=headers),
+                                            timeout=30) as response:
+                    partial = getattr(response, 'status', None) == 206
+                    content_range = response.headers.get('Content-Range', '') if partial else ''
+                    if '/' in content_range and content_range.rsplit('/', 1)[1].isdigit():
+                        self.total_bytes = int(content_range.rsplit('/', 1)[1])
+                    elif not partial and response.headers.get('Content-Length', '').isdigit():
+                        self.total_bytes = int(response.headers['Content-Length'])
+                    for chunk in iter(lambda: response.read(65536), b''):
+                        if self._cancelled:
+                            return
+                        stdin.write(chunk)
+                        self.bytes_fetched += len(chunk)
+                if not partial or self.bytes_fetched == offset:
+                    break
+                if self.total_bytes:
+                    if self.bytes_fetched >= self.total_bytes:
+                        break
+                elif self.bytes_fetched - offset < self.RANGE_BYTES:
+                    # Lunghezza ignota (Content-Range "bytes a-b/*"): un range corto è l'ultimo
+                    break
+        except Exception as e:
+            if not self._cancelled:
+                self.error = str(e)
+                print(f"✗ Riproduzione progressiva: download interrotto ({e})")
+        finally:
+            try:
+                stdin.close()
+            except OSError:
+                pass
+
+    def _pump(self):
+        stdout = self.process.stdout
+        pending = b''
+        while True:
+            data = stdout.read1(65536) if hasattr(stdout, 'read1') else stdout.read(65536)
+            if not data:
+                break
+            data = pending + data
+            usable = len(data) - len(data) % 4  # Frame interi (2 canali × int16)
+            pending = data[usable:]
+            if usable:
+                self._spool_out.write(data[:usable])
+                self._spool_out.flush()
+                self.downloaded += usable // 4
+                if self.downloaded > self.duration:
+                    self.duration = self.downloaded
+                self._wake.set()
+
+        returncode = self.process.wait()
+        self._spool_out.close()
+        stderr = self.process.stderr.read().decode('utf-8', errors='replace').strip()
+        self.process.stderr.close()
+        ok = returncode == 0 and self.error is None and not self._cancelled
+        if not ok and not self._cancelled and self.error is None:
+            self.error = stderr.splitlines()[-1] if stderr else f"decoder terminato ({returncode})"
+        # Durata esatta prima di download_done: read_into non supera mai la fine reale
+        self.duration = self.downloaded
+        self.download_done = True
+        self._wake.set()
+
+        saved = None
+        if self._part_path:
+            try:
+                if ok and os.path.exists(self._part_path):
+                    os.replace(self._part_path, self.output_path)
+                    saved = self.output_path
+                    self.complete = True
+                elif os.path.exists(self._part_path):
+                    os.remove(self._part_path)
+            except OSError as e:
+                print(f"✗ Riproduzione progressiva: {e}")
+        if ok:
+            print(f"✅ Download completato: {os.path.basename(self.path)} "
+                  f"({self.downloaded / self.sample_rate:.1f}s)")
+        elif self.error:
+            print(f"✗ Riproduzione progressiva: {self.error}")
+        if self._closed:
+            self._remove_spool()
+        if self.on_complete is not None:
+            self.on_complete(saved)
+
+    def _decode_chunk(self) -> bool:
+        done = self.download_done
+        available = self.downloaded - self._read_frame
+        if available <= 0:
+            if done:
+                self.eof = True
+            return False  # In attesa di altri dati dal download
+        n = min(available, self.chunk_frames)
+        self._spool_in.seek(self._read_frame * 4)
+        raw = self._spool_in.read(n * 4)
+        n = len(raw) // 4
+        data = np.frombuffer(raw[:n * 4], dtype='<i2').reshape(-1, 2).astype(np.float32)
+        data *= 1.0 / 32768.0
+        self.ring.write(data)
+        self._read_frame += n
+        return True
+
+    def seek(self, frame: int):
+        """Seek nella parte già scaricata (oltre, si ferma all'ultimo frame disponibile)"""
+        frame = int(min(max(0, frame), self.downloaded))
+        with self._lock:
+            self._generation += 1
+            self._read_frame = frame
+            self.ring.clear()
+            self.position = frame
+            self.eof = False
+            self.finished = False
+        self._wake.set()
+
+    def close(self):
+        """Ferma la riproduzione: il download continua fino al file della libreria"""
+        self._closed = True
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=1.0)
+        with self._lock:
+            self._spool_in.close()
+        if self.download_done:
+            self._remove_spool()
+
+    def cancel(self):
+        """Interrompe anche il download (il file parziale viene eliminato)"""
+        self._cancelled = True
+        if self.process.poll() is None:
+            self.process.kill()
+        self.close()
+
+    def _remove_spool(self):
+        try:
+            os.remove(self._spool_path)
+        except OSError:
+            pass
+
+
+class MediaPlayerSource:
+    """Media player dell'engine: una sola testina condivisa da tutti i bus
+
+    render() viene chiamata dal ProMixer una volta per ciclo (thread audio):
+    position, seek e fine traccia sono esatti al frame, il volume viene applicato
+    una volta sola su un buffer preallocato.
+
+    Playlist: le prossime `prefetch_depth` tracce vengono aperte e decodificate
+    in anticipo da un thread separato, così il passaggio alla traccia successiva
+    avviene nello stesso blocco in cui finisce la corrente (gapless). Con
+    crossfade_seconds > 0 le due tracce si sovrappongono con una dissolvenza a
+    potenza costante che parte esattamente `crossfade` frame prima della fine.
+
+    Velocità e pitch (TimeStretcher) vengono applicati all'uscita della playlist
+    solo quando diversi da 1x / 0 semitoni.
+    """
+
+    def __init__(self, sample_rate: int, buffer_seconds: float = 4.0,
+                 prefetch_depth: int = 1, crossfade_seconds: float = 0.0,
+                 stretch_preset: str = 'balanced'):
+        self.sample_rate = sample_rate
+        self.buffer_seconds = buffer_seconds
+        self.prefetch_depth = max(1, int(prefetch_depth))
+        self.stream: Optional[MediaStream] = None
+        self.playing = False
+        self.volume = 1.0
+        # Chiamata dal thread audio quando viene riprodotto l'ultimo campione della playlist
+        self.on_finished: Optional[Callable[[], None]] = None
+        # Chiamata dal thread di prefetch quando parte la traccia successiva (percorso)
+        self.on_track_change: Optional[Callable[[str], None]] = None
+        self._out = np.zeros((1024, 2), dtype=np.float32)
+        self._next_out = np.zeros((1024, 2), dtype=np.float32)
+
+        # Playlist: percorsi ancora da aprire e stream già aperti in anticipo
+        # (deque: append/popleft sono atomici tra thread audio e thread di prefetch)
+        self.queue: Deque[str] = deque()
+        self.upcoming: Deque[MediaStream] = deque()
+        self._retired: Deque[MediaStream] = deque()
+        # Tracce già partite nella playlist corrente, compresa quella in ascolto (per il loop)
+        self.played: Deque[str] = deque()
+        self._track_changed = False
+        self._pending_rate: Optional[int] = None  # Cambio di sample rate da applicare (thread di prefetch)
+        self._prefetch_wake = threading.Event()
+        self._prefetch_stop = threading.Event()
+        self._prefetch_thread: Optional[threading.Thread] = None
+
+        self.crossfade_frames = 0
+        self._fade_out = self._fade_in = np.zeros(0, dtype=np.float32)
+        self.set_crossfade(crossfade_seconds)
+        self.stretcher = TimeStretcher(sample_rate, stretch_preset)
+        # Thread di prefetch subito attivo: il thread audio può solo svegliarlo
+        self._request_prefetch()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.stream is not None
+
+    @property
+    def duration(self) -> int:
+        return self.stream.duration if self.stream is not None else 0
+
+    @property
+    def position(self) -> int:
+        """Frame in ascolto (esclusi quelli ancora nei buffer dello stretcher)"""
+        if self.stream is None:
+            return 0
+        return max(0, self.stream.position - self.stretcher.buffered_input)
+
+    @property
+    def path(self) -> Optional[str]:
+        return self.stream.path if self.stream is not None else None
+
+    def set_crossfade(self, seconds: float):
+        """Durata del crossfade tra le tracce della playlist (0 = gapless senza sovrapposizione)"""
+        frames = max(0, int(seconds * self.sample_rate))
+        if frames:
+            # Curve a potenza costante precalcolate: nessun calcolo nel thread audio
+            t = (np.arange(frames, dtype=np.float64) + 0.5) / frames
+            self._fade_out = np.cos(t * np.pi / 2).astype(np.float32)[:, None]
+            self._fade_in = np.sin(t * np.pi / 2).astype(np.float32)[:, None]
+        self.crossfade_frames = frames
+        self.crossfade_seconds = seconds
+
+    def set_speed(self, speed: float):
+        """Velocità di riproduzione (0.5x - 2x) senza cambiare il pitch"""
+        self.stretcher.set_speed(speed)
+
+    def set_pitch(self, semitones: float):
+        """Trasposizione in semitoni (±12) senza cambiare la velocità"""
+        self.stretcher.set_pitch(semitones)
+
+    def set_stretch_preset(self, preset: str):
+        """Qualità/CPU dello stretch: nuovo stretcher con gli stessi parametri
+        (sostituito con un solo assegnamento, il thread audio non vede stati a metà)"""
+        if preset != self.stretcher.preset:
+            self._replace_stretcher(self.sample_rate, preset)
+
+    def _replace_stretcher(self, sample_rate: int, preset: str):
+        stretcher = TimeStretcher(sample_rate, preset)
+        stretcher.set_speed(self.stretcher.speed)
+        stretcher.set_pitch(self.stretcher.pitch_semitones)
+        self.stretcher = stretcher
+
+    def load(self, path: str) -> MediaStream:
+        """Apre un file al posto della playlist corrente (coda svuotata): decodifica subito
+        in background. Per aggiungerlo alla playlist usare enqueue()"""
+        return self.load_stream(MediaStream(path, self.sample_rate, self.buffer_seconds))
+
+    def load_stream(self, stream: MediaStream) -> MediaStream:
+        """Usa uno stream già aperto (es. ProgressiveStream di un download in corso)
+        al posto della playlist corrente"""
+        self.clear_queue()
+        old_stream = self.stream
+        self.playing = False
+        self.stream = stream
+        self.played.clear()
+        self.played.append(stream.path)
+        self.stretcher.reset()
+        if old_stream is not None:
+            old_stream.close()
+        self._request_prefetch()
+        return stream
+
+    # ========== PLAYLIST ==========
+
+    def set_playlist(self, paths, start: int = 0) -> Optional[MediaStream]:
+        """Carica una playlist: la traccia `start` diventa la corrente, le altre vanno in coda"""
+        paths = list(paths)
+        self.clear_queue()
+        if not paths:
+            return None
+        stream = self.load(paths[start])
+        self.queue.extend(paths[start + 1:])
+        self._request_prefetch()
+        return stream
+
+    def restart(self) -> Optional[MediaStream]:
+        """Torna all'inizio della playlist (loop): prima traccia suonata, poi tutte le altre
+
+        Con una sola traccia è un seek all'inizio, senza riaprire il file.
+        """
+        paths = list(self.played) + self.queued_paths
+        if len(paths) <= 1:
+            self.seek(0)
+            return self.stream
+        return self.set_playlist(paths)
+
+    def enqueue(self, path: str):
+        """Aggiunge una traccia in fondo alla coda"""
+        self.queue.append(path)
+        self._request_prefetch()
+
+    def clear_queue(self):
+        self.queue.clear()
+        while self.upcoming:
+            try:
+                self._retired.append(self.upcoming.popleft())
+            except IndexError:
+                break
+        self._request_prefetch()
+
+    @property
+    def queued_paths(self):
+        """Prossime tracce in ordine (già aperte e ancora da aprire)"""
+        return [stream.path for stream in list(self.upcoming)] + list(self.queue)
+
+    def skip(self) -> bool:
+        """Passa subito alla traccia successiva (thread UI)
+
+        Returns:
+            False se la coda è vuota
+        """
+        if not self.upcoming and not self.queue:
+            return False
+        if not self.upcoming:
+            # Traccia successiva non ancora aperta: aprila qui
+            self.upcoming.append(MediaStream(self.queue.popleft(), self.sample_rate, self.buffer_seconds))
+        self._advance()
+        return True
+
+    def _advance(self) -> bool:
+        """Passa al prossimo stream già aperto (thread audio: nessuna apertura di file)"""
+        try:
+            next_stream = self.upcoming.popleft()
+        except IndexError:
+            return False
+        old_stream = self.stream
+        self.stream = next_stream
+        self.played.append(next_stream.path)
+        if old_stream is not None:
+            self._retired.append(old_stream)
+        self._track_changed = True
+        self._prefetch_wake.set()
+        return True
+
+    def _request_prefetch(self):
+        if self._prefetch_stop.is_set():
+            return
+        if self._prefetch_thread is None or not self._prefetch_thread.is_alive():
+            self._prefetch_thread = threading.Thread(target=self._prefetch_loop,
+                                                     name="MediaPrefetch", daemon=True)
+            self._prefetch_thread.start()
+        self._prefetch_wake.set()
+
+    def _prefetch_loop(self):
+        """Apre le prossime tracce in anticipo e chiude quelle finite (thread di prefetch)"""
+        while not self._prefetch_stop.is_set():
+            self._prefetch_wake.wait(0.25)
+            self._prefetch_wake.clear()
+            if self._prefetch_stop.is_set():
+                break
+            rate = self._pending_rate
+            if rate is not None:
+                try:
+                    self.set_sample_rate(rate)
+                except Exception as e:
+                    self.playing = False
+                    print(f"⚠️ Media Player: riapertura a {rate}Hz fallita ({e})")
+                if self._pending_rate == rate:
+                    self._pending_rate = None
+            while self._retired:
+                self._retired.popleft().close()
+            while len(self.upcoming) < self.prefetch_depth and self.queue:
+                path = self.queue.popleft()
+                try:
+                    self.upcoming.append(MediaStream(path, self.sample_rate, self.buffer_seconds))
+                except Exception as e:
+                    print(f"⚠️ Playlist: {os.path.basename(path)} saltato ({e})")
+            if self._track_changed:
+                self._track_changed = False
+                stream = self.stream
+                print(f"⏭️ Media Player: {os.path.basename(stream.path) if stream else '-'}")
+                if self.on_track_change is not None and stream is not None:
+                    self.on_track_change(stream.path)
+
+    # ========== TRASPORTO ==========
+
+    def play(self):
+        if self.stream is not None:
+            self.playing = True
+
+    def pause(self):
+        self.playing = False
+
+    def stop(self):
+        """Ferma e torna all'inizio"""
+        self.playing = False
+        if self.stream is not None:
+            self.stream.seek(0)
+            self.stretcher.reset()
+
+    def seek(self, frame: int):
+        if self.stream is not None:
+            self.stream.seek(frame)
+            self.stretcher.reset()
+
+    def render(self, frames: int) -> Optional[np.ndarray]:
+        """Blocco del ciclo corrente (thread audio, una chiamata per ciclo)
+
+        Returns:
+            Blocco (frames, 2) già con il volume, oppure None se non sta suonando.
+            Il buffer viene riusato al ciclo successivo.
+        """
+        if not self.playing or self.stream is None or self._pending_rate is not None:
+            # Durante la riapertura per un cambio di sample rate: silenzio
+            return None
+        if frames > len(self._out):
+            self._out = np.zeros((frames, 2), dtype=np.float32)
+        out = self._out[:frames]
+
+        stretcher = self.stretcher
+        if stretcher.active:
+            # Velocità/pitch: lo stretcher chiede alla playlist i frame che gli servono
+            stretcher.process(out, self._fill)
+        else:
+            self._fill(out)
+
+        if self.volume != 1.0:
+            np.multiply(out, self.volume, out=out)
+        return out
+
+    def _fill(self, out: np.ndarray):
+        """Riempie `out` dalla playlist: gapless, crossfade e fine riproduzione"""
+        frames = len(out)
+        if frames > len(self._next_out):
+            self._next_out = np.zeros((frames, 2), dtype=np.float32)
+        if not self.playing:
+            out[:] = 0.0
+            return
+
+        pos = 0
+        while pos < frames:
+            stream = self.stream
+            try:
+                next_stream = self.upcoming[0]
+            except IndexError:
+                next_stream = None
+            xfade = self.crossfade_frames if next_stream is not None else 0
+            fade_start = max(0, stream.duration - xfade)
+
+            if xfade and stream.position >= fade_start:
+                # Crossfade: le due tracce insieme, curve allineate al campione
+                offset = stream.position - fade_start
+                k = min(frames - pos, stream.duration - stream.position)
+                if k > 0:
+                    a = out[pos:pos + k]
+                    b = self._next_out[:k]
+                    stream.read_into(a)
+                    next_stream.read_into(b)
+                    offset = min(offset, len(self._fade_out) - k)
+                    a *= self._fade_out[offset:offset + k]
+                    b *= self._fade_in[offset:offset + k]
+                    a += b
+                    pos += k
+                if stream.position >= stream.duration or k <= 0:
+                    stream.finished = True
+                    self._advance()
+                continue
+
+            limit = frames - pos
+            if xfade:
+                limit = min(limit, fade_start - stream.position)
+            n = stream.read_into(out[pos:pos + limit])
+            pos += n
+            if n < limit:
+                if stream.finished and self._advance():
+                    continue  # Gapless: il resto del blocco dalla traccia successiva
+                out[pos:] = 0.0
+                if stream.finished:
+                    if self.queue:
+                        # Prossima traccia non ancora aperta (prefetch in ritardo): silenzio
+                        self._prefetch_wake.set()
+                    else:
+                        self.playing = False
+                        if self.on_finished is not None:
+                            self.on_finished()
+                break
+
+    def request_sample_rate(self, sample_rate: int):
+        """Nuovo sample rate dell'engine chiesto dal thread audio
+        
+        Riaprire il file (decoder, resampler, seek) e ricreare crossfade e stretcher
+        non si fa nel callback: lo fa il thread di prefetch e render() restituisce
+        silenzio finché il nuovo stream non è pronto.
+        """
+        if sample_rate == self.sample_rate and self._pending_rate is None:
+            return
+        self._pending_rate = sample_rate
+        self._prefetch_wake.set()
+
+    def set_sample_rate(self, sample_rate: int):
+        """Nuovo sample rate dell'engine: riapre il file alla stessa posizione (non dal thread audio)"""
+        if sample_rate == self.sample_rate:
+            return
+        old_rate = self.sample_rate
+        self.sample_rate = sample_rate
+        self.set_crossfade(self.crossfade_seconds)
+        self._replace_stretcher(sample_rate, self.stretcher.preset)
+        # Tracce aperte in anticipo al vecchio sample rate: di nuovo in coda (dopo load(),
+        # che svuota la coda)
+        pending = self.queued_paths
+        played = list(self.played)
+        self.clear_queue()
+        stream = self.stream
+        if isinstance(stream, ProgressiveStream) and not stream.complete:
+            # Lo spool è al vecchio sample rate e il file della libreria non è ancora pronto
+            self.playing = False
+            print("⚠️ Media Player: download in corso, ricarica il brano dalla libreria a download finito")
+        elif stream is not None:
+            playing = self.playing
+            position = stream.position * sample_rate // old_rate
+            self.load(stream.path)
+            self.stream.seek(position)
+            self.playing = playing
+            self.played.clear()
+            self.played.extend(played)
+        self.queue.extend(pending)
+        self._request_prefetch()
+
+    def close(self):
+        """Ferma il thread di prefetch e chiude tutti gli stream (player non più usabile)"""
+        self.playing = False
+        self._prefetch_stop.set()
+        self._prefetch_wake.set()
+        if self._prefetch_thread is not None and self._prefetch_thread is not threading.current_thread():
+            self._prefetch_thread.join(timeout=2.0)
+        self.queue.clear()
+        while self.upcoming:
+            self._retired.append(self.upcoming.popleft())
+        while self._retired:
+            self._retired.popleft().close()
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
@@ -3,30 +3,46 @@ Mixer Engine Professionale - Sostituto di Voicemeeter
 Gestisce routing multi-canale, processing e output simultanei
 """
 import numpy as np
-import sounddevice as sd
+import os
 import threading
-from typing import Dict, List, Optional, Callable
-from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Callable
 from scipy import signal
 import queue
 import time
+from collections import deque
 
+from audio_backends import AudioBackend, AudioDevice, get_default_backend
+from audio_engine import AudioClip
+from audio_fifo import AudioFifo
+from bus_taps import TapReader, VirtualBusClock, readonly_view
+from clip_capture import ClipCapture, persist_clip
+from cpu_governor import CpuGovernor
+from disk_recorder import StreamingRecorder, track_path
+from replay_buffer import ReplayBuffer
+from stem_recorder import StemSession
+from device_streams import DeviceStreamGroup, pair_view
+from jitter_buffer import JitterBuffer
+from media_stream import MediaPlayerSource
+from realtime_audio import elevate_current_thread
 
-@dataclass
-class AudioDevice:
-    """Rappresenta un dispositivo audio"""
-    id: int
-    name: str
-    input_channels: int
-    output_channels: int
-    sample_rate: float
-    is_default_input: bool = False
-    is_default_output: bool = False
+
+# Sotto questo picco (-120 dB) un blocco è considerato silenzio
+SILENCE_THRESHOLD = 1e-6
+
+# Bus creati all'avvio (come Voicemeeter); altri bus si aggiungono con ProMixer.add_bus
+DEFAULT_BUSES = ('A1', 'A2', 'A3', 'B1', 'B2')
 
 
 class AudioProcessor:
     """Processing chain per canale audio"""
     
+    # Coefficienti dell'envelope del gate (per campione)
+    GATE_ALPHA_ATTACK = 0.015  # Attack un po' più lento per evitare click
+    GATE_ALPHA_RELEASE = 0.0008  # Release molto lento per suono naturale
+    
+    # Coda dei filtri EQ dopo la fine del segnale (secondi)
+    EQ_TAIL_SEC = 0.05
+    
     def __init__(self, sample_rate: int = 44100):
         self.sample_rate = sample_rate
         self.eq_low = 0.0      # dB (-12 a +12)
@@ -45,6 +61,58 @@ class AudioProcessor:
         self.vad_signal_duration = 0  # Durata segnale sopra threshold
         self.vad_min_duration = int(0.08 * sample_rate)  # 80ms minimo per non essere considerato click
         
+        # Bypass imposto dal CPU governor (indipendente dai controlli utente)
+        self.governor_bypass = {'eq': False, 'comp': False}
+        self._bypass_applied = {'eq': False, 'comp': False}
+        
+        # Filtri EQ progettati una sola volta per sample rate (non a ogni blocco)
+        self._sos_cache = {}
+    
+    def set_sample_rate(self, sample_rate: int):
+        """Aggiorna il sample rate mantenendo lo stato (envelope/hold) del gate"""
+        if sample_rate == self.sample_rate:
+            return
+        # Riscala i contatori in corso alla nuova durata in campioni
+        scale = sample_rate / self.sample_rate
+        self.vad_hold_counter = int(self.vad_hold_counter * scale)
+        self.vad_signal_duration = int(self.vad_signal_duration * scale)
+        self.sample_rate = sample_rate
+        self.vad_hold_samples = int(0.25 * sample_rate)
+        self.vad_min_duration = int(0.08 * sample_rate)
+        self._sos_cache = {}
+    
+    # Banda EQ -> (frequenze, tipo filtro)
+    EQ_BANDS = {
+        'low': (80, 'low'),
+        'mid': ([500, 2000], 'band'),
+        'high': (8000, 'high'),
+    }
+    
+    def _get_sos(self, band: str) -> np.ndarray:
+        """Filtro della banda EQ (progettato al primo uso e poi riusato)"""
+        sos = self._sos_cache.get(band)
+        if sos is None:
+            freq, btype = self.EQ_BANDS[band]
+            sos = signal.butter(2, freq, btype, fs=self.sample_rate, output='sos')
+            self._sos_cache[band] = sos
+        return sos
+    
+    def get_state(self) -> dict:
+        """Stato dinamico (envelope del gate, cross-fade del governor)"""
+        return {
+            'vad_envelope': self.vad_envelope,
+            'vad_hold_counter': self.vad_hold_counter,
+            'vad_signal_duration': self.vad_signal_duration,
+            'bypass_applied': dict(self._bypass_applied),
+        }
+    
+    def set_state(self, state: dict):
+        """Ripristina lo stato salvato con get_state()"""
+        self.vad_envelope = state['vad_envelope']
+        self.vad_hold_counter = state['vad_hold_counter']
+        self.vad_signal_duration = state['vad_signal_duration']
+        self._bypass_applied = dict(state['bypass_applied'])
+        
     def apply_eq(self, audio: np.ndarray) -> np.ndarray:
         """Equalizzatore a 3 bande"""
         if len(audio) == 0:
@@ -59,21 +127,21 @@ class AudioProcessor:
         # Low shelf (80Hz)
         if self.eq_low != 0.0:
             gain_linear = 10 ** (self.eq_low / 20.0)
-            sos_low = signal.butter(2, 80, 'low', fs=self.sample_rate, output='sos')
+            sos_low = self._get_sos('low')
             low_band = signal.sosfilt(sos_low, audio, axis=0)
             output = audio + low_band * (gain_linear - 1.0)
         
         # Mid peak (1kHz)
         if self.eq_mid != 0.0:
             gain_linear = 10 ** (self.eq_mid / 20.0)
-            sos_mid = signal.butter(2, [500, 2000], 'band', fs=self.sample_rate, output='sos')
+            sos_mid = self._get_sos('mid')
             mid_band = signal.sosfilt(sos_mid, audio, axis=0)
             output = output + mid_band * (gain_linear - 1.0)
         
         # High shelf (8kHz)
         if self.eq_high != 0.0:
             gain_linear = 10 ** (self.eq_high / 20.0)
-            sos_high = signal.butter(2, 8000, 'high', fs=self.sample_rate, output='sos')
+            sos_high = self._get_sos('high')
             high_band = signal.sosfilt(sos_high, audio, axis=0)
             output = output + high_band * (gain_linear - 1.0)
         
@@ -138,8 +206,8 @@ class AudioProcessor:
             self.vad_hold_counter -= len(target_gain)
         
         # Smooth envelope con coefficienti fissi
-        alpha_attack = 0.015  # Attack un po' più lento per evitare click
-        alpha_release = 0.0008  # Release molto lento per suono naturale
+        alpha_attack = self.GATE_ALPHA_ATTACK
+        alpha_release = self.GATE_ALPHA_RELEASE
         
         # Calcola envelope
         output_gain = np.zeros_like(target_gain)
@@ -155,6 +223,29 @@ class AudioProcessor:
         
         return audio * output_gain
     
+    def advance_silence(self, frames: int):
+        """Avanza lo stato del gate come se avesse elaborato `frames` campioni di silenzio
+        
+        Usato quando il blocco viene saltato dal fast path: l'envelope segue la
+        stessa curva (esponenziale verso il target) che avrebbe avuto elaborandolo.
+        """
+        if not self.gate_enabled:
+            return
+        self.vad_signal_duration = 0
+        if self.vad_hold_counter > 0:
+            target = 0.95
+            self.vad_hold_counter -= frames
+        else:
+            target = 0.0
+        alpha = self.GATE_ALPHA_ATTACK if target > self.vad_envelope else self.GATE_ALPHA_RELEASE
+        self.vad_envelope = target + (self.vad_envelope - target) * (1.0 - alpha) ** frames
+    
+    def tail_frames(self) -> int:
+        """Campioni da elaborare ancora dopo la fine del segnale (code dei filtri)"""
+        if self.eq_low != 0.0 or self.eq_mid != 0.0 or self.eq_high != 0.0:
+            return int(self.EQ_TAIL_SEC * self.sample_rate)
+        return 0
+    
     def process(self, audio: np.ndarray) -> np.ndarray:
         """Applica tutta la processing chain"""
         if len(audio) == 0:
@@ -166,16 +257,36 @@ class AudioProcessor:
             return audio
         
         audio = self.apply_gate(audio)
-        audio = self.apply_eq(audio)
-        audio = self.apply_compressor(audio)
+        audio = self._run_stage('eq', audio, self.apply_eq)
+        audio = self._run_stage('comp', audio, self.apply_compressor)
         
         return audio
+    
+    def _run_stage(self, stage: str, audio: np.ndarray, fn: Callable) -> np.ndarray:
+        """Esegue uno stadio rispettando il bypass del governor
+        
+        Al cambio di stato il blocco è un cross-fade lineare tra uscita
+        elaborata e segnale diretto, per non avere salti udibili.
+        """
+        bypassed = self.governor_bypass[stage]
+        if bypassed == self._bypass_applied[stage]:
+            return audio if bypassed else fn(audio)
+        
+        self._bypass_applied[stage] = bypassed
+        processed = fn(audio)
+        ramp = np.linspace(0.0, 1.0, len(audio), dtype=np.float32)[:, None]
+        if bypassed:
+            ramp = 1.0 - ramp
+        return audio + (processed - audio) * ramp
 
 
 class MixerChannel:
     """Singolo canale del mixer"""
     
-    def __init__(self, name: str, channel_type: str, sample_rate: int = 44100):
+    INPUT_FIFO_FRAMES = 16384
+    
+    def __init__(self, name: str, channel_type: str, sample_rate: int = 44100,
+                 bus_names: Optional[Iterable[str]] = None):
         self.name = name
         self.channel_type = channel_type  # 'hardware', 'virtual', 'bus', 'python'
         self.sample_rate = sample_rate
@@ -187,14 +298,8 @@ class MixerChannel:
         self.solo = False
         self.pan = 0.0  # -1.0 (L) a +1.0 (R)
         
-        # Routing - a quali bus mandare questo canale
-        self.routing = {
-            'A1': False,
-            'A2': False,
-            'A3': False,
-            'B1': False,
-            'B2': False,
-        }
+        # Routing - a quali bus mandare questo canale (una chiave per bus del mixer)
+        self.routing = {bus_name: False for bus_name in (bus_names or DEFAULT_BUSES)}
         
         # Processing
         self.processor = AudioProcessor(sample_rate)
@@ -205,15 +310,17 @@ class MixerChannel:
         # Callback audio per canali custom
         self.audio_callback = None  # Funzione che genera audio: callback(frames) -> np.ndarray
         
-        # Buffer audio (deprecato, usare audio_queue)
-        self.audio_buffer = None
+        # Sorgente con una sola testina (media player): render(frames) una volta per
+        # ciclo, stesso blocco per tutti i bus (il canale non viene generato per bus)
+        self.media_source = None
         
-        # Audio queue thread-safe per TUTTI i canali (hardware e python)
-        self.audio_queue = queue.Queue(maxsize=10)
+        # Canali 'bus' (ritorno bus → canale): bus di cui riprendere il mix
+        self.source_bus: Optional[str] = None
         
-        # Buffer condiviso per multi-bus (evita consumo multiplo della queue)
-        self.shared_audio_buffer = None
-        self.shared_buffer_timestamp = None
+        # Jitter buffer di input (canali hardware/virtual): la callback del dispositivo
+        # scrive blocchi della dimensione decisa dal driver, l'engine legge a quanti
+        # fissi compensando il drift tra il clock di input e quello dell'engine
+        self.jitter_buffer = JitterBuffer(sample_rate, capacity=self.INPUT_FIFO_FRAMES)
         
         # Input queue per canali "python" (ricevono audio da codice Python) - LEGACY
         if channel_type == 'python':
@@ -224,6 +331,22 @@ class MixerChannel:
         # Metering
         self.peak_level = -np.inf  # dB
         self.rms_level = -np.inf   # dB
+        self.metering_interval = 1  # 1 = ogni blocco (alzato dal CPU governor)
+        self._metering_counter = 0
+        
+        # Fast path del silenzio: code degli effetti ancora da elaborare per bus e contatori
+        self._tail_remaining: Dict[str, int] = {}
+        self.processed_blocks = 0
+        self.skipped_blocks = 0
+        
+        # Registrazione multitraccia: 'pre'/'post' fader (None = non registrato) e
+        # blocco catturato nel ciclo corrente (il primo, per i canali generati per bus)
+        self.stem_mode: Optional[str] = None
+        self.stem_block: Optional[np.ndarray] = None
+        
+        # Cattura in clip (pre-fader): blocco del ciclo corrente per le ClipCapture attive
+        self.capturing = False
+        self.capture_block: Optional[np.ndarray] = None
         
     def set_fader_db(self, db: float):
         """Imposta fader in dB (-60 a +12)"""
@@ -258,6 +381,12 @@ class MixerChannel:
             self.rms_level = -np.inf
             return
         
+        # Metering ridotto dal CPU governor: misura solo un blocco ogni N
+        self._metering_counter += 1
+        if self._metering_counter < self.metering_interval:
+            return
+        self._metering_counter = 0
+        
         # Peak
         peak = np.max(np.abs(audio))
         self.peak_level = 20 * np.log10(np.maximum(peak, 1e-10))
@@ -318,8 +447,43 @@ class MixerChannel:
             padding = np.zeros((n_frames - len(audio), 2), dtype=np.float32)
             return np.vstack([audio, padding])
     
+    def read_input(self, frames: int) -> Optional[np.ndarray]:
+        """Legge un quanto dal jitter buffer di input
+        
+        La lettura parte solo quando il buffer ha raggiunto la latenza target
+        (almeno un quanto più il blocco più grande del dispositivo); dopo un
+        underrun si riaccumula e la latenza target cresce.
+        
+        Args:
+            frames: Frame da leggere (quanto dell'engine)
+        
+        Returns:
+            Blocco (frames, 2) oppure None se il canale non ha audio da dare
+        """
+        return self.jitter_buffer.read(frames)
+    
+    def can_skip(self, audio: np.ndarray, bus_name: str) -> bool:
+        """True se il blocco è silenzio e le code degli effetti verso il bus sono finite"""
+        if len(audio) and np.abs(audio).max() > SILENCE_THRESHOLD:
+            self._tail_remaining[bus_name] = self.processor.tail_frames()
+            return False
+        remaining = self._tail_remaining.get(bus_name, 0)
+        if remaining > 0:
+            # Silenzio in ingresso ma i filtri stanno ancora suonando: elabora
+            self._tail_remaining[bus_name] = remaining - len(audio)
+            return False
+        return True
+    
+    def skip_silent_block(self, frames: int):
+        """Blocco saltato: aggiorna stato del gate e metering come se fosse stato elaborato"""
+        self.processor.advance_silence(frames)
+        self.peak_level = -np.inf
+        self.rms_level = -np.inf
+        self.skipped_blocks += 1
+    
     def process(self, audio: np.ndarray) -> np.ndarray:
         """Processa l'audio del canale"""
+        self.processed_blocks += 1
         if self.mute:
             return np.zeros_like(audio)
         
@@ -330,6 +494,11 @@ class MixerChannel:
             self.processor.eq_low != 0.0 or self.processor.eq_mid != 0.0 or self.processor.eq_high != 0.0):
             output = self.processor.process(output)
         
+        if self.stem_mode == 'pre' and self.stem_block is None:
+            self.stem_block = output
+        if self.capturing and self.capture_block is None:
+            self.capture_block = output
+        
         # Applica gain (fader) DOPO gli effetti
         output = output * self.gain
         
@@ -337,6 +506,9 @@ class MixerChannel:
         if self.pan != 0.0:  # Applica solo se necessario
             output = self.apply_pan(output)
         
+        if self.stem_mode == 'post' and self.stem_block is None:
+            self.stem_block = output
+        
         # Metering
         self.update_metering(output)
         
@@ -346,6 +518,8 @@ class MixerChannel:
 class OutputBus:
     """Bus di output (come A1, A2, etc in Voicemeeter)"""
     
+    OUTPUT_FIFO_FRAMES = 16384
+    
     def __init__(self, name: str, device_id: Optional[int] = None, sample_rate: int = 44100):
         self.name = name
         self.device_id = device_id
@@ -355,13 +529,47 @@ class OutputBus:
         self.master_fader = 0.0  # dB
         self.mute = False
         
-        # Stream audio
-        self.stream: Optional[sd.OutputStream] = None
-        self.audio_queue = queue.Queue(maxsize=10)
+        # Stream audio (creato dal backend del ProMixer, condiviso con gli altri
+        # canali/bus dello stesso dispositivo) e coppia di canali usata sul dispositivo
+        self.stream = None
+        self.dtype = 'float32'
+        self.channel_offset = 0  # 0 = canali 1-2, 2 = canali 3-4, ...
+        
+        # Hot-swap: ogni stream ha una generazione, quello nuovo prende il posto
+        # del vecchio al primo blocco (vedi ProMixer.hot_swap)
+        self.stream_generation = 0
+        self.pending_generation = None
+        self.pending_stream = None
+        self.pending_sample_rate = None
+        self.retired_streams = []
+        # Primo blocco del nuovo stream (prima del fade-in): il vecchio stream suona lo
+        # stesso audio in fade-out invece di leggere altri frame dalla FIFO
+        self.swap_block = None
+        self.swap_block_rate = None
+        
+        # FIFO di output: l'engine scrive quanti fissi, la callback legge i frame chiesti dal driver
+        self.output_fifo = AudioFifo(self.OUTPUT_FIFO_FRAMES)
+        self.resample_phase = 0.0  # Frazione di frame engine accumulata (bus con sample rate diverso)
         
         # Metering
         self.peak_level = -np.inf
         self.rms_level = -np.inf
+        self.metering_interval = 1
+        self._metering_counter = 0
+        
+        # Fast path del silenzio: blocchi in cui nessun canale ha contribuito
+        self.skipped_blocks = 0
+        
+        # Consumatori nel processo (vedi bus_taps): callback(block) con una vista in sola
+        # lettura di ogni blocco renderizzato. Lista sostituita, mai modificata sul posto
+        self.taps: List[Callable] = []
+        self.last_block: Optional[np.ndarray] = None  # Ultimo blocco (per i canali di ritorno)
+        self.last_cycle = -1  # Ciclo dell'engine che ha prodotto last_block
+        self.tap_errors = 0
+        
+        # Statistiche callback (durata in secondi e deadline del blocco) e xrun
+        self.callback_stats = deque(maxlen=2048)
+        self.xrun_count = 0
     
     def set_fader_db(self, db: float):
         """Imposta master fader in dB"""
@@ -379,6 +587,11 @@ class OutputBus:
             self.rms_level = -np.inf
             return
         
+        self._metering_counter += 1
+        if self._metering_counter < self.metering_interval:
+            return
+        self._metering_counter = 0
+        
         peak = np.max(np.abs(audio))
         self.peak_level = 20 * np.log10(np.maximum(peak, 1e-10))
         
@@ -389,9 +602,28 @@ class OutputBus:
 class ProMixer:
     """Mixer Professionale Multi-Bus"""
     
-    def __init__(self, sample_rate: int = 44100, buffer_size: int = 1024):
+    # Quanti di elaborazione interni ammessi (frame)
+    QUANTUM_SIZES = (128, 256)
+    
+    # Tipi di canale creabili con add_channel
+    CHANNEL_TYPES = ('hardware', 'virtual', 'python')
+    
+    def __init__(self, sample_rate: int = 44100, buffer_size: int = 1024,
+                 backend: Optional[AudioBackend] = None, quantum: int = 256):
         self.sample_rate = sample_rate
-        self.buffer_size = buffer_size
+        self.buffer_size = buffer_size  # Block size chiesto ai dispositivi (latenza)
+        
+        # Quanto interno: l'engine elabora sempre blocchi di questa dimensione,
+        # le FIFO di canali e bus adattano i blocchi dei dispositivi
+        if quantum not in self.QUANTUM_SIZES:
+            raise ValueError(f"Quanto {quantum} non supportato (ammessi: {self.QUANTUM_SIZES})")
+        self.quantum = quantum
+        
+        # True = i dispositivi usano il block size ottimale del driver (blocksize=0)
+        self.driver_blocksize = False
+        
+        # Backend dispositivi (sounddevice di default, dispositivi sostitutivi per test/headless)
+        self.backend = backend or get_default_backend()
         
         # Canali input
         self.channels: Dict[str, MixerChannel] = {}
@@ -399,16 +631,19 @@ class ProMixer:
         # Bus output
         self.buses: Dict[str, OutputBus] = {}
         
-        # Recording state
+        # Recording state: registrazione in streaming su disco tramite tap dei bus
         self.is_recording = False
         self.recording_bus = 'A1'  # Default: registra da A1 (Discord/streaming)
-        self.recorded_frames = []
+        self.recording_buses: List[str] = []
+        self.recorder: Optional[StreamingRecorder] = None
+        self._recording_taps: Dict[str, Callable] = {}
+        self.stem_session: Optional[StemSession] = None  # Registrazione multitraccia
+        self.replay_buffers: Dict[str, ReplayBuffer] = {}  # Instant replay per bus
+        self.clip_captures: List[ClipCapture] = []  # Catture canale → clip attive
+        self.media_player = MediaPlayerSource(sample_rate)  # Sorgente del canale HW3
         
         # Streams attivi
-        self.input_streams: Dict[str, sd.InputStream] = {}
-        
-        # Streams attivi
-        self.input_streams: Dict[str, sd.InputStream] = {}
+        self.input_streams: Dict[str, object] = {}
         self.input_device_map: Dict[str, int] = {}  # Mappa channel_id -> device_id per salvataggio config
         self.is_running = False
         
@@ -421,6 +656,38 @@ class ProMixer:
         # Contatore globale di cicli audio (per multi-bus sync)
         self.audio_cycle_counter = 0
         
+        # Hot-swap stream: generazioni degli stream e configurazione in attesa
+        self._stream_generation_counter = 0
+        self.input_generations: Dict[str, int] = {}  # channel_id -> generazione input attiva
+        self.pending_input_generations: Dict[str, int] = {}
+        self._pending_engine_config = None  # (sample_rate, buffer_size) applicato al primo blocco
+        self.crossfade_ms = 10.0
+        
+        # CPU governor: degrada compressore/EQ/metering/resampling se le callback sforano il budget
+        self.governor = CpuGovernor(is_stage_active=self._governor_stage_active,
+                                    on_change=self._on_governor_change)
+        
+        # Priorità real-time dei thread audio (opzionale) e fine dell'ultima callback
+        # (usata dal GcScheduler per collezionare nelle finestre idle)
+        self.realtime_priority = False
+        self.cpu_affinity: Optional[List[int]] = None
+        self._rt_threads = set()
+        self.last_callback_end = 0.0
+        self.last_callback_deadline = 0.0
+        
+        # Jitter buffer degli input: latenza target e correzione del drift di clock
+        self.input_latency_ms = 10.0
+        self.drift_compensation = True
+        
+        # Stream per dispositivo: canali e bus dello stesso dispositivo condividono
+        # un solo stream (duplex se ci sono sia input sia output)
+        self.device_groups: Dict[int, DeviceStreamGroup] = {}
+        self.input_channel_offsets: Dict[str, int] = {}  # channel_id -> primo canale della coppia
+        self.duplex_enabled = True
+        
+        # Bus virtuali: cicli a tempo reale quando nessun dispositivo di output li fa girare
+        self.virtual_clock = VirtualBusClock(self)
+        
         self._init_default_channels()
     
     def _init_default_channels(self):
@@ -436,6 +703,7 @@ class ProMixer:
         
         # Media Player (canale dedicato)
         media_ch = MixerChannel("MediaPlayer", "python", self.sample_rate)
+        media_ch.media_source = self.media_player
         self.channels["HW3"] = media_ch  # Mantiene ID HW3 per compatibilità
         
         # Virtual Inputs (2 come Voicemeeter)
@@ -444,9 +712,336 @@ class ProMixer:
             self.channels[f"VIRT{i}"] = ch
         
         # Buses (A1-A3, B1-B2 come Voicemeeter)
-        for bus_name in ['A1', 'A2', 'A3', 'B1', 'B2']:
+        for bus_name in DEFAULT_BUSES:
             bus = OutputBus(bus_name, None, self.sample_rate)
             self.buses[bus_name] = bus
+        
+        # Canali e bus di default: usati dall'app, non rimovibili
+        self.builtin_strips = set(self.channels) | set(self.buses)
+    
+    # ========== CANALI E BUS DINAMICI ==========
+    # channels/buses/routing vengono sostituiti (copy-on-write) invece di essere
+    # modificati sul posto: UI e thread audio che li stanno iterando continuano
+    # sulla versione precedente senza errori, l'engine vede la nuova al ciclo dopo.
+    
+    def add_channel(self, channel_id: str, name: Optional[str] = None,
+                    channel_type: str = 'hardware') -> MixerChannel:
+        """Aggiunge un canale al mixer senza fermare l'engine
+        
+        Args:
+            channel_id: Identificativo univoco (es. "HW4", "MUSIC")
+            name: Nome mostrato nella UI (default: channel_id)
+            channel_type: 'hardware', 'virtual' (input da dispositivo) o 'python'
+                (audio generato da codice: audio_source / audio_callback)
+        """
+        if channel_type not in self.CHANNEL_TYPES:
+            raise ValueError(f"Tipo canale '{channel_type}' non valido (ammessi: {self.CHANNEL_TYPES})")
+        return self._insert_channel(channel_id, name or channel_id, channel_type)
+    
+    def add_return_channel(self, channel_id: str, bus_name: str,
+                           name: Optional[str] = None) -> MixerChannel:
+        """Aggiunge un canale che riprende il mix di un bus (ritorno bus → canale)
+        
+        Il canale legge il blocco del bus renderizzato al ciclo precedente (un quanto
+        di ritardo, nessun problema di ordine tra bus) e non può essere routato
+        sul proprio bus sorgente.
+        """
+        if bus_name not in self.buses:
+            raise KeyError(bus_name)
+        return self._insert_channel(channel_id, name or f"{bus_name} Return", 'bus', source_bus=bus_name)
+    
+    def _insert_channel(self, channel_id: str, name: str, channel_type: str,
+                        source_bus: Optional[str] = None) -> MixerChannel:
+        with self.lock:
+            if channel_id in self.channels or channel_id in self.buses:
+                raise ValueError(f"'{channel_id}' esiste già")
+            channel = MixerChannel(name, channel_type, self.sample_rate, bus_names=self.buses.keys())
+            channel.source_bus = source_bus
+            self.channels = {**self.channels, channel_id: channel}
+            self._apply_governor_state()
+            self._sync_jitter_buffers()
+        source = f" ← {source_bus}" if source_bus else ""
+        print(f"➕ Canale {channel_id} ({channel_type}{source}) aggiunto: {len(self.channels)} canali")
+        return channel
+    
+    def remove_channel(self, channel_id: str):
+        """Rimuove un canale (stacca prima il suo input dal dispositivo)"""
+        if channel_id in self.builtin_strips:
+            raise ValueError(f"Il canale {channel_id} è predefinito e non può essere rimosso")
+        if channel_id not in self.channels:
+            raise KeyError(channel_id)
+        # Fuori dal lock: riaprire lo stream del dispositivo attende le callback in corso
+        self.stop_input(channel_id)
+        with self.lock:
+            channels = dict(self.channels)
+            del channels[channel_id]
+            self.channels = channels
+            self.input_generations.pop(channel_id, None)
+            self.pending_input_generations.pop(channel_id, None)
+        print(f"➖ Canale {channel_id} rimosso: {len(self.channels)} canali")
+    
+    def add_bus(self, bus_name: str, device_id: Optional[int] = None,
+                first_channel: Optional[int] = None) -> OutputBus:
+        """Aggiunge un bus di output (non routato, da avviare con start_output)"""
+        with self.lock:
+            if bus_name in self.buses or bus_name in self.channels:
+                raise ValueError(f"'{bus_name}' esiste già")
+            bus = OutputBus(bus_name, device_id, self.sample_rate)
+            if first_channel is not None:
+                bus.channel_offset = first_channel
+            bus.metering_interval = 4 if self.governor.is_degraded('metering') else 1
+            for channel in self.channels.values():
+                channel.routing = {**channel.routing, bus_name: False}
+            self.buses = {**self.buses, bus_name: bus}
+        print(f"➕ Bus {bus_name} aggiunto: {len(self.buses)} bus")
+        return bus
+    
+    def remove_bus(self, bus_name: str):
+        """Rimuove un bus: chiude il suo output e lo toglie dal routing dei canali"""
+        if bus_name in self.builtin_strips:
+            raise ValueError(f"Il bus {bus_name} è predefinito e non può essere rimosso")
+        if bus_name not in self.buses:
+            raise KeyError(bus_name)
+        if self.is_recording and bus_name in self.recording_buses:
+            raise ValueError(f"Il bus {bus_name} è in registrazione")
+        self.stop_replay(bus_name)
+        self.stop_output(bus_name)
+        with self.lock:
+            buses = dict(self.buses)
+            del buses[bus_name]
+            self.buses = buses
+            for channel in self.channels.values():
+                if bus_name in channel.routing:
+                    channel.routing = {k: v for k, v in channel.routing.items() if k != bus_name}
+        print(f"➖ Bus {bus_name} rimosso: {len(self.buses)} bus")
+    
+    def get_layout(self) -> dict:
+        """Canali e bus aggiunti dall'utente (per il salvataggio della configurazione)"""
+        return {
+            'channels': {ch_id: {'name': ch.name, 'type': ch.channel_type, 'source_bus': ch.source_bus}
+                         for ch_id, ch in self.channels.items() if ch_id not in self.builtin_strips},
+            'buses': [name for name in self.buses if name not in self.builtin_strips],
+        }
+    
+    def apply_layout(self, layout: dict):
+        """Ricrea i canali e i bus salvati con get_layout (quelli già presenti vengono saltati)"""
+        for bus_name in layout.get('buses', []):
+            if bus_name not in self.buses:
+                self.add_bus(bus_name)
+        for ch_id, info in layout.get('channels', {}).items():
+            if ch_id not in self.channels:
+                try:
+                    if info.get('type') == 'bus':
+                        self.add_return_channel(ch_id, info.get('source_bus'), info.get('name'))
+                    else:
+                        self.add_channel(ch_id, info.get('name'), info.get('type', 'hardware'))
+                except (KeyError, ValueError) as e:
+                    print(f"⚠️ Layout: canale {ch_id} ignorato ({e})")
+    
+    # ========== BUS TAP (CONSUMATORI NEL PROCESSO) ==========
+    
+    def add_bus_tap(self, bus_name: str, callback: Callable) -> Callable:
+        """Registra un consumatore sincrono dei blocchi di un bus
+        
+        callback(block) viene chiamata nel thread audio con una vista in sola lettura
+        (nessuna copia) di ogni blocco renderizzato: deve essere veloce e copiare i
+        dati se li conserva oltre la chiamata. Un bus con tap viene renderizzato anche
+        senza dispositivo (vedi VirtualBusClock).
+        
+        Returns:
+            La callback stessa (da passare a remove_bus_tap)
+        """
+        with self.lock:
+            bus = self.buses[bus_name]
+            bus.taps = bus.taps + [callback]
+        return callback
+    
+    def remove_bus_tap(self, bus_name: str, callback: Callable):
+        """Rimuove un consumatore registrato con add_bus_tap"""
+        with self.lock:
+            bus = self.buses.get(bus_name)
+            if bus is not None:
+                bus.taps = [tap for tap in bus.taps if tap is not callback]
+    
+    def open_bus_reader(self, bus_name: str, capacity: Optional[int] = None) -> TapReader:
+        """Consumatore di un bus per un altro thread (rete, IPC, encoder)
+        
+        Args:
+            capacity: Frame nel ring buffer (default: 1 secondo)
+        """
+        reader = TapReader(bus_name, capacity or self.sample_rate)
+        self.add_bus_tap(bus_name, reader)
+        return reader
+    
+    def close_bus_reader(self, reader: TapReader):
+        """Stacca un TapReader dal suo bus e sblocca le letture in attesa"""
+        self.remove_bus_tap(reader.bus_name, reader)
+        reader.close()
+    
+    def _publish_bus(self, bus: OutputBus, mix: np.ndarray):
+        """Rende il blocco del bus disponibile a tap e canali di ritorno (senza copie)"""
+        view = readonly_view(mix)
+        bus.last_block = view
+        bus.last_cycle = self.audio_cycle_counter
+        for tap in bus.taps:
+            try:
+                tap(view)
+            except Exception as e:
+                bus.tap_errors += 1
+                if bus.tap_errors <= 5:
+                    print(f"⚠️ Tap bus {bus.name}: {e}")
+    
+    def _read_return(self, channel: MixerChannel, frames: int) -> Optional[np.ndarray]:
+        """Blocco del ciclo precedente del bus sorgente di un canale di ritorno"""
+        source = self.buses.get(channel.source_bus)
+        if source is None or source.last_block is None:
+            return None
+        if source.last_cycle != self.audio_cycle_counter - 1 or len(source.last_block) != frames:
+            return None
+        return source.last_block
+    
+    def _bus_has_consumers(self, bus_name: str, bus: OutputBus, return_sources: set) -> bool:
+        """True se il bus ha consumatori nel processo (tap, registrazione, canali di ritorno)"""
+        session = self.stem_session
+        return (bool(bus.taps) or bus_name in return_sources
+                or (session is not None and bus_name in session.bus_ids))
+    
+    def run_virtual_cycle(self) -> bool:
+        """Ciclo dei bus virtuali guidato dal VirtualBusClock
+        
+        Returns:
+            False se non serve (un dispositivo di output fa già girare l'engine
+            o nessun bus ha consumatori nel processo)
+        """
+        with self.lock:
+            if any(bus.stream is not None or bus.pending_stream is not None
+                   for bus in self.buses.values()):
+                return False
+            bus_names = self.active_bus_names()
+            if not bus_names:
+                return False
+            self.render_cycle(bus_names=bus_names)
+        return True
+    
+    @property
+    def device_blocksize(self) -> int:
+        """Block size con cui aprire gli stream (0 = scelto dal driver)"""
+        return 0 if self.driver_blocksize else self.buffer_size
+    
+    def _governor_stage_active(self, stage: str) -> bool:
+        """True se degradare lo stadio fa risparmiare qualcosa"""
+        if stage == 'compressor':
+            return any(ch.processor.comp_enabled for ch in self.channels.values())
+        if stage == 'eq':
+            return any(ch.processor.eq_low != 0.0 or ch.processor.eq_mid != 0.0 or ch.processor.eq_high != 0.0
+                       for ch in self.channels.values())
+        if stage == 'resampling':
+            return any(b.stream is not None and b.sample_rate != self.sample_rate for b in self.buses.values())
+        return True
+    
+    def _on_governor_change(self, event: dict):
+        """Applica lo stato del governor a canali e bus (chiamato dal thread audio)"""
+        self._apply_governor_state()
+        verb = "ridotto" if event['action'] == 'degrade' else "ripristinato"
+        label = CpuGovernor.STAGE_LABELS.get(event['stage'], event['stage'])
+        print(f"🐢 CPU governor: {label} {verb} (carico {event['load']:.0%})")
+    
+    def _apply_governor_state(self):
+        """Propaga gli stadi degradati ai processor e al metering"""
+        bypass_comp = self.governor.is_degraded('compressor')
+        bypass_eq = self.governor.is_degraded('eq')
+        metering_interval = 4 if self.governor.is_degraded('metering') else 1
+        for ch in self.channels.values():
+            ch.processor.governor_bypass['comp'] = bypass_comp
+            ch.processor.governor_bypass['eq'] = bypass_eq
+            ch.metering_interval = metering_interval
+        for b in self.buses.values():
+            b.metering_interval = metering_interval
+    
+    def set_governor_enabled(self, enabled: bool):
+        """Attiva/disattiva il CPU governor (disattivandolo torna subito la qualità piena)"""
+        self.governor.enabled = enabled
+        if not enabled:
+            self.governor.reset()
+    
+    def configure_realtime(self, enabled: bool, cpu_affinity: Optional[List[int]] = None):
+        """Priorità elevata (e affinità CPU opzionale) per i thread delle callback audio
+        
+        Viene applicata dal thread stesso alla sua prima callback; disattivarla
+        vale per i thread creati dopo (es. al prossimo riavvio degli stream).
+        """
+        self.realtime_priority = enabled
+        self.cpu_affinity = list(cpu_affinity) if cpu_affinity else None
+        self._rt_threads.clear()
+    
+    def _prepare_rt_thread(self):
+        """Alza la priorità del thread audio corrente (una volta per thread)"""
+        thread_id = threading.get_ident()
+        if thread_id in self._rt_threads:
+            return
+        self._rt_threads.add(thread_id)
+        try:
+            applied = elevate_current_thread(self.cpu_affinity)
+        except Exception as e:
+            applied = ""
+            print(f"⚠️ Priorità real-time non applicata: {e}")
+        if applied:
+            print(f"⚡ Thread audio {threading.current_thread().name}: {applied}")
+    
+    @property
+    def resample_filter(self) -> str:
+        """Filtro resampy delle callback (più economico se il governor lo richiede)"""
+        return 'kaiser_fast' if self.governor.is_degraded('resampling') else 'kaiser_best'
+    
+    def get_silence_stats(self) -> Dict[str, dict]:
+        """Blocchi elaborati/saltati dal fast path del silenzio per canale e bus"""
+        stats = {}
+        for ch_id, ch in self.channels.items():
+            stats[ch_id] = {'processed': ch.processed_blocks, 'skipped': ch.skipped_blocks}
+            source = ch.audio_source
+            if source is not None and hasattr(source, 'skipped_blocks'):
+                stats[ch_id]['source_skipped'] = source.skipped_blocks
+        for bus_name, bus in self.buses.items():
+            stats[bus_name] = {'skipped': bus.skipped_blocks}
+        return stats
+    
+    def get_input_stats(self) -> Dict[str, dict]:
+        """Riempimento, latenza e drift stimato dei jitter buffer dei canali hardware/virtual"""
+        return {ch_id: ch.jitter_buffer.get_stats()
+                for ch_id, ch in self.channels.items() if ch.channel_type in ('hardware', 'virtual')}
+    
+    def set_input_latency_target(self, target_ms: float):
+        """Latenza target dei jitter buffer di input (minimo: quanto + blocco del dispositivo)"""
+        with self.lock:
+            self.input_latency_ms = target_ms
+            self._sync_jitter_buffers()
+        print(f"⏱️ Latenza target input: {target_ms:.1f} ms")
+    
+    def set_drift_compensation(self, enabled: bool):
+        """Abilita/disabilita la correzione del drift di clock sugli input"""
+        with self.lock:
+            self.drift_compensation = enabled
+            self._sync_jitter_buffers()
+        print(f"🕰️ Compensazione drift input: {'ON' if enabled else 'OFF'}")
+    
+    def _sync_jitter_buffers(self):
+        """Applica latenza target e compensazione del drift ai jitter buffer
+        
+        Gli input in duplex condividono il clock del bus: nessun drift da
+        correggere e nessun margine oltre al minimo (quanto + blocco).
+        """
+        duplex_channels = {ch_id for group in self.device_groups.values() if group.is_duplex
+                           for ch_id in group.inputs}
+        for ch_id, ch in self.channels.items():
+            jb = ch.jitter_buffer
+            if ch_id in duplex_channels:
+                jb.base_target_ms = 0.0
+                jb.drift_compensation = False
+            else:
+                jb.base_target_ms = self.input_latency_ms
+                jb.drift_compensation = self.drift_compensation
+            if not jb.drift_compensation:
+                jb.ratio = 1.0
     
     def set_channel_routing(self, channel_id: str, bus_name: str, enabled: bool):
         """Imposta routing di un canale verso un bus"""
@@ -457,15 +1052,37 @@ class ProMixer:
                 status = "✓ ATTIVO" if enabled else "✗ DISATTIVATO"
                 print(f"   Routing {channel_id} → {bus_name}: {status}")
     
-    def set_bus_device(self, bus_name: str, device_id: int):
-        """Assegna dispositivo fisico a un bus"""
+    def set_bus_device(self, bus_name: str, device_id: int, first_channel: Optional[int] = None):
+        """Assegna dispositivo fisico a un bus
+        
+        Args:
+            first_channel: Primo canale (0-based) della coppia di output sul dispositivo
+                (None = invariato)
+        """
         with self.lock:
             if bus_name in self.buses:
                 self.buses[bus_name].device_id = device_id
+                if first_channel is not None:
+                    self.buses[bus_name].channel_offset = first_channel
     
-    def audio_input_callback(self, channel_id: str):
+    def _next_generation(self) -> int:
+        """Nuovo identificativo di generazione per uno stream"""
+        self._stream_generation_counter += 1
+        return self._stream_generation_counter
+    
+    def audio_input_callback(self, channel_id: str, generation: Optional[int] = None):
         """Genera callback per input stream"""
         def callback(indata, frames, time, status):
+            if self.realtime_priority:
+                self._prepare_rt_thread()
+            
+            # Hot-swap: il nuovo stream diventa attivo al primo blocco, quello vecchio viene ignorato
+            if generation is not None and self.input_generations.get(channel_id) != generation:
+                if self.pending_input_generations.get(channel_id) != generation:
+                    return
+                self.input_generations[channel_id] = generation
+                self.pending_input_generations.pop(channel_id, None)
+            
             if status:
                 print(f"[{channel_id}] Status: {status}")
             
@@ -476,23 +1093,12 @@ class ProMixer:
                         # Mono->Stereo: duplica il canale in modo efficiente
                         audio = np.column_stack((indata[:, 0], indata[:, 0]))
                     else:
-                        # Già stereo: usa direttamente
-                        audio = indata.copy()  # Copia per evitare race condition
-                    
-                    # Assicurati che sia float32 contiguous
-                    audio = np.ascontiguousarray(audio, dtype=np.float32)
+                        # Già stereo: la FIFO copia i campioni, nessuna copia qui
+                        audio = indata
                     
-                    # Usa queue thread-safe invece di sovrascrivere buffer
+                    # FIFO di input: accetta blocchi di qualsiasi dimensione (piena = scarta il più vecchio)
                     channel = self.channels[channel_id]
-                    try:
-                        channel.audio_queue.put_nowait(audio)
-                    except queue.Full:
-                        # Queue piena: rimuovi vecchio frame e aggiungi nuovo
-                        try:
-                            channel.audio_queue.get_nowait()
-                            channel.audio_queue.put_nowait(audio)
-                        except:
-                            pass
+                    channel.jitter_buffer.write(audio)
                     
                     # Aggiorna metering per VU meter
                     channel.update_metering(audio)
@@ -501,17 +1107,374 @@ class ProMixer:
         
         return callback
     
-    def audio_output_callback(self, bus_name: str):
-        """Genera callback per output stream"""
+    def device_stream_callback(self, group: DeviceStreamGroup, kind: str,
+                               stream_rate: Optional[int] = None, generation: Optional[int] = None):
+        """Genera la callback dello stream condiviso di un dispositivo
+        
+        Ogni canale/bus mappato riceve una vista (senza copie) sulla propria coppia
+        di canali del buffer; la logica per canale e per bus resta quella di
+        audio_input_callback / audio_output_callback.
+        
+        Args:
+            group: Dispositivo con i canali e i bus mappati
+            kind: 'input', 'output' o 'duplex'
+            stream_rate: Sample rate dello stream di output
+            generation: Generazione dello stream per l'hot-swap
+        """
+        inputs = []
+        if kind in ('input', 'duplex'):
+            inputs = [(first, self.audio_input_callback(ch_id, generation))
+                      for ch_id, first in group.inputs.items()]
+        outputs = []
+        if kind in ('output', 'duplex'):
+            outputs = [(first, self.audio_output_callback(bus_name, stream_rate, generation))
+                       for bus_name, first in group.outputs.items()]
+        
+        def feed_inputs(indata, frames, time_info, status):
+            for first, input_callback in inputs:
+                input_callback(pair_view(indata, first), frames, time_info, status)
+        
+        def render_outputs(outdata, frames, time_info, status):
+            if outdata.shape[1] > 2 or len(outputs) != 1:
+                # Canali del dispositivo non assegnati a nessun bus: silenzio
+                outdata.fill(0)
+            for first, output_callback in outputs:
+                view = pair_view(outdata, first)
+                if view.shape[1] == 2:
+                    output_callback(view, frames, time_info, status)
+                else:
+                    # Uscita mono: mix stereo sommato sull'unico canale
+                    stereo = np.zeros((frames, 2), dtype=outdata.dtype)
+                    output_callback(stereo, frames, time_info, status)
+                    view[:, 0] = stereo.mean(axis=1)
+        
+        if kind == 'input':
+            return feed_inputs
+        if kind == 'output':
+            return render_outputs
+        
+        def duplex(indata, outdata, frames, time_info, status):
+            # Input prima dell'output: il blocco appena catturato entra già nel mix
+            feed_inputs(indata, frames, time_info, None)
+            render_outputs(outdata, frames, time_info, status)
+        
+        return duplex
+    
+    def _read_python_channel(self, ch_id: str, channel: MixerChannel, frames: int,
+                             bus_name: str) -> Optional[np.ndarray]:
+        """Audio di un canale 'python' per un bus (posizioni di riproduzione indipendenti per bus)"""
+        audio = None
+        
+        # Priorità 1: Audio callback personalizzato (es: media player)
+        if channel.audio_callback:
+            try:
+                # Passa il nome del bus per posizioni indipendenti
+                audio = channel.audio_callback(frames, bus_name)
+            except TypeError:
+                # Fallback: callback non accetta bus_name
+                try:
+                    audio = channel.audio_callback(frames)
+                except Exception as e2:
+                    print(f"Errore callback audio {ch_id} (fallback): {e2}")
+                    audio = None
+            except Exception as e:
+                print(f"Errore callback audio {ch_id}: {e}")
+                audio = None
+            if audio is not None and len(audio) > 0:
+                # Assicura formato stereo
+                if audio.ndim == 1:
+                    audio = np.column_stack([audio, audio])
+                elif audio.shape[1] == 1:
+                    audio = np.column_stack([audio, audio])
+        
+        # Priorità 2: Audio source (soundboard)
+        if audio is None and channel.audio_source:
+            # Passa il nome del bus come stream_id per posizioni indipendenti
+            audio = channel.audio_source.get_audio(frames, stream_id=bus_name)
+        
+        # Priorità 3: Fallback queue (legacy)
+        if audio is None:
+            audio = channel.get_audio_from_queue(frames)
+        
+        return audio
+    
+    def active_bus_names(self) -> List[str]:
+        """Bus con uno stream di output aperto (o in arrivo da un hot-swap) o con consumatori nel processo"""
+        return_sources = {ch.source_bus for ch in self.channels.values()
+                          if ch.source_bus is not None and any(ch.routing.values())}
+        return [name for name, bus in self.buses.items()
+                if bus.stream is not None or bus.pending_stream is not None
+                or self._bus_has_consumers(name, bus, return_sources)]
+    
+    def render_cycle(self, frames: Optional[int] = None,
+                     bus_names: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """Esegue un ciclo dell'engine: un quanto per tutti i bus indicati
+        
+        I canali hardware/virtual leggono la loro FIFO di input (i canali di ritorno
+        il blocco del ciclo precedente del bus sorgente) e vengono elaborati
+        UNA volta per ciclo (stesso blocco per tutti i bus); i canali 'python'
+        vengono generati per ogni bus. Usato dalle callback di output (tramite le
+        FIFO dei bus), dal render offline e dal benchmark.
+        Va chiamato con self.lock acquisito.
+        
+        Args:
+            frames: Frame da generare (default: self.quantum)
+            bus_names: Bus da renderizzare (default: bus con uno stream attivo)
+        
+        Returns:
+            Dizionario {bus_name: mix (frames, 2) al sample rate del ProMixer}
+        """
+        frames = frames or self.quantum
+        if bus_names is None:
+            bus_names = self.active_bus_names()
+        self.audio_cycle_counter += 1
+        
+        # Un solo passaggio sui canali. I canali hardware/virtual con lo stesso routing
+        # vengono prima sommati tra loro e poi aggiunti una volta a ciascun bus:
+        # con decine di canali e bus il costo segue i canali + i gruppi di routing,
+        # non canali × bus
+        mixes = {name: np.zeros((frames, 2), dtype=np.float32) for name in bus_names}
+        active = dict.fromkeys(bus_names, 0)
+        groups: Dict[tuple, list] = {}  # bus routati -> [somma, canali]
+        python_channels = []
+        
+        for ch_id, channel in self.channels.items():
+            routing = channel.routing
+            routed = [name for name in bus_names if routing.get(name, False)]
+            if not routed:
+                continue
+            if channel.channel_type == 'python' and channel.media_source is None:
+                python_channels.append((ch_id, channel, routed))
+                continue
+            
+            # 1) Canali hardware/virtual/ritorno e media player: lettura ed elaborazione
+            #    una sola volta per tutti i bus
+            if channel.media_source is not None:
+                audio = channel.media_source.render(frames)
+            elif channel.channel_type == 'bus':
+                # Ritorno: mai sul proprio bus sorgente (anello di feedback)
+                routed = [name for name in routed if name != channel.source_bus]
+                audio = self._read_return(channel, frames) if routed else None
+            else:
+                audio = channel.read_input(frames)
+            if audio is None:
+                continue
+            # Fast path: blocco silenzioso senza code di effetti -> niente DSP
+            if channel.can_skip(audio, None):
+                channel.skip_silent_block(frames)
+                continue
+            processed = channel.process(audio)
+            group = groups.get(tuple(routed))
+            if group is None:
+                # process() restituisce un array nuovo: diventa l'accumulatore del gruppo
+                # (copiato se è anche il blocco della traccia multitraccia)
+                groups[tuple(routed)] = [processed.copy() if channel.stem_mode else processed, 1]
+            else:
+                group[0] += processed
+                group[1] += 1
+        
+        for routed, (subtotal, count) in groups.items():
+            for bus_name in routed:
+                mixes[bus_name] += subtotal
+                active[bus_name] += count
+        
+        # 2) Canali 'python': generati per ogni bus (posizioni di riproduzione indipendenti)
+        for ch_id, channel, routed in python_channels:
+            for bus_name in routed:
+                audio = self._read_python_channel(ch_id, channel, frames, bus_name)
+                if audio is None or len(audio) == 0:
+                    continue
+                if channel.can_skip(audio, bus_name):
+                    channel.skip_silent_block(len(audio))
+                    continue
+                # Processa canale (applica gain, effetti, pan) e aggiungi al mix
+                mixes[bus_name] += channel.process(audio)
+                active[bus_name] += 1
+        
+        buses = self.buses
+        for bus_name in bus_names:
+            mixes[bus_name] = self._finish_bus(bus_name, buses[bus_name], mixes[bus_name], active[bus_name])
+        
+        # Multitraccia: un blocco per traccia a ogni ciclo (silenzio se il canale non ha suonato)
+        if self.stem_session is not None:
+            self.stem_session.capture_cycle(self.channels, mixes, frames)
+        if self.clip_captures:
+            self._capture_channels(frames)
+        
+        return mixes
+    
+    def _capture_channels(self, frames: int):
+        """Alimenta le catture dei canali (silenzio se il canale non ha suonato nel ciclo)"""
+        channels = self.channels
+        captures = self.clip_captures
+        for capture in captures:
+            channel = channels.get(capture.source)
+            block = channel.capture_block if channel is not None else None
+            if block is not None:
+                capture(block)
+            else:
+                capture.skip(frames)
+        for capture in captures:
+            channel = channels.get(capture.source)
+            if channel is not None:
+                channel.capture_block = None
+    
+    def _finish_bus(self, bus_name: str, bus: OutputBus, mix: np.ndarray, active_channels: int) -> np.ndarray:
+        """Volume master, limiter, metering e registrazione del bus"""
+        if active_channels == 0:
+            # Nessun canale ha contribuito: il mix è già silenzio (limiter e volume inutili)
+            bus.skipped_blocks += 1
+            bus.peak_level = -np.inf
+            bus.rms_level = -np.inf
+            self._publish_bus(bus, mix)
+            return mix
+        
+        # Applica master volume del bus
+        if not bus.mute:
+            mix *= bus.master_volume
+        else:
+            mix *= 0.0
+        
+        # Soft limiter per evitare distorsioni (tanh invece di hard clip)
+        # tanh comprime dolcemente i picchi invece di tagliarli
+        peak = np.abs(mix).max()
+        if peak > 0.9:
+            # Soft clipping con tanh
+            mix = np.tanh(mix * 0.9) / np.tanh(0.9)
+        
+        # Hard limiter di sicurezza
+        mix = np.clip(mix, -1.0, 1.0)
+        
+        # Metering
+        bus.update_metering(mix)
+        
+        # Tap: registrazione, uscite nel processo e canali di ritorno (prima di inviare al device)
+        self._publish_bus(bus, mix)
+        return mix
+    
+    def _pull_bus_audio(self, bus_name: str, frames: int) -> np.ndarray:
+        """Estrae `frames` frame dalla FIFO del bus, eseguendo cicli dell'engine se servono
+        
+        Va chiamato con self.lock acquisito. Un ciclo riempie le FIFO di tutti i bus
+        attivi: gli altri bus troveranno già pronta parte del loro audio.
+        """
+        bus = self.buses[bus_name]
+        fifo = bus.output_fifo
+        while fifo.available < frames:
+            bus_names = self.active_bus_names()
+            if bus_name not in bus_names:
+                bus_names.append(bus_name)
+            for name, mix in self.render_cycle(bus_names=bus_names).items():
+                other = self.buses[name]
+                # Bus solo virtuali (tap/ritorni): nessuna FIFO da riempire
+                if name == bus_name or other.stream is not None or other.pending_stream is not None:
+                    other.output_fifo.write(mix)
+        mix = fifo.read(frames)
+        # Bus serviti dai cicli di altri bus: non accumulare più di un margine di latenza
+        fifo.trim(frames + 2 * self.quantum)
+        return mix
+    
+    def _apply_engine_config(self, sample_rate: int, buffer_size: int):
+        """Applica sample rate / buffer size all'engine (con self.lock acquisito)"""
+        self.buffer_size = buffer_size
+        if sample_rate != self.sample_rate:
+            self.sample_rate = sample_rate
+            for ch in self.channels.values():
+                ch.sample_rate = sample_rate
+                ch.processor.set_sample_rate(sample_rate)
+                # Campioni in coda al vecchio sample rate: ricomincia ad accumulare
+                ch.jitter_buffer.set_sample_rate(sample_rate)
+            for b in self.buses.values():
+                b.output_fifo.clear()
+                b.resample_phase = 0.0
+            for b in self.buses.values():
+                if b.stream is None:
+                    b.sample_rate = sample_rate
+            for replay in self.replay_buffers.values():
+                replay.reset(sample_rate)
+            # Le catture in corso ripartono al nuovo rate (una clip ha un solo sample rate)
+            for capture in self.clip_captures:
+                capture.reset(sample_rate)
+            for b in self.buses.values():
+                for tap in b.taps:
+                    if isinstance(tap, ClipCapture):
+                        tap.reset(sample_rate)
+            # Riapertura del brano in background: il media player tace finché non è pronto
+            self.media_player.request_sample_rate(sample_rate)
+    
+    def _promote_stream(self, bus: OutputBus):
+        """Il nuovo stream in attesa diventa lo stream attivo del bus (con self.lock acquisito)"""
+        if bus.stream is not None:
+            bus.retired_streams.append(bus.stream)
+        bus.stream = bus.pending_stream
+        bus.stream_generation = bus.pending_generation
+        bus.sample_rate = bus.pending_sample_rate
+        bus.pending_stream = None
+        bus.pending_generation = None
+        bus.pending_sample_rate = None
+        
+        # Il primo bus che cambia stream applica la nuova configurazione dell'engine
+        if self._pending_engine_config is not None:
+            self._apply_engine_config(*self._pending_engine_config)
+            self._pending_engine_config = None
+    
+    def _apply_fade(self, mix: np.ndarray, fade_in: bool) -> np.ndarray:
+        """Rampa lineare di cross-fade sull'inizio del blocco"""
+        n = len(mix)
+        fade_len = max(1, min(n, int(self.crossfade_ms / 1000.0 * self.sample_rate)))
+        ramp = np.ones(n, dtype=np.float32)
+        ramp[:fade_len] = np.linspace(0.0, 1.0, fade_len, dtype=np.float32)
+        if not fade_in:
+            ramp = 1.0 - ramp
+        return mix * ramp[:, None]
+    
+    def _retiring_block(self, bus: OutputBus, frames: int, rate: int) -> np.ndarray:
+        """Blocco del fade-out dello stream sostituito (con self.lock acquisito)
+        
+        È il blocco appena suonato dal nuovo stream, riportato al sample rate del
+        vecchio: le due dissolvenze incrociano lo stesso audio.
+        """
+        block = np.zeros((frames, 2), dtype=np.float32)
+        source, source_rate = bus.swap_block, bus.swap_block_rate
+        bus.swap_block = bus.swap_block_rate = None
+        if source is None or len(source) == 0:
+            return block
+        if source_rate == rate:
+            n = min(frames, len(source))
+            block[:n] = source[:n]
+        else:
+            # Interpolazione lineare: basta per le poche decine di ms del fade
+            t = np.arange(frames) * (source_rate / rate)
+            n = int(np.searchsorted(t, len(source) - 1, side='right'))
+            positions = np.arange(len(source))
+            for ch in range(2):
+                block[:n, ch] = np.interp(t[:n], positions, source[:, ch])
+        return block
+    
+    def audio_output_callback(self, bus_name: str, stream_rate: Optional[int] = None,
+                              generation: Optional[int] = None):
+        """Genera callback per output stream
+        
+        Args:
+            bus_name: Nome del bus
+            stream_rate: Sample rate dello stream (default: quello del bus)
+            generation: Generazione dello stream per l'hot-swap (None = sempre attivo)
+        """
         import time as time_module
         callback_count = [0]
         error_count = [0]
+        swap_state = {'faded_out': False}
         
         def callback(outdata, frames, time_info, status):
             callback_count[0] += 1
+            callback_start = time.perf_counter()
+            if self.realtime_priority:
+                self._prepare_rt_thread()
             
             # Log SOLO errori critici (max 5)
             if status:
+                if status.output_underflow:
+                    self.buses[bus_name].xrun_count += 1
                 if error_count[0] < 5:
                     error_count[0] += 1
                     print(f"🔴 [{bus_name}] Audio error #{error_count[0]}: {status}")
@@ -523,155 +1486,61 @@ class ProMixer:
             with self.lock:
                 bus = self.buses[bus_name]
                 
-                # ⚠️ RESAMPLING: Se il bus ha sample rate diverso dal ProMixer
-                # Calcola quanti frames servono al ProMixer per produrre la durata richiesta dal bus
-                if bus.sample_rate != self.sample_rate:
-                    # Durata richiesta dal bus (in secondi)
-                    duration = frames / bus.sample_rate
-                    # Frames necessari al sample rate del ProMixer
-                    promixer_frames = int(duration * self.sample_rate)
-                else:
-                    promixer_frames = frames
+                # Hot-swap al confine del blocco
+                fade = None
+                if generation is not None and generation != bus.stream_generation:
+                    if generation == bus.pending_generation:
+                        # Primo blocco del nuovo stream: prende il posto del vecchio con fade-in
+                        self._promote_stream(bus)
+                        fade = 'in'
+                    elif swap_state['faded_out']:
+                        # Stream sostituito: silenzio finché non viene chiuso
+                        outdata.fill(0)
+                        return
+                    else:
+                        # Ultimo blocco dello stream sostituito con fade-out
+                        swap_state['faded_out'] = True
+                        fade = 'out'
                 
-                # Mix di tutti i canali routati verso questo bus
-                mix = np.zeros((promixer_frames, 2), dtype=np.float32)
-                active_channels = 0
+                rate = stream_rate or bus.sample_rate
                 
-                for ch_id, channel in self.channels.items():
-                    # Verifica routing
-                    is_routed = channel.routing.get(bus_name, False)
-                    if not is_routed:
-                        continue
-                    
-                    # Ottieni audio dal canale
-                    audio = None
-                    
-                    if channel.channel_type == 'python':
-                        # Canale virtuale Python (es. soundboard, media player)
-                        
-                        # Priorità 1: Audio callback personalizzato (es: media player)
-                        if channel.audio_callback:
-                            try:
-                                # Passa il nome del bus per posizioni indipendenti
-                                audio = channel.audio_callback(frames, bus_name)
-                                if audio is not None and len(audio) > 0:
-                                    # Assicura formato stereo
-                                    if audio.ndim == 1:
-                                        audio = np.column_stack([audio, audio])
-                                    elif audio.shape[1] == 1:
-                                        audio = np.column_stack([audio, audio])
-                            except TypeError as te:
-                                # Fallback: callback non accetta bus_name
-                                try:
-                                    audio = channel.audio_callback(frames)
-                                    if audio is not None and len(audio) > 0:
-                                        if audio.ndim == 1:
-                                            audio = np.column_stack([audio, audio])
-                                        elif audio.shape[1] == 1:
-                                            audio = np.column_stack([audio, audio])
-                                except Exception as e2:
-                                    print(f"Errore callback audio {ch_id} (fallback): {e2}")
-                                    audio = None
-                            except Exception as e:
-                                print(f"Errore callback audio {ch_id}: {e}")
-                                audio = None
-                        
-                        # Priorità 2: Audio source (soundboard)
-                        if audio is None and channel.audio_source:
-                            # Passa il nome del bus come stream_id per posizioni indipendenti
-                            audio = channel.audio_source.get_audio(promixer_frames, stream_id=bus_name)
-                        
-                        # Priorità 3: Fallback queue (legacy)
-                        if audio is None:
-                            audio = channel.get_audio_from_queue(promixer_frames)
-                            
-                    elif channel.audio_buffer is not None or not channel.audio_queue.empty():
-                        # Canale hardware/virtual: usa buffer condiviso per multi-bus
-                        # Timestamp univoco per questo ciclo audio
-                        current_timestamp = time_info.currentTime if time_info else callback_count[0]
-                        
-                        # Se il timestamp è diverso, leggi nuovi dati dalla queue
-                        if channel.shared_buffer_timestamp != current_timestamp:
-                            audio_frames = []
-                            samples_needed = frames
-                            
-                            # Leggi dalla queue finché abbiamo abbastanza samples
-                            while samples_needed > 0 and not channel.audio_queue.empty():
-                                try:
-                                    chunk = channel.audio_queue.get_nowait()
-                                    audio_frames.append(chunk)
-                                    samples_needed -= len(chunk)
-                                except queue.Empty:
-                                    break
-                            
-                            if audio_frames:
-                                # Concatena tutti i chunk
-                                audio = np.vstack(audio_frames)
-                                
-                                # Taglia alla lunghezza esatta o pad se necessario
-                                if len(audio) >= promixer_frames:
-                                    audio = audio[:promixer_frames]
-                                else:
-                                    # Pad con silenzio se non abbastanza samples
-                                    padding = np.zeros((promixer_frames - len(audio), 2), dtype=np.float32)
-                                    audio = np.vstack([audio, padding])
-                                
-                                # Salva nel buffer condiviso
-                                channel.shared_audio_buffer = audio.copy()
-                                channel.shared_buffer_timestamp = current_timestamp
-                            else:
-                                # Nessun audio disponibile
-                                channel.shared_audio_buffer = None
-                                channel.shared_buffer_timestamp = current_timestamp
-                        
-                        # Usa il buffer condiviso (tutti i bus ottengono gli stessi samples)
-                        audio = channel.shared_audio_buffer.copy() if channel.shared_audio_buffer is not None else None
-                    
-                    if audio is not None and len(audio) > 0:
-                        # Processa canale (applica gain, effetti, pan)
-                        processed = channel.process(audio)
-                        
-                        # Aggiungi al mix
-                        mix += processed
-                        active_channels += 1
+                if fade == 'out':
+                    # Nessuna lettura dalla FIFO: quei frame appartengono al nuovo stream
+                    outdata[:] = self._apply_fade(self._retiring_block(bus, frames, rate), fade_in=False)
+                    return
                 
-                # Applica master volume del bus
-                if not bus.mute:
-                    mix *= bus.master_volume
+                # ⚠️ RESAMPLING: Se il bus ha sample rate diverso dal ProMixer
+                # Calcola quanti frames servono al ProMixer per produrre la durata richiesta dal bus
+                if rate != self.sample_rate:
+                    # Frazione di frame accumulata: nessuna deriva tra engine e dispositivo
+                    bus.resample_phase += frames * self.sample_rate / rate
+                    promixer_frames = int(bus.resample_phase)
+                    bus.resample_phase -= promixer_frames
                 else:
-                    mix *= 0.0
-                
-                # Soft limiter per evitare distorsioni (tanh invece di hard clip)
-                # tanh comprime dolcemente i picchi invece di tagliarli
-                peak = np.abs(mix).max()
-                if peak > 0.9:
-                    # Soft clipping con tanh
-                    mix = np.tanh(mix * 0.9) / np.tanh(0.9)
-                
-                # Hard limiter di sicurezza
-                mix = np.clip(mix, -1.0, 1.0)
-                
-                # Metering
-                bus.update_metering(mix)
+                    promixer_frames = frames
                 
-                # Registrazione (cattura da bus A1 prima di inviare al device)
-                if bus_name == self.recording_bus and self.is_recording:
-                    self.recorded_frames.append(mix.copy())
+                # Frame dell'engine dalla FIFO del bus (cicli a quanto fisso eseguiti se servono)
+                mix = self._pull_bus_audio(bus_name, promixer_frames)
                 
                 # ⚠️ RESAMPLING: Se il bus ha sample rate diverso, resample l'output
-                if bus.sample_rate != self.sample_rate:
+                if rate != self.sample_rate:
                     try:
                         # Usa resampy per resampling veloce e di qualità
                         import resampy
                         # Resample ogni canale
+                        resample_filter = self.resample_filter
                         resampled = np.zeros((frames, 2), dtype=np.float32)
                         for ch in range(2):
-                            resampled[:, ch] = resampy.resample(
+                            out = resampy.resample(
                                 mix[:, ch], 
                                 self.sample_rate, 
-                                bus.sample_rate,
-                                filter='kaiser_best'
+                                rate,
+                                filter=resample_filter
                             )[:frames]  # Taglia esattamente a frames richiesti
+                            resampled[:len(out), ch] = out
+                            if len(out) < frames and len(out) > 0:
+                                # Arrotondamento della lunghezza: ripeti l'ultimo campione
+                                resampled[len(out):, ch] = out[-1]
                         mix = resampled
                     except ImportError:
                         # Fallback a scipy se resampy non disponibile
@@ -691,20 +1560,38 @@ class ProMixer:
                     # Riempi con silenzio
                     outdata.fill(0)
                 else:
+                    if fade == 'in':
+                        bus.swap_block = mix.copy()
+                        bus.swap_block_rate = rate
+                        mix = self._apply_fade(mix, fade_in=True)
                     # Output
                     outdata[:] = mix
                 
                 # Callback UI per metering
                 if self.metering_callback:
                     self.metering_callback()
+                
+                # Durata della callback rispetto alla deadline del blocco
+                callback_end = time.perf_counter()
+                duration = callback_end - callback_start
+                bus.callback_stats.append((duration, frames / rate))
+                self.governor.report(duration, frames / rate, callback_end)
+                self.last_callback_end = callback_end
+                self.last_callback_deadline = frames / rate
         
         return callback
     
-    def start_input(self, channel_id: str, device_id: int):
-        """Avvia input stream per un canale"""
+    def start_input(self, channel_id: str, device_id: int, first_channel: Optional[int] = None):
+        """Avvia input per un canale sullo stream condiviso del dispositivo
+        
+        Args:
+            channel_id: Canale del mixer
+            device_id: Dispositivo di input
+            first_channel: Primo canale (0-based) della coppia sul dispositivo
+                (None = quello configurato, default 1-2)
+        """
         try:
-            device_info = sd.query_devices(device_id)
-            channels = min(device_info['max_input_channels'], 2)
+            device_info = self.backend.device_info(device_id)
             
             # Rinomina il canale con il nome del device
             if channel_id in self.channels:
@@ -714,23 +1601,28 @@ class ProMixer:
                     device_name = device_name[:17] + "..."
                 self.channels[channel_id].name = device_name
             
-            # IMPORTANTE: Usa STESSO buffer e sample rate di output per evitare scricchiolii
-            # Forza 48kHz (standard Windows) su tutti i dispositivi
+            if first_channel is None:
+                first_channel = self.input_channel_offsets.get(channel_id, 0)
+            if first_channel >= device_info['max_input_channels']:
+                first_channel = 0
             
-            stream = sd.InputStream(
-                samplerate=self.sample_rate,  # Forza 48kHz come output
-                blocksize=self.buffer_size,  # Stesso buffer dell'output (1024)
-                device=device_id,
-                channels=channels,
-                dtype='float32',
-                callback=self.audio_input_callback(channel_id),
-                dither_off=True  # Disabilita dithering per ridurre rumore
-            )
+            # Canale già su un dispositivo (anche lo stesso): toglilo dal vecchio stream
+            self._detach_input(channel_id)
             
-            print(f"   → Input buffer: {self.buffer_size} samples @ {self.sample_rate}Hz")
-            stream.start()
-            self.input_streams[channel_id] = stream
+            group = self._device_group(device_id)
+            group.inputs[channel_id] = first_channel
             self.input_device_map[channel_id] = device_id  # Salva per config
+            self.input_channel_offsets[channel_id] = first_channel
+            try:
+                self._restart_device_group(group)
+            except Exception:
+                group.inputs.pop(channel_id, None)
+                self.input_device_map.pop(channel_id, None)
+                self._restart_device_group(group)
+                raise
+            
+            print(f"   → Input buffer: {self.device_blocksize or 'driver'} samples @ {self.sample_rate}Hz "
+                  f"(quanto engine {self.quantum})")
             
             # Attiva routing automatico SOLO verso A1 (Discord/streaming)
             # A2 (cuffie) rimane disattivato per evitare feedback del microfono
@@ -743,14 +1635,193 @@ class ProMixer:
                 self.channels[channel_id].set_fader_db(12.0)
                 print(f"   ✓ Fader impostato a +12 dB")
             
-            print(f"✓ Input avviato: {channel_id} -> Device {device_id} ({device_info['name']})")
+            print(f"✓ Input avviato: {channel_id} -> Device {device_id} ({device_info['name']}) "
+                  f"canali {group.describe()['inputs'][channel_id]}")
             return True
         except Exception as e:
             print(f"✗ Errore avvio input {channel_id}: {e}")
             return False
     
+    def stop_input(self, channel_id: str):
+        """Stacca un canale dal suo dispositivo (lo stream resta per gli altri canali/bus)"""
+        self._detach_input(channel_id)
+        self.input_device_map.pop(channel_id, None)
+        self.input_channel_offsets.pop(channel_id, None)
+    
+    def _device_group(self, device_id: int) -> DeviceStreamGroup:
+        """Gruppo di stream del dispositivo (creato al primo uso)"""
+        group = self.device_groups.get(device_id)
+        if group is None:
+            info = self.backend.device_info(device_id)
+            group = DeviceStreamGroup(device_id, info['name'], info['max_input_channels'],
+                                      info['max_output_channels'])
+            self.device_groups[device_id] = group
+        return group
+    
+    def _detach_input(self, channel_id: str):
+        """Toglie un canale dal gruppo del suo dispositivo e riapre lo stream per gli altri"""
+        self.input_streams.pop(channel_id, None)
+        for group in list(self.device_groups.values()):
+            if channel_id in group.inputs:
+                del group.inputs[channel_id]
+                self._restart_device_group(group)
+    
+    def _detach_output(self, bus_name: str):
+        """Toglie un bus dal gruppo del suo dispositivo e riapre lo stream per gli altri"""
+        for group in list(self.device_groups.values()):
+            if bus_name in group.outputs:
+                del group.outputs[bus_name]
+                self.buses[bus_name].stream = None
+                self._restart_device_group(group)
+    
+    def _open_device_group(self, group: DeviceStreamGroup, samplerate: int, blocksize: int,
+                           dtype: str, generation: int, engine_rate: Optional[int] = None):
+        """Crea (senza avviarli) gli stream di un dispositivo per i canali e i bus mappati
+        
+        Con input e output in uso apre un unico stream duplex, purché l'output giri
+        al sample rate dell'engine (il jitter buffer non ricampiona); altrimenti uno
+        stream di input e uno di output. Se il sample rate richiesto per l'output non
+        è supportato riprova con quello nativo del device.
+        
+        Args:
+            engine_rate: Sample rate dell'engine con cui gireranno gli stream (default: attuale)
+        
+        Returns:
+            (input_stream, output_stream, sample_rate_output)
+        """
+        engine_rate = engine_rate or self.sample_rate
+        device_id = group.device_id
+        
+        if group.inputs and group.outputs and self.duplex_enabled and samplerate == engine_rate:
+            try:
+                stream = self.backend.open_duplex_stream(
+                    device=device_id,
+                    samplerate=samplerate,
+                    blocksize=blocksize,
+                    channels=(group.input_width, group.output_width),
+                    callback=self.device_stream_callback(group, 'duplex', samplerate, generation),
+                    dtype=dtype
+                )
+                return stream, stream, samplerate
+            except Exception as e:
+                print(f"⚠️ Device {device_id}: duplex non disponibile ({e}), stream separati")
+        
+        input_stream = None
+        if group.inputs:
+            # IMPORTANTE: Usa STESSO buffer e sample rate dell'engine per evitare scricchiolii
+            input_stream = self.backend.open_input_stream(
+                device=device_id,
+                samplerate=engine_rate,
+                blocksize=blocksize,
+                channels=group.input_width,
+                callback=self.device_stream_callback(group, 'input', None, generation),
+                dtype='float32'
+            )
+        
+        output_stream = None
+        if group.outputs:
+            def open_output(rate):
+                return self.backend.open_output_stream(
+                    device=device_id,
+                    samplerate=rate,
+                    blocksize=blocksize,
+                    channels=group.output_width,
+                    callback=self.device_stream_callback(group, 'output', rate, generation),
+                    dtype=dtype
+                )
+            try:
+                output_stream = open_output(samplerate)
+            except Exception as e_rate:
+                # Se il sample rate richiesto non è supportato, usa quello nativo del device
+                if "Invalid sample rate" in str(e_rate) or "PaErrorCode -9997" in str(e_rate):
+                    device_samplerate = int(self.backend.device_info(device_id).get('default_samplerate', 48000))
+                    print(f"⚠️ Device {device_id}: {samplerate}Hz non supportato, uso {device_samplerate}Hz")
+                    samplerate = device_samplerate
+                    output_stream = open_output(samplerate)
+                else:
+                    if input_stream is not None:
+                        input_stream.close()
+                    raise
+        
+        return input_stream, output_stream, samplerate
+    
+    def _restart_device_group(self, group: DeviceStreamGroup, samplerate: Optional[int] = None,
+                              dtype: Optional[str] = None) -> Optional[int]:
+        """Riapre gli stream di un dispositivo dopo un cambio dei canali/bus mappati
+        
+        Args:
+            samplerate: Sample rate dell'output (default: quello attuale del gruppo)
+            dtype: Tipo dati dell'output (default: quello attuale del gruppo)
+        
+        Returns:
+            Sample rate effettivo dell'output (None se il dispositivo non ha bus)
+        """
+        group.close()
+        if group.is_empty:
+            self.device_groups.pop(group.device_id, None)
+            return None
+        
+        samplerate = samplerate or group.sample_rate or self.sample_rate
+        dtype = dtype or group.dtype
+        generation = self._next_generation()
+        input_stream, output_stream, actual_rate = self._open_device_group(
+            group, samplerate, self.device_blocksize, dtype, generation
+        )
+        
+        with self.lock:
+            for ch_id in group.inputs:
+                self.input_generations[ch_id] = generation
+                self.pending_input_generations.pop(ch_id, None)
+                self.input_streams[ch_id] = input_stream
+            for bus_name in group.outputs:
+                bus = self.buses[bus_name]
+                bus.stream = output_stream
+                bus.stream_generation = generation
+                bus.sample_rate = actual_rate
+                bus.dtype = dtype
+            group.input_stream = input_stream
+            group.output_stream = output_stream
+            group.sample_rate = actual_rate if output_stream is not None else None
+            group.dtype = dtype
+            self._sync_jitter_buffers()
+            if group.is_duplex:
+                # Via l'arretrato dello stream precedente: il duplex riparte dal margine minimo
+                for ch_id in group.inputs:
+                    self.channels[ch_id].jitter_buffer.clear()
+        
+        for stream in group.streams():
+            stream.start()
+        
+        info = group.describe()
+        mapping = [f"{ch}:{pair}" for ch, pair in info['inputs'].items()]
+        mapping += [f"{bus}:{pair}" for bus, pair in info['outputs'].items()]
+        print(f"🔌 Device {group.device_id} ({group.name}): stream {info['kind']} [{', '.join(mapping)}]")
+        return actual_rate if output_stream is not None else None
+    
+    def get_device_streams(self) -> List[dict]:
+        """Stream aperti per dispositivo e coppie di canali assegnate"""
+        return [group.describe() for group in self.device_groups.values()]
+    
+    @property
+    def stream_count(self) -> int:
+        """Numero di stream audio aperti (uno per dispositivo, non per canale/bus)"""
+        return sum(len(group.streams()) for group in self.device_groups.values())
+    
+    def stop_output(self, bus_name: str):
+        """Ferma l'output di un bus (lo stream resta per gli altri canali/bus del dispositivo)"""
+        bus = self.buses[bus_name]
+        if any(bus_name in group.outputs for group in self.device_groups.values()):
+            self._detach_output(bus_name)
+        elif bus.stream is not None:
+            try:
+                bus.stream.stop()
+                bus.stream.close()
+            except Exception as e:
+                print(f"⚠️ Bus {bus_name}: errore chiusura stream ({e})")
+        bus.stream = None
+    
     def start_output(self, bus_name: str, custom_samplerate: int = None, custom_dtype: str = None):
-        """Avvia output stream per un bus
+        """Avvia l'output di un bus sullo stream condiviso del dispositivo
         
         Args:
             bus_name: Nome del bus (A1, A2, etc.)
@@ -773,8 +1844,7 @@ class ProMixer:
                 pass  # Stream non valido, continua ad avviarne uno nuovo
         
         try:
-            device_info = sd.query_devices(bus.device_id)
-            channels = min(device_info['max_output_channels'], 2)
+            device_info = self.backend.device_info(bus.device_id)
             
             # Sample rate: usa sempre quello del ProMixer per evitare resampling
             target_samplerate = custom_samplerate if custom_samplerate else self.sample_rate
@@ -783,59 +1853,45 @@ class ProMixer:
             # Dtype: usa custom se specificato, altrimenti float32
             target_dtype = custom_dtype if custom_dtype else 'float32'
             
-            # Prova ad aprire lo stream con il sample rate richiesto
+            # Bus spostato da un altro dispositivo: liberalo dal vecchio stream
+            self._detach_output(bus_name)
+            
+            group = self._device_group(bus.device_id)
+            if group.output_stream is not None and group.outputs:
+                # Dispositivo già aperto da altri bus: stesso stream, stesso formato
+                if (target_samplerate, target_dtype) != (group.sample_rate, group.dtype):
+                    print(f"ℹ️ Bus {bus_name}: dispositivo condiviso, uso {group.sample_rate}Hz [{group.dtype}]")
+                target_samplerate, target_dtype = group.sample_rate, group.dtype
+            
+            first_channel = bus.channel_offset if bus.channel_offset < device_info['max_output_channels'] else 0
+            group.outputs[bus_name] = first_channel
+            
+            # Prova ad aprire lo stream con il sample rate richiesto (fallback: nativo del device)
             try:
-                stream = sd.OutputStream(
-                    samplerate=target_samplerate,
-                    blocksize=self.buffer_size,
-                    device=bus.device_id,
-                    channels=channels,
-                    dtype=target_dtype,
-                    callback=self.audio_output_callback(bus_name),
-                    dither_off=True
-                )
-                stream.start()
-                bus.stream = stream
-                bus.sample_rate = target_samplerate
-                
-                if target_samplerate != device_samplerate:
-                    print(f"ℹ️ Bus {bus_name}: {target_samplerate}Hz (nativo device: {device_samplerate}Hz)")
-                
-                print(f"✓ Output avviato: {bus_name} -> Device {bus.device_id} ({device_info['name']}) @ {target_samplerate}Hz [{target_dtype}]")
-                return True
-                
-            except Exception as e_rate:
-                # Se il sample rate richiesto non è supportato, usa quello nativo del device
-                if "Invalid sample rate" in str(e_rate) or "PaErrorCode -9997" in str(e_rate):
-                    print(f"⚠️ Bus {bus_name}: {target_samplerate}Hz non supportato, uso {device_samplerate}Hz")
-                    
-                    # Se questo è il primo bus (A1), aggiorna il ProMixer
-                    if bus_name == 'A1':
-                        print(f"   📻 Aggiornamento ProMixer: {self.sample_rate}Hz → {device_samplerate}Hz")
-                        self.sample_rate = device_samplerate
-                        for ch in self.channels.values():
-                            ch.sample_rate = device_samplerate
-                        for b in self.buses.values():
-                            b.sample_rate = device_samplerate
-                    
-                    # Riprova con sample rate nativo
-                    stream = sd.OutputStream(
-                        samplerate=device_samplerate,
-                        blocksize=self.buffer_size,
-                        device=bus.device_id,
-                        channels=channels,
-                        dtype=target_dtype,
-                        callback=self.audio_output_callback(bus_name),
-                        dither_off=True
-                    )
-                    stream.start()
-                    bus.stream = stream
-                    bus.sample_rate = device_samplerate
-                    
-                    print(f"✓ Output avviato: {bus_name} -> Device {bus.device_id} ({device_info['name']}) @ {device_samplerate}Hz [{target_dtype}]")
-                    return True
-                else:
-                    raise e_rate
+                actual_samplerate = self._restart_device_group(group, target_samplerate, target_dtype)
+            except Exception:
+                group.outputs.pop(bus_name, None)
+                bus.stream = None
+                self._restart_device_group(group)
+                raise
+            
+            # Se il primo bus (A1) ha dovuto usare il sample rate nativo, aggiorna il ProMixer
+            if actual_samplerate != target_samplerate and bus_name == 'A1':
+                print(f"   📻 Aggiornamento ProMixer: {self.sample_rate}Hz → {actual_samplerate}Hz")
+                with self.lock:
+                    self._apply_engine_config(actual_samplerate, self.buffer_size)
+                    for b in self.buses.values():
+                        b.sample_rate = actual_samplerate
+                if group.inputs:
+                    # Input del dispositivo riaperti al nuovo sample rate (e in duplex)
+                    self._restart_device_group(group)
+            
+            if actual_samplerate == target_samplerate and target_samplerate != device_samplerate:
+                print(f"ℹ️ Bus {bus_name}: {target_samplerate}Hz (nativo device: {device_samplerate}Hz)")
+            
+            print(f"✓ Output avviato: {bus_name} -> Device {bus.device_id} ({device_info['name']}) "
+                  f"canali {group.describe()['outputs'][bus_name]} @ {actual_samplerate}Hz [{target_dtype}]")
+            return True
                     
         except Exception as e:
             print(f"✗ Errore avvio output {bus_name}: {e}")
@@ -843,6 +1899,302 @@ class ProMixer:
             traceback.print_exc()
             return False
     
+    def hot_swap(self, buffer_size: Optional[int] = None, sample_rate: Optional[int] = None,
+                 timeout: float = 2.0) -> List[str]:
+        """Cambia buffer size e/o sample rate senza fermare l'audio
+        
+        Per ogni bus attivo apre in background uno stream sostitutivo con la nuova
+        configurazione e lo avvia mentre il vecchio continua a suonare. Al primo blocco
+        del nuovo stream avviene lo scambio (fade-in sul nuovo, fade-out sull'ultimo
+        blocco del vecchio) e la nuova configurazione viene applicata all'engine.
+        Posizioni di clip/media e stato degli effetti restano sui canali, quindi
+        continuano senza interruzioni.
+        
+        Args:
+            buffer_size: Nuovo buffer size (None = invariato)
+            sample_rate: Nuovo sample rate di processing (None = invariato)
+            timeout: Attesa massima (secondi) per lo scambio degli stream
+        
+        Returns:
+            Lista dei bus che sono passati al nuovo stream
+        """
+        new_buffer = buffer_size or self.buffer_size
+        new_rate = sample_rate or self.sample_rate
+        
+        if new_buffer == self.buffer_size and new_rate == self.sample_rate:
+            return []
+        
+        active_groups = [group for group in self.device_groups.values() if group.streams()]
+        
+        if not active_groups:
+            # Nessuno stream aperto: applica subito. Anche i dispositivi con i soli input
+            # passano dagli stream sostitutivi, altrimenti resterebbero al vecchio rate
+            with self.lock:
+                self._check_rate_change(new_rate)
+                self._apply_engine_config(new_rate, new_buffer)
+            return []
+        
+        with self.lock:
+            self._check_rate_change(new_rate)
+            self._pending_engine_config = (new_rate, new_buffer)
+        
+        print(f"🔄 Hot-swap stream: {self.buffer_size}→{new_buffer} samples, {self.sample_rate}→{new_rate}Hz")
+        
+        # 1) Apri gli stream sostitutivi in background (in parallelo per tutti i dispositivi)
+        opened = {}
+        
+        def open_replacement(group):
+            # Se cambia solo il buffer mantieni il sample rate attuale del device
+            rate = new_rate if sample_rate else (group.sample_rate or new_rate)
+            generation = self._next_generation()
+            try:
+                blocksize = 0 if self.driver_blocksize else new_buffer
+                streams = self._open_device_group(group, rate, blocksize, group.dtype, generation,
+                                                  engine_rate=new_rate)
+                opened[group.device_id] = streams + (generation,)
+            except Exception as e:
+                print(f"   ✗ Device {group.device_id}: impossibile aprire lo stream sostitutivo ({e}), "
+                      f"resta quello attuale")
+        
+        workers = [threading.Thread(target=open_replacement, args=(group,), daemon=True)
+                   for group in active_groups]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout)
+        
+        # 2) Avvia i nuovi stream: lo scambio avviene nella loro prima callback
+        # (bus: fade al confine del blocco, input: il vecchio viene ignorato dal primo blocco del nuovo)
+        for device_id, (in_stream, out_stream, actual_rate, generation) in list(opened.items()):
+            group = self.device_groups[device_id]
+            with self.lock:
+                for bus_name in group.outputs:
+                    bus = self.buses[bus_name]
+                    bus.pending_stream = out_stream
+                    bus.pending_generation = generation
+                    bus.pending_sample_rate = actual_rate
+                for ch_id in group.inputs:
+                    self.pending_input_generations[ch_id] = generation
+            new_streams = [out_stream] if in_stream is out_stream else [in_stream, out_stream]
+            new_streams = [stream for stream in new_streams if stream is not None]
+            try:
+                for stream in new_streams:
+                    stream.start()
+            except Exception as e:
+                print(f"   ✗ Device {device_id}: avvio stream sostitutivo fallito ({e})")
+                with self.lock:
+                    for bus_name in group.outputs:
+                        bus = self.buses[bus_name]
+                        bus.pending_stream = None
+                        bus.pending_generation = None
+                        bus.pending_sample_rate = None
+                    for ch_id in group.inputs:
+                        self.pending_input_generations.pop(ch_id, None)
+                for stream in new_streams:
+                    stream.close()
+                del opened[device_id]
+        
+        def outputs_swapped(group):
+            return all(self.buses[bus_name].pending_generation is None for bus_name in group.outputs)
+        
+        def inputs_swapped(group, generation):
+            return all(self.input_generations.get(ch_id) == generation for ch_id in group.inputs)
+        
+        # 3) Attendi lo scambio
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            if all(outputs_swapped(self.device_groups[device_id]) and
+                   inputs_swapped(self.device_groups[device_id], streams[3])
+                   for device_id, streams in opened.items()):
+                break
+            time.sleep(0.005)
+        
+        # 4) Stream nuovi nei gruppi, oppure restano i vecchi
+        swapped = []
+        retired_inputs = []
+        with self.lock:
+            for device_id, (in_stream, out_stream, actual_rate, generation) in opened.items():
+                group = self.device_groups[device_id]
+                old_input, old_output = group.input_stream, group.output_stream
+                outputs_ok = outputs_swapped(group)
+                
+                if out_stream is not None:
+                    if outputs_ok:
+                        group.output_stream = out_stream
+                        group.sample_rate = actual_rate
+                        swapped.extend(group.outputs)
+                    else:
+                        # Il nuovo stream non ha mai chiamato la callback: resta il vecchio
+                        print(f"   ✗ Device {device_id}: stream sostitutivo non partito, resta quello attuale")
+                        for bus_name in group.outputs:
+                            bus = self.buses[bus_name]
+                            if bus.pending_generation is not None:
+                                bus.retired_streams.append(bus.pending_stream)
+                                bus.pending_stream = None
+                                bus.pending_generation = None
+                                bus.pending_sample_rate = None
+                
+                if in_stream is not None:
+                    if inputs_swapped(group, generation) and (in_stream is not out_stream or outputs_ok):
+                        group.input_stream = in_stream
+                        for ch_id in group.inputs:
+                            self.input_streams[ch_id] = in_stream
+                        # Il vecchio output (anche se duplex) è già tra gli stream ritirati dei bus
+                        if old_input is not None and old_input is not old_output:
+                            retired_inputs.append(old_input)
+                    else:
+                        for ch_id in group.inputs:
+                            self.pending_input_generations.pop(ch_id, None)
+                        if in_stream is not out_stream:
+                            retired_inputs.append(in_stream)
+            
+            self._sync_jitter_buffers()
+            # Se nessun bus ha fatto lo scambio applica comunque la configurazione
+            if self._pending_engine_config is not None:
+                self._apply_engine_config(*self._pending_engine_config)
+                self._pending_engine_config = None
+        
+        for stream in retired_inputs:
+            try:
+                stream.stop()
+                stream.close()
+            except Exception:
+                pass
+        
+        # Lascia suonare l'ultimo blocco (fade-out) degli stream sostituiti
+        time.sleep(max(0.05, 2 * max(self.buffer_size, new_buffer) / self.sample_rate))
+        self._close_retired_streams()
+        
+        print(f"✓ Hot-swap completato: {', '.join(swapped) if swapped else 'nessun bus'} "
+              f"@ {self.buffer_size} samples / {self.sample_rate}Hz "
+              f"({self.stream_count} stream su {len(self.device_groups)} dispositivi)")
+        return swapped
+    
+    def rate_change_blockers(self) -> List[str]:
+        """Registrazioni in corso che impediscono un cambio di sample rate
+        
+        I file aperti hanno il sample rate scritto nell'header: con un cambio a metà
+        il resto dell'audio verrebbe riprodotto alla velocità sbagliata.
+        """
+        blockers = []
+        if self.is_recording:
+            blockers.append(f"registrazione bus {', '.join(self.recording_buses)}")
+        if self.stem_session is not None:
+            blockers.append("registrazione multitraccia")
+        return blockers
+    
+    def _check_rate_change(self, new_rate: int):
+        """RuntimeError se il sample rate cambia mentre una registrazione è aperta"""
+        if new_rate == self.sample_rate:
+            return
+        blockers = self.rate_change_blockers()
+        if blockers:
+            raise RuntimeError(f"Sample rate non modificabile durante: {', '.join(blockers)} (fermala prima)")
+    
+    def _pending_rate(self) -> int:
+        """Sample rate che l'engine avrà dopo l'hot-swap in corso (lock acquisito)"""
+        if self._pending_engine_config is not None:
+            return self._pending_engine_config[0]
+        return self.sample_rate
+    
+    def _close_retired_streams(self):
+        """Ferma e chiude gli stream sostituiti da un hot-swap"""
+        closed = set()
+        for bus in self.buses.values():
+            with self.lock:
+                retired = bus.retired_streams
+                bus.retired_streams = []
+            for stream in retired:
+                # Stream condiviso da più bus dello stesso dispositivo: chiudi una volta sola
+                if id(stream) in closed:
+                    continue
+                closed.add(id(stream))
+                try:
+                    stream.stop()
+                    stream.close()
+                except Exception:
+                    pass
+    
+    # Moduli usati (anche con import lazy) dalle callback e dai salvataggi
+    PREWARM_MODULES = ('resampy', 'scipy.signal', 'scipy.io.wavfile', 'soundfile')
+    
+    def prewarm(self, cycles: int = 4) -> float:
+        """Scalda l'engine prima che gli stream partano
+        
+        Importa i moduli usati dalle callback, progetta i filtri EQ, compila/carica
+        il resampler per i sample rate dei dispositivi e fa girare alcuni cicli
+        silenziosi su canali e bus attivi, senza alterarne lo stato.
+        
+        Returns:
+            Durata del pre-warm in millisecondi
+        """
+        import importlib
+        t0 = time.perf_counter()
+        frames = self.quantum
+        silence = np.zeros((frames, 2), dtype=np.float32)
+        
+        for module_name in self.PREWARM_MODULES:
+            try:
+                importlib.import_module(module_name)
+            except ImportError:
+                pass
+        
+        # Filtri EQ di tutti i canali (anche se l'EQ viene attivato solo più tardi)
+        for channel in self.channels.values():
+            for band in AudioProcessor.EQ_BANDS:
+                channel.processor._get_sos(band)
+        
+        # Resampler: il primo resampy.resample carica il filtro e compila il kernel
+        rates = set()
+        for bus in self.buses.values():
+            if bus.device_id is None:
+                continue
+            try:
+                rate = int(self.backend.device_info(bus.device_id)['default_samplerate'])
+            except Exception:
+                continue
+            if rate != self.sample_rate:
+                rates.add(rate)
+        for rate in rates:
+            try:
+                import resampy
+                for resample_filter in ('kaiser_best', 'kaiser_fast'):
+                    resampy.resample(silence[:, 0], self.sample_rate, rate, filter=resample_filter)
+            except ImportError:
+                from scipy.signal import resample
+                resample(silence, int(frames * rate / self.sample_rate), axis=0)
+        
+        # Cicli silenziosi sui percorsi attivi (stato di gate e metering ripristinato)
+        with self.lock:
+            routed = [ch for ch in self.channels.values() if any(ch.routing.values())]
+            active_buses = [name for name in self.buses
+                            if any(ch.routing.get(name, False) for ch in routed)]
+            # Anche i contatori dei blocchi: le statistiche di skip partono da zero
+            saved = [(ch, ch.processor.get_state(), ch.peak_level, ch.rms_level,
+                      ch.processed_blocks, ch.skipped_blocks) for ch in routed]
+            saved_buses = [(self.buses[name], self.buses[name].peak_level, self.buses[name].rms_level,
+                            self.buses[name].skipped_blocks) for name in active_buses]
+            for _ in range(cycles):
+                for channel in routed:
+                    channel.process(silence)
+                for bus_name in active_buses:
+                    bus = self.buses[bus_name]
+                    mix = silence * bus.master_volume
+                    mix = np.clip(np.tanh(mix * 0.9) / np.tanh(0.9), -1.0, 1.0)
+                    bus.update_metering(mix)
+            for channel, state, peak, rms, processed, skipped in saved:
+                channel.processor.set_state(state)
+                channel.peak_level, channel.rms_level = peak, rms
+                channel.processed_blocks, channel.skipped_blocks = processed, skipped
+            for bus, peak, rms, skipped in saved_buses:
+                bus.peak_level, bus.rms_level = peak, rms
+                bus.skipped_blocks = skipped
+        
+        elapsed_ms = (time.perf_counter() - t0) * 1000.0
+        print(f"🔥 Pre-warm engine: {elapsed_ms:.0f}ms ({len(routed)} canali, {len(active_buses)} bus, "
+              f"resampler {sorted(rates) or '-'})")
+        return elapsed_ms
+    
     def start_all(self):
         """Avvia tutti gli stream configurati"""
         # Se già running, ferma tutto prima di riavviare
@@ -850,6 +2202,9 @@ class ProMixer:
             print("⚠ Mixer già avviato, fermo e riavvio...")
             self.stop_all()
         
+        # Import, filtri e resampler pronti prima del primo blocco (niente pop all'avvio)
+        self.prewarm()
+        
         self.is_running = True
         
         # Avvia output buses
@@ -857,24 +2212,45 @@ class ProMixer:
             if self.buses[bus_name].device_id is not None:
                 self.start_output(bus_name)
         
-        print(f"\n✓ Mixer avviato ({self.sample_rate}Hz, {self.buffer_size} samples)")
+        # Input rimasti mappati dopo uno stop_all su dispositivi senza bus
+        for group in list(self.device_groups.values()):
+            if group.inputs and not group.streams():
+                try:
+                    self._restart_device_group(group)
+                except Exception as e:
+                    print(f"✗ Device {group.device_id}: impossibile riaprire gli input ({e})")
+        
+        # Bus virtuali con tap/ritorni/registrazione anche senza dispositivi di output
+        self.virtual_clock.start()
+        
+        print(f"\n✓ Mixer avviato ({self.sample_rate}Hz, {self.device_blocksize or 'driver'} samples, "
+              f"quanto {self.quantum}, {self.stream_count} stream su {len(self.device_groups)} dispositivi)")
     
     def stop_all(self):
         """Ferma tutti gli stream"""
         self.is_running = False
+        self.virtual_clock.stop()
         
-        # Stop inputs
-        for stream in self.input_streams.values():
-            stream.stop()
-            stream.close()
+        # Stream di tutti i dispositivi (input, output e duplex)
+        for group in self.device_groups.values():
+            group.close()
+            # I bus ripartono con start_output, gli input restano mappati per start_all
+            group.outputs.clear()
         self.input_streams.clear()
         
-        # Stop outputs
         for bus in self.buses.values():
-            if bus.stream:
-                bus.stream.stop()
-                bus.stream.close()
-                bus.stream = None
+            bus.stream = None
+            if bus.pending_stream:
+                try:
+                    bus.pending_stream.stop()
+                    bus.pending_stream.close()
+                except Exception:
+                    pass
+                bus.pending_stream = None
+                bus.pending_generation = None
+        self._close_retired_streams()
+        with self.lock:
+            self._sync_jitter_buffers()
         
         # Reset posizioni delle clip soundboard per evitare audio veloce al riavvio
         for channel in self.channels.values():
@@ -887,61 +2263,297 @@ class ProMixer:
         
         print("✓ Mixer fermato")
     
-    def start_recording(self, bus_name: str = 'A1'):
-        """Avvia la registrazione dall'output di un bus"""
-        self.recording_bus = bus_name
-        self.is_recording = True
-        self.recorded_frames = []
-        print(f"🔴 Registrazione avviata da bus {bus_name}")
+    def close(self):
+        """Chiusura definitiva (uscita dall'app, fine di un benchmark): stream e thread
+        del media player. Dopo close() il ProMixer non va più usato"""
+        if self.is_running:
+            self.stop_all()
+        self.media_player.close()
     
-    def stop_recording(self, output_path: str = "recording.wav"):
-        """Ferma la registrazione e salva il file"""
-        self.is_recording = False
+    def start_recording(self, bus_name='A1', output_path: Optional[str] = None,
+                        subtype: str = 'PCM_16') -> List[str]:
+        """Avvia la registrazione in streaming su disco di uno o più bus
         
-        if self.recorded_frames:
-            # Concatena tutti i frame
-            recording = np.vstack(self.recorded_frames)
-            
-            # Converti in int16
-            recording = (recording * 32767).astype(np.int16)
-            
-            # Salva usando scipy
-            from scipy.io import wavfile
-            wavfile.write(output_path, self.sample_rate, recording)
-            
-            print(f"✓ Registrazione salvata: {output_path}")
-            print(f"   Durata: {len(recording) / self.sample_rate:.1f}s @ {self.sample_rate}Hz")
-            
-            self.recorded_frames = []
-            return output_path
+        I blocchi arrivano al registratore tramite tap e vengono scritti da un thread
+        separato: memoria costante qualunque sia la durata.
+        
+        Args:
+            bus_name: Bus o lista di bus (un file per bus, allineati al campione)
+            output_path: File .wav/.flac (con più bus diventa "<nome>_<bus>.<ext>");
+                default recording_<timestamp>.wav
+            subtype: 'PCM_16', 'PCM_24' o 'FLOAT' (solo WAV)
         
-        return None
+        Returns:
+            Percorsi dei file in scrittura
+        """
+        if self.is_recording:
+            self.stop_recording()
+        bus_names = [bus_name] if isinstance(bus_name, str) else list(bus_name)
+        for name in bus_names:
+            if name not in self.buses:
+                raise KeyError(name)
+        output_path = output_path or f"recording_{int(time.time())}.wav"
+        
+        recorder = StreamingRecorder(self.sample_rate)
+        try:
+            for name in bus_names:
+                recorder.add_track(name, output_path if len(bus_names) == 1 else track_path(output_path, name),
+                                   subtype)
+        except Exception:
+            recorder.stop()  # Chiude i file già creati
+            raise
+        recorder.start()
+        
+        taps = {name: (lambda block, track=name: recorder.push(track, block)) for name in bus_names}
+        with self.lock:
+            if self._pending_rate() != recorder.sample_rate:
+                # Hot-swap del sample rate in corso: l'header dei file sarebbe sbagliato
+                recorder.stop()
+                raise RuntimeError("Cambio di sample rate in corso: riprova la registrazione tra poco")
+            # Tutti i tap nello stesso ciclo: le tracce partono dallo stesso campione
+            for name, tap in taps.items():
+                self.buses[name].taps = self.buses[name].taps + [tap]
+            self.recorder = recorder
+            self._recording_taps = taps
+            self.recording_buses = bus_names
+            self.recording_bus = bus_names[0]
+            self.is_recording = True
+        
+        paths = [track.path for track in recorder.tracks.values()]
+        print(f"🔴 Registrazione avviata da bus {', '.join(bus_names)} → {', '.join(paths)} [{subtype}]")
+        return paths
     
-    def get_available_devices(self) -> List[AudioDevice]:
-        """Ritorna lista dispositivi disponibili (solo WASAPI per evitare duplicati)"""
-        devices = []
-        default_in, default_out = sd.default.device
+    def stop_recording(self, output_path: Optional[str] = None) -> Optional[str]:
+        """Ferma subito la registrazione (il writer chiude i file in background)
         
-        all_devices = sd.query_devices()
-        host_apis = sd.query_hostapis()
+        Args:
+            output_path: Nuovo nome del file, applicato dopo la chiusura
+                (con più bus diventa "<nome>_<bus>.<ext>")
         
-        for i, dev in enumerate(all_devices):
-            # Ottieni host API
-            hostapi_idx = dev['hostapi']
-            hostapi_name = host_apis[hostapi_idx]['name'] if hostapi_idx < len(host_apis) else 'Unknown'
-            
-            # Filtra solo WASAPI (evita duplicati MME/DirectSound)
-            if 'WASAPI' in hostapi_name:
-                audio_dev = AudioDevice(
-                    id=i,
-                    name=dev['name'],
-                    input_channels=dev['max_input_channels'],
-                    output_channels=dev['max_output_channels'],
-                    sample_rate=dev['default_samplerate'],
-                    is_default_input=(i == default_in),
-                    is_default_output=(i == default_out)
-                )
-                devices.append(audio_dev)
+        Returns:
+            Percorso del file (del primo bus se se ne registrano più di uno)
+        """
+        recorder = self.recorder
+        if not self.is_recording or recorder is None:
+            return None
+        
+        with self.lock:
+            for name, tap in self._recording_taps.items():
+                bus = self.buses.get(name)
+                if bus is not None:
+                    bus.taps = [t for t in bus.taps if t is not tap]
+            self._recording_taps = {}
+            self.is_recording = False
+        
+        rename = None
+        if output_path:
+            names = list(recorder.tracks)
+            rename = ({names[0]: output_path} if len(names) == 1
+                      else {name: track_path(output_path, name) for name in names})
+        paths = recorder.stop(rename)
+        
+        dropped = sum(t['dropped_frames'] for t in recorder.get_stats().values())
+        print(f"✓ Registrazione fermata: {', '.join(paths)}")
+        print(f"   Durata: {time.time() - recorder.started_at:.1f}s @ {self.sample_rate}Hz"
+              + (f" (⚠️ {dropped} frame persi: disco troppo lento)" if dropped else ""))
+        return paths[0]
+    
+    def start_multitrack(self, output_dir: str = "recordings", channels: Optional[List[str]] = None,
+                         buses: Optional[List[str]] = None, tap: str = 'post',
+                         subtype: str = 'PCM_24', file_format: str = 'wav') -> str:
+        """Avvia la registrazione multitraccia: un file per canale e per bus
+        
+        Args:
+            output_dir: Cartella in cui creare la sessione (stems_<data_ora>)
+            channels: Canali da registrare (default: tutti quelli routati su almeno un bus)
+            buses: Bus da registrare (default: nessuno)
+            tap: 'pre' (dopo gli effetti, prima di fader/pan) o 'post' fader
+            subtype: 'PCM_16', 'PCM_24' o 'FLOAT' (solo WAV)
+            file_format: 'wav' o 'flac'
+        
+        Returns:
+            Cartella della sessione
+        """
+        if self.stem_session is not None:
+            self.stop_multitrack()
+        if channels is None:
+            channels = [ch_id for ch_id, ch in self.channels.items() if any(ch.routing.values())]
+        buses = list(buses or [])
+        for name in channels:
+            if name not in self.channels:
+                raise KeyError(name)
+        for name in buses:
+            if name not in self.buses:
+                raise KeyError(name)
+        
+        session_dir = os.path.join(output_dir, time.strftime("stems_%Y%m%d_%H%M%S"))
+        os.makedirs(session_dir, exist_ok=True)
+        session = StemSession(session_dir, self.sample_rate,
+                              {ch_id: self.channels[ch_id].name for ch_id in channels},
+                              buses, tap=tap, subtype=subtype, file_format=file_format,
+                              quantum=self.quantum)
+        session.start()
+        with self.lock:
+            if self._pending_rate() != session.sample_rate:
+                # Hot-swap del sample rate in corso: stem e manifest avrebbero il rate sbagliato
+                session.stop()
+                raise RuntimeError("Cambio di sample rate in corso: riprova la multitraccia tra poco")
+            # Dal prossimo ciclo tutte le tracce ricevono lo stesso blocco di frame
+            for ch_id in channels:
+                self.channels[ch_id].stem_mode = tap
+                self.channels[ch_id].stem_block = None
+            self.stem_session = session
+        
+        print(f"🎙️ Multitraccia avviata: {len(channels)} canali ({tap}-fader) + {len(buses)} bus → {session_dir}")
+        return session_dir
+    
+    def stop_multitrack(self) -> Optional[str]:
+        """Ferma subito la multitraccia (file e manifest completati in background)
+        
+        Returns:
+            Percorso del manifest della sessione
+        """
+        session = self.stem_session
+        if session is None:
+            return None
+        with self.lock:
+            self.stem_session = None
+            for ch_id in session.channel_ids:
+                channel = self.channels.get(ch_id)
+                if channel is not None:
+                    channel.stem_mode = None
+                    channel.stem_block = None
+        manifest = session.stop()
+        print(f"✓ Multitraccia fermata: {len(session.tracks)} tracce, "
+              f"{session.cycles * self.quantum / self.sample_rate:.1f}s → {manifest}")
+        return manifest
+    
+    def start_replay(self, bus_name: str = 'A1', seconds: float = 120.0) -> ReplayBuffer:
+        """Avvia l'instant replay di un bus: conserva sempre gli ultimi `seconds` secondi
+        
+        Il buffer int16 è preallocato e riempito da un tap (il bus viene renderizzato
+        anche senza dispositivo). Se il replay del bus è già attivo con un'altra durata
+        viene ricreato.
+        """
+        if bus_name not in self.buses:
+            raise KeyError(bus_name)
+        replay = self.replay_buffers.get(bus_name)
+        if replay is not None:
+            if replay.seconds == seconds:
+                return replay
+            self.stop_replay(bus_name)
+        replay = ReplayBuffer(bus_name, self.sample_rate, seconds)
+        with self.lock:
+            self.buses[bus_name].taps = self.buses[bus_name].taps + [replay]
+            self.replay_buffers = {**self.replay_buffers, bus_name: replay}
+        print(f"⏪ Instant replay attivo su {bus_name}: ultimi {seconds:.0f}s "
+              f"({replay.ring.nbytes / 1024 / 1024:.1f} MB)")
+        return replay
+    
+    def stop_replay(self, bus_name: str):
+        """Ferma l'instant replay di un bus e libera il buffer"""
+        replay = self.replay_buffers.get(bus_name)
+        if replay is None:
+            return
+        with self.lock:
+            bus = self.buses.get(bus_name)
+            if bus is not None:
+                bus.taps = [tap for tap in bus.taps if tap is not replay]
+            self.replay_buffers = {k: v for k, v in self.replay_buffers.items() if k != bus_name}
+        print(f"⏹ Instant replay fermato su {bus_name}")
+    
+    def save_replay(self, bus_name: str = 'A1', output_path: Optional[str] = None,
+                    seconds: Optional[float] = None,
+                    on_done: Optional[Callable[[Optional[str]], None]] = None) -> str:
+        """Salva il contenuto dell'instant replay su file, in background
+        
+        Args:
+            output_path: File .wav/.flac (default replay_<bus>_<data_ora>.wav)
+            seconds: Solo gli ultimi `seconds` secondi (default: tutto il buffer)
+            on_done: Chiamata dal thread di salvataggio con il percorso (None se fallisce)
+        
+        Returns:
+            Percorso del file (completo quando on_done viene chiamata)
+        """
+        replay = self.replay_buffers.get(bus_name)
+        if replay is None:
+            raise ValueError(f"Instant replay non attivo sul bus {bus_name}")
+        output_path = output_path or replay.default_filename()
+        replay.save(output_path, seconds, on_done)
+        return output_path
+    
+    def start_clip_capture(self, source: str, max_seconds: float = 30.0) -> ClipCapture:
+        """Inizia a catturare un canale (pre-fader) o un bus in un buffer preallocato
+        
+        Un canale viene catturato quando alimenta almeno un bus attivo; un bus
+        viene renderizzato anche senza dispositivo (tap).
+        
+        Args:
+            source: ID del canale (es. "HW1", "HW3") o nome del bus
+            max_seconds: Durata massima della cattura
+        """
+        if source in self.channels:
+            capture = ClipCapture(source, 'channel', self.sample_rate, max_seconds)
+            with self.lock:
+                self.channels[source].capturing = True
+                self.clip_captures = self.clip_captures + [capture]
+        elif source in self.buses:
+            capture = ClipCapture(source, 'bus', self.sample_rate, max_seconds)
+            self.add_bus_tap(source, capture)
+        else:
+            raise KeyError(source)
+        print(f"✂️ Cattura clip da {source} (max {max_seconds:.0f}s)")
+        return capture
+    
+    def stop_clip_capture(self, capture: ClipCapture, name: Optional[str] = None,
+                          folder: Optional[str] = None, threshold_db: float = -50.0,
+                          on_saved: Optional[Callable[[Optional[str]], None]] = None):
+        """Ferma una cattura e la trasforma subito in una clip della soundboard
+        
+        Il silenzio iniziale e finale viene tagliato, la clip viene creata dai
+        campioni in memoria e registrata nell'AudioMixer della soundboard. Con
+        `folder` il file viene scritto in background (on_saved riceve il percorso).
+        
+        Returns:
+            AudioClip creata, oppure None se la cattura era solo silenzio
+        """
+        with self.lock:
+            if capture.kind == 'channel':
+                self.clip_captures = [c for c in self.clip_captures if c is not capture]
+                channel = self.channels.get(capture.source)
+                if channel is not None and not any(c.source == capture.source for c in self.clip_captures):
+                    channel.capturing = False
+                    channel.capture_block = None
+            else:
+                bus = self.buses.get(capture.source)
+                if bus is not None:
+                    bus.taps = [tap for tap in bus.taps if tap is not capture]
+        
+        samples = capture.finish(threshold_db)
+        if len(samples) == 0:
+            print(f"⚠️ Cattura da {capture.source}: solo silenzio, nessuna clip creata")
+            return None
+        
+        soundboard = self.channels.get('SOUNDBOARD')
+        target = soundboard.audio_source if soundboard is not None else None
+        sample_rate = target.sample_rate if target is not None else capture.sample_rate
+        if sample_rate != capture.sample_rate:
+            samples = signal.resample_poly(samples, sample_rate, capture.sample_rate, axis=0).astype(np.float32)
+        
+        name = name or time.strftime(f"capture_{capture.source}_%H%M%S.wav")
+        path = os.path.join(folder, name) if folder else None
+        clip = AudioClip.from_array(samples, name, sample_rate, file_path=path)
+        if target is not None:
+            target.add_clip(clip)
+        print(f"✂️ Clip '{name}' creata da {capture.source}: {len(samples) / sample_rate:.1f}s")
+        
+        if path:
+            persist_clip(clip, path, sample_rate, on_saved)
+        return clip
+    
+    def get_available_devices(self) -> List[AudioDevice]:
+        """Ritorna lista dispositivi disponibili dal backend (su Windows solo WASAPI per evitare duplicati)"""
+        devices = self.backend.query_devices()
         
         # Ordina alfabeticamente
         devices.sort(key=lambda d: d.name.lower())
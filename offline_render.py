@@ -0,0 +1,274 @@
+"""
+Offline Render - Esegue il ProMixer senza dispositivi audio
+Avanza il mixer blocco per blocco alla massima velocità della CPU usando
+lo stesso codice di canali/bus/clip e scrive ogni bus su file WAV.
+
+Utile per fare il bounce di una sessione, verificare la matematica del mix
+e profilare l'engine in modo deterministico.
+
+Uso da riga di comando:
+    python offline_render.py sessione.json -o render_output
+
+Formato dello script (JSON):
+    {
+        "sample_rate": 48000,
+        "block_size": 512,
+        "duration": 10.0,
+        "clips": {"airhorn": "clips/airhorn.wav"},
+        "inputs": {"HW1": "mic_take.wav"},
+        "routing": {"SOUNDBOARD": ["A1", "A2"], "HW1": ["A1"]},
+        "events": [
+            {"time": 0.5, "action": "play", "target": "airhorn"},
+            {"time": 2.0, "action": "fader", "target": "HW1", "value": -6.0},
+            {"time": 4.0, "action": "stop", "target": "airhorn"}
+        ]
+    }
+"""
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import soundfile as sf
+
+from audio_engine import AudioClip, AudioMixer
+from mixer_engine import ProMixer
+
+
+@dataclass
+class RenderEvent:
+    """Evento dello script applicato a un confine di blocco"""
+    time: float  # Secondi dall'inizio del render
+    action: str  # play, stop, loop, clip_volume, fader, bus_fader, mute, bus_mute, routing, pan
+    target: str  # Nome clip, id canale, nome bus o "CANALE>BUS" per il routing
+    value: Any = None
+
+
+class OfflineRenderer:
+    """Driver offline del ProMixer (nessun dispositivo, nessun thread audio)"""
+
+    def __init__(self, pro_mixer: ProMixer, soundboard: Optional[AudioMixer] = None,
+                 block_size: Optional[int] = None):
+        self.pro_mixer = pro_mixer
+        self.soundboard = soundboard
+        self.block_size = block_size or pro_mixer.quantum
+        self.events: List[RenderEvent] = []
+
+        # Audio pre-registrato da iniettare nei canali hardware {channel_id: np.ndarray}
+        self.inputs: Dict[str, np.ndarray] = {}
+
+        # Statistiche dell'ultimo render
+        self.stats = {}
+
+    def add_event(self, time_sec: float, action: str, target: str, value: Any = None):
+        """Aggiunge un evento allo script"""
+        self.events.append(RenderEvent(time_sec, action, target, value))
+
+    def load_events(self, events: List[dict]):
+        """Carica eventi da una lista di dizionari (formato JSON)"""
+        for ev in events:
+            self.add_event(float(ev['time']), ev['action'], ev['target'], ev.get('value'))
+
+    def add_input_file(self, channel_id: str, file_path: str):
+        """Collega un file audio a un canale hardware (sostituisce il dispositivo di input)"""
+        audio, sr = sf.read(file_path, dtype='float32', always_2d=True)
+
+        if audio.shape[1] == 1:
+            audio = np.column_stack([audio[:, 0], audio[:, 0]])
+        else:
+            audio = audio[:, :2]
+
+        target_sr = self.pro_mixer.sample_rate
+        if int(sr) != target_sr:
+            from scipy.signal import resample_poly
+            from math import gcd
+            g = gcd(target_sr, int(sr))
+            audio = resample_poly(audio, target_sr // g, int(sr) // g, axis=0).astype(np.float32)
+
+        self.inputs[channel_id] = np.ascontiguousarray(audio, dtype=np.float32)
+
+        # Input e render sullo stesso clock: lettura 1:1 con il margine minimo
+        jitter_buffer = self.pro_mixer.channels[channel_id].jitter_buffer
+        jitter_buffer.drift_compensation = False
+        jitter_buffer.base_target_ms = 0.0
+
+    def _apply_event(self, event: RenderEvent):
+        """Applica un evento dello script al mixer"""
+        mixer = self.pro_mixer
+        action = event.action
+
+        if action in ('play', 'stop', 'loop', 'clip_volume'):
+            if self.soundboard is None or event.target not in self.soundboard.clips:
+                print(f"⚠️ Render: clip '{event.target}' non trovata, evento ignorato")
+                return
+            clip = self.soundboard.clips[event.target]
+            if action == 'play':
+                clip.play()
+            elif action == 'stop':
+                clip.stop()
+            elif action == 'loop':
+                clip.is_looping = bool(event.value)
+            else:
+                clip.volume = float(event.value)
+        elif action == 'fader':
+            mixer.channels[event.target].set_fader_db(float(event.value))
+        elif action == 'pan':
+            mixer.channels[event.target].pan = float(event.value)
+        elif action == 'mute':
+            mixer.channels[event.target].mute = bool(event.value)
+        elif action == 'bus_fader':
+            mixer.buses[event.target].set_fader_db(float(event.value))
+        elif action == 'bus_mute':
+            mixer.buses[event.target].mute = bool(event.value)
+        elif action == 'routing':
+            channel_id, bus_name = event.target.split('>')
+            enabled = True if event.value is None else bool(event.value)
+            mixer.channels[channel_id.strip()].routing[bus_name.strip()] = enabled
+        else:
+            print(f"⚠️ Render: azione sconosciuta '{action}'")
+
+    def _feed_inputs(self, start: int, frames: int):
+        """Inietta il blocco corrente dei file di input nei jitter buffer dei canali"""
+        for channel_id, audio in self.inputs.items():
+            block = audio[start:start + frames]
+            if len(block) == 0:
+                continue
+            channel = self.pro_mixer.channels[channel_id]
+            channel.jitter_buffer.write(block)
+            channel.update_metering(block)
+
+    def render(self, duration: float, output_dir: Optional[str] = None,
+               buses: Optional[List[str]] = None, subtype: str = 'FLOAT') -> Dict[str, str]:
+        """Esegue il render e scrive un file WAV per ogni bus
+
+        Args:
+            duration: Durata del render in secondi
+            output_dir: Cartella dei file WAV (None = nessun file, solo profiling)
+            buses: Bus da renderizzare (default: tutti i bus con almeno un canale routato)
+            subtype: Formato soundfile dei WAV ('FLOAT', 'PCM_16', 'PCM_24')
+
+        Returns:
+            Dizionario {bus_name: percorso_file}
+        """
+        mixer = self.pro_mixer
+        sample_rate = mixer.sample_rate
+        block = self.block_size
+        total_frames = int(round(duration * sample_rate))
+
+        if buses is None:
+            buses = [name for name in mixer.buses
+                     if any(ch.routing.get(name, False) for ch in mixer.channels.values())]
+
+        writers = {}
+        paths = {}
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+            for bus_name in buses:
+                path = os.path.join(output_dir, f"{bus_name}.wav")
+                writers[bus_name] = sf.SoundFile(path, 'w', samplerate=sample_rate,
+                                                 channels=2, subtype=subtype)
+                paths[bus_name] = path
+
+        pending = sorted(self.events, key=lambda ev: ev.time)
+        next_event = 0
+        block_times = []
+        position = 0
+        cycle = 0
+
+        print(f"🎬 Render offline: {duration:.1f}s @ {sample_rate}Hz, blocco {block}, bus {', '.join(buses)}")
+        render_start = time.perf_counter()
+
+        # Input con un blocco di anticipo: il jitter buffer di input ha sempre il margine
+        # richiesto prima della lettura, come con un dispositivo reale
+        with mixer.lock:
+            self._feed_inputs(0, block)
+
+        try:
+            while position < total_frames:
+                frames = min(block, total_frames - position)
+
+                # Eventi quantizzati al confine del blocco
+                while next_event < len(pending) and pending[next_event].time * sample_rate <= position:
+                    self._apply_event(pending[next_event])
+                    next_event += 1
+
+                t0 = time.perf_counter()
+                with mixer.lock:
+                    self._feed_inputs(position + block, block)
+                    mixes = mixer.render_cycle(frames, buses)
+                for bus_name, mix in mixes.items():
+                    if bus_name in writers:
+                        writers[bus_name].write(mix)
+                block_times.append(time.perf_counter() - t0)
+
+                position += frames
+                cycle += 1
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+        elapsed = time.perf_counter() - render_start
+        block_times = np.array(block_times) if block_times else np.zeros(1)
+        self.stats = {
+            'blocks': cycle,
+            'frames': position,
+            'elapsed_sec': elapsed,
+            'realtime_factor': (position / sample_rate) / elapsed if elapsed > 0 else float('inf'),
+            'block_mean_ms': float(block_times.mean() * 1000),
+            'block_max_ms': float(block_times.max() * 1000),
+            'deadline_ms': block / sample_rate * 1000,
+        }
+
+        print(f"✓ Render completato: {cycle} blocchi in {elapsed:.2f}s "
+              f"({self.stats['realtime_factor']:.1f}x realtime, "
+              f"blocco medio {self.stats['block_mean_ms']:.3f}ms / max {self.stats['block_max_ms']:.3f}ms)")
+        for bus_name, path in paths.items():
+            print(f"   💾 {bus_name} → {path}")
+
+        return paths
+
+
+def build_session(script: dict, base_dir: str = ".") -> OfflineRenderer:
+    """Costruisce ProMixer + soundboard da uno script di sessione (come in main.py)"""
+    sample_rate = int(script.get('sample_rate', 48000))
+    block_size = int(script.get('block_size', 512))
+
+    pro_mixer = ProMixer(sample_rate=sample_rate, buffer_size=block_size)
+    soundboard = AudioMixer(sample_rate=sample_rate, buffer_size=block_size)
+    pro_mixer.channels['SOUNDBOARD'].audio_source = soundboard
+
+    for name, path in script.get('clips', {}).items():
+        clip = AudioClip(os.path.join(base_dir, path), name, target_sample_rate=sample_rate)
+        soundboard.add_clip(clip)
+
+    # Routing di default come l'app: soundboard su A1
+    routing = script.get('routing', {'SOUNDBOARD': ['A1']})
+    for channel_id, bus_names in routing.items():
+        for bus_name in bus_names:
+            pro_mixer.channels[channel_id].routing[bus_name] = True
+
+    renderer = OfflineRenderer(pro_mixer, soundboard, block_size)
+    for channel_id, path in script.get('inputs', {}).items():
+        renderer.add_input_file(channel_id, os.path.join(base_dir, path))
+    renderer.load_events(script.get('events', []))
+    return renderer
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render offline di una sessione ProMixer")
+    parser.add_argument("script", help="File JSON con clip, input ed eventi")
+    parser.add_argument("-o", "--output", default="render_output", help="Cartella di output")
+    parser.add_argument("--subtype", default="FLOAT", help="FLOAT, PCM_16 o PCM_24")
+    args = parser.parse_args()
+
+    with open(args.script, 'r', encoding='utf-8') as f:
+        session = json.load(f)
+
+    base = os.path.dirname(os.path.abspath(args.script))
+    renderer = build_session(session, base)
+    renderer.render(float(session.get('duration', 10.0)), args.output,
+                    buses=session.get('buses'), subtype=args.subtype)
@@ -0,0 +1,175 @@
+"""
+Realtime Audio - Priorità dei thread audio e controllo del garbage collector
+Le pause del GC di Python e la preemption dello scheduler (es. con un gioco
+aperto) si presentano come xrun casuali. Questo modulo:
+- alza la priorità del thread audio corrente (MMCSS "Pro Audio" su Windows,
+  SCHED_FIFO / nice su Linux) e opzionalmente ne fissa l'affinità CPU
+- congela gli oggetti creati all'avvio (gc.freeze) e sposta le collezioni
+  cicliche fuori dal percorso real-time: il GcScheduler le esegue dal thread
+  della UI subito dopo una callback, quando il margine fino alla prossima è massimo
+"""
+import gc
+import os
+import sys
+import threading
+import time
+from typing import Iterable, Optional
+
+
+def elevate_current_thread(cpus: Optional[Iterable[int]] = None) -> str:
+    """Alza la priorità del thread corrente (da chiamare DAL thread audio)
+
+    Args:
+        cpus: Core CPU a cui legare il thread (None = nessuna affinità)
+
+    Returns:
+        Descrizione di cosa è stato applicato ("" se nulla è stato possibile)
+    """
+    applied = []
+    cpus = sorted(set(cpus)) if cpus else None
+
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+        kernel32 = ctypes.windll.kernel32
+        kernel32.GetCurrentThread.restype = wintypes.HANDLE
+        handle = kernel32.GetCurrentThread()
+
+        # MMCSS: lo scheduler multimediale di Windows (come i driver audio pro)
+        try:
+            avrt = ctypes.windll.avrt
+            task_index = wintypes.DWORD(0)
+            if avrt.AvSetMmThreadCharacteristicsW("Pro Audio", ctypes.byref(task_index)):
+                applied.append("MMCSS Pro Audio")
+        except (OSError, AttributeError):
+            pass
+
+        THREAD_PRIORITY_TIME_CRITICAL = 15
+        if kernel32.SetThreadPriority(handle, THREAD_PRIORITY_TIME_CRITICAL):
+            applied.append("TIME_CRITICAL")
+
+        if cpus:
+            mask = 0
+            for cpu in cpus:
+                mask |= 1 << cpu
+            kernel32.SetThreadAffinityMask.argtypes = [wintypes.HANDLE, ctypes.c_size_t]
+            if kernel32.SetThreadAffinityMask(handle, mask):
+                applied.append(f"CPU {cpus}")
+
+    elif hasattr(os, 'sched_setscheduler'):
+        # Linux: su un thread, pid 0 indica il thread chiamante
+        try:
+            priority = min(70, os.sched_get_priority_max(os.SCHED_FIFO))
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+            applied.append(f"SCHED_FIFO {priority}")
+        except (PermissionError, OSError):
+            try:
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), -10)
+                applied.append("nice -10")
+            except (PermissionError, OSError):
+                pass
+
+        if cpus and hasattr(os, 'sched_setaffinity'):
+            try:
+                os.sched_setaffinity(0, cpus)
+                applied.append(f"CPU {cpus}")
+            except OSError:
+                pass
+
+    return ", ".join(applied)
+
+
+class GcScheduler:
+    """Tiene il garbage collector ciclico fuori dalle callback audio
+
+    Dopo freeze() la collezione automatica è disattivata: gli oggetti creati
+    all'avvio finiscono nella generazione permanente e le collezioni vengono
+    fatte da collect_if_idle(), chiamata periodicamente dal thread della UI.
+    """
+
+    def __init__(self, pro_mixer, idle_fraction: float = 0.25,
+                 gen0_threshold: int = 700, full_interval: float = 30.0):
+        """
+        Args:
+            pro_mixer: ProMixer di cui osservare le callback
+            idle_fraction: Finestra "idle" dopo una callback, in frazione della deadline
+            gen0_threshold: Allocazioni nette oltre cui serve una collezione giovane
+            full_interval: Secondi tra due collezioni complete
+        """
+        self.pro_mixer = pro_mixer
+        self.idle_fraction = idle_fraction
+        self.gen0_threshold = gen0_threshold
+        self.full_interval = full_interval
+
+        self.active = False
+        self._was_enabled = gc.isenabled()
+        self._last_full = time.perf_counter()
+
+        # Statistiche (ms) delle collezioni eseguite
+        self.collections = 0
+        self.skipped = 0
+        self.max_pause_ms = 0.0
+
+    def freeze(self):
+        """Da chiamare a fine avvio: congela gli oggetti esistenti e disattiva il GC automatico"""
+        if self.active:
+            return
+        self._was_enabled = gc.isenabled()
+        gc.collect()
+        if hasattr(gc, 'freeze'):
+            gc.freeze()
+        gc.disable()
+        self.active = True
+        self._last_full = time.perf_counter()
+        print("🧊 GC: oggetti di avvio congelati, collezioni solo nelle finestre idle")
+
+    def release(self):
+        """Torna al GC automatico di Python"""
+        if not self.active:
+            return
+        self.active = False
+        if hasattr(gc, 'unfreeze'):
+            gc.unfreeze()
+        if self._was_enabled:
+            gc.enable()
+
+    def _in_idle_window(self, now: float) -> bool:
+        """True subito dopo la fine di una callback (massimo margine alla prossima)"""
+        mixer = self.pro_mixer
+        since = now - mixer.last_callback_end
+        if not mixer.last_callback_deadline or since > 1.0:
+            # Nessuna callback recente: stream fermi, qualsiasi momento va bene
+            return True
+        return since < mixer.last_callback_deadline * self.idle_fraction
+
+    def collect_if_idle(self) -> bool:
+        """Esegue una collezione se serve ed è il momento giusto
+
+        Returns:
+            False se una collezione serve ma la finestra non è idle (riprovare a breve)
+        """
+        if not self.active:
+            return True
+
+        now = time.perf_counter()
+        if now - self._last_full >= self.full_interval:
+            generation = 2
+        elif gc.get_count()[0] >= self.gen0_threshold:
+            generation = 0
+        else:
+            return True
+
+        # Valvola di sicurezza: se le finestre idle non arrivano mai, colleziona comunque
+        overdue = gc.get_count()[0] >= self.gen0_threshold * 20
+        if not overdue and not self._in_idle_window(now):
+            self.skipped += 1
+            return False
+
+        t0 = time.perf_counter()
+        gc.collect(generation)
+        pause_ms = (time.perf_counter() - t0) * 1000.0
+        self.max_pause_ms = max(self.max_pause_ms, pause_ms)
+        self.collections += 1
+        if generation == 2:
+            self._last_full = now
+        return True
@@ -0,0 +1,135 @@
+"""
+Replay Buffer - Instant replay degli ultimi minuti di un bus
+Un ring buffer int16 preallocato (metà memoria del float32: 2 minuti stereo a
+48kHz ≈ 22 MB) riceve ogni blocco del bus tramite tap, senza allocazioni né
+lock nel thread audio. Il salvataggio (file o clip della soundboard) avviene su
+un thread separato: la copia del ring non blocca mai l'engine, i frame
+sovrascritti durante la copia vengono scartati (schema seqlock).
+"""
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+import numpy as np
+import soundfile as sf
+
+
+class ReplayBuffer:
+    """Ultimi N secondi di un bus in un ring int16 preallocato"""
+
+    def __init__(self, bus_name: str, sample_rate: int, seconds: float = 120.0):
+        """
+        Args:
+            bus_name: Bus catturato
+            sample_rate: Sample rate dell'engine
+            seconds: Durata massima conservata
+        """
+        self.bus_name = bus_name
+        self.sample_rate = sample_rate
+        self.seconds = seconds
+        self.capacity = max(1, int(seconds * sample_rate))
+        self.ring = np.zeros((self.capacity, 2), dtype=np.int16)
+        self._scratch = np.zeros((4096, 2), dtype=np.float32)
+        # Frame totali scritti (aggiornato dopo la copia nel ring) e blocco più grande visto
+        self._total = 0
+        self._max_block = 0
+        self.saves = 0
+
+    def __call__(self, block: np.ndarray):
+        """Tap del bus (thread audio): conversione in int16 nel ring, nessuna allocazione"""
+        frames = len(block)
+        if frames == 0:
+            return
+        if frames > len(self._scratch):
+            self._scratch = np.zeros((frames, 2), dtype=np.float32)
+        if frames > self._max_block:
+            self._max_block = frames
+        scratch = self._scratch[:frames]
+        np.multiply(block, 32767.0, out=scratch)
+        np.clip(scratch, -32768.0, 32767.0, out=scratch)
+
+        pos = self._total % self.capacity
+        first = min(frames, self.capacity - pos)
+        np.copyto(self.ring[pos:pos + first], scratch[:first], casting='unsafe')
+        if first < frames:
+            np.copyto(self.ring[:frames - first], scratch[first:], casting='unsafe')
+        self._total += frames
+
+    @property
+    def buffered_seconds(self) -> float:
+        return min(self._total, self.capacity) / self.sample_rate
+
+    def reset(self, sample_rate: Optional[int] = None):
+        """Svuota il buffer (es. dopo un cambio di sample rate)"""
+        if sample_rate and sample_rate != self.sample_rate:
+            self.sample_rate = sample_rate
+            self.capacity = max(1, int(self.seconds * sample_rate))
+            self.ring = np.zeros((self.capacity, 2), dtype=np.int16)
+        self._total = 0
+
+    def snapshot(self, seconds: Optional[float] = None) -> np.ndarray:
+        """Copia del contenuto, dal più vecchio al più recente (da un thread qualunque)
+
+        Il thread audio continua a scrivere durante la copia: i frame che potrebbe
+        aver sovrascritto nel frattempo (inclusi quelli di un blocco in corso)
+        vengono scartati dall'inizio della copia.
+
+        Args:
+            seconds: Solo gli ultimi `seconds` secondi (default: tutto il buffer)
+
+        Returns:
+            Array int16 (frames, 2)
+        """
+        ring = self.ring
+        capacity = len(ring)
+        total_before = self._total
+        pos = total_before % capacity
+        data = np.concatenate((ring[pos:], ring[:pos]))
+        total_after = self._total
+
+        # Indice assoluto del primo frame nella copia e del primo ancora valido
+        first = total_before - capacity
+        valid = max(0, first, total_after + self._max_block - capacity)
+        data = data[valid - first:]
+        if seconds is not None:
+            data = data[-int(seconds * self.sample_rate):] if seconds > 0 else data[:0]
+        return data
+
+    def save(self, path: str, seconds: Optional[float] = None,
+             on_done: Optional[Callable[[Optional[str]], None]] = None) -> threading.Thread:
+        """Salva il replay su file (WAV/FLAC PCM_16) su un thread separato
+
+        Args:
+            path: File di destinazione
+            seconds: Solo gli ultimi `seconds` secondi
+            on_done: Chiamata a file completo con il percorso (None in caso di errore),
+                dal thread di salvataggio
+
+        Returns:
+            Thread di salvataggio (già avviato)
+        """
+        def run():
+            saved = None
+            try:
+                data = self.snapshot(seconds)
+                if len(data) == 0:
+                    print(f"⚠️ Replay {self.bus_name}: buffer vuoto")
+                else:
+                    directory = os.path.dirname(os.path.abspath(path))
+                    os.makedirs(directory, exist_ok=True)
+                    sf.write(path, data, self.sample_rate, subtype='PCM_16')
+                    self.saves += 1
+                    saved = path
+                    print(f"💾 Replay {self.bus_name}: {len(data) / self.sample_rate:.1f}s → {path}")
+            except Exception as e:
+                print(f"✗ Replay {self.bus_name}: {e}")
+            if on_done is not None:
+                on_done(saved)
+
+        thread = threading.Thread(target=run, name=f"ReplaySave-{self.bus_name}", daemon=True)
+        thread.start()
+        return thread
+
+    def default_filename(self) -> str:
+        return time.strftime(f"replay_{self.bus_name}_%Y%m%d_%H%M%S.wav")
@@ -0,0 +1,311 @@
+"""
+Seek Index - Seek a tempo costante nei file compressi (MP3)
+Il decoder MP3 di libsndfile (mpg123) per un seek lontano deve scorrere tutti i
+frame dall'inizio, e l'indice che costruisce si perde a ogni apertura del file.
+Qui la tabella degli offset dei frame viene costruita una volta (scansione degli
+header, senza decodifica) e salvata accanto al file della libreria
+(`brano.mp3.seekidx`): il seek apre un decoder direttamente sul frame giusto,
+abbastanza frame prima da coprire il bit reservoir, e scarta i campioni in
+eccesso. Prima di essere salvato l'indice viene confrontato con la decodifica
+sequenziale in più punti: se non coincide non viene usato.
+"""
+import io
+import mmap
+import os
+import shutil
+import struct
+from typing import Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+
+
+INDEX_SUFFIX = ".seekidx"
+INDEX_VERSION = 2
+
+# Layer III: bitrate (kbps) per MPEG-1 e MPEG-2/2.5, sample rate per versione
+_BITRATES_V1 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0)
+_BITRATES_V2 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0)
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+_DECODER_DELAY = 529  # Ritardo del decoder mpg123, compensato insieme all'encoder delay
+
+
+def index_path(path: str) -> str:
+    return path + INDEX_SUFFIX
+
+
+def remove_index(path: str):
+    """Elimina l'indice di un file (file rimosso dalla libreria)"""
+    try:
+        os.remove(index_path(path))
+    except OSError:
+        pass
+
+
+def relocate_index(old_path: str, new_path: str):
+    """Sposta l'indice insieme al file (rinomina o spostamento nella libreria)"""
+    if os.path.exists(index_path(old_path)):
+        try:
+            shutil.move(index_path(old_path), index_path(new_path))
+        except OSError:
+            pass
+
+
+def _parse_header(data, pos: int) -> Optional[Tuple[int, int, int, bool]]:
+    """Header MPEG Layer III in `pos`: (lunghezza frame, campioni per frame, sample rate, mono)"""
+    if pos + 4 > len(data):
+        return None
+    header = struct.unpack_from('>I', data, pos)[0]
+    if (header >> 21) & 0x7FF != 0x7FF:
+        return None
+    version = (header >> 19) & 3
+    layer = (header >> 17) & 3
+    bitrate_index = (header >> 12) & 15
+    rate_index = (header >> 10) & 3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    padding = (header >> 9) & 1
+    mono = (header >> 6) & 3 == 3
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    if version == 3:
+        length = 144 * _BITRATES_V1[bitrate_index] * 1000 // sample_rate + padding
+        return length, 1152, sample_rate, mono
+    length = 72 * _BITRATES_V2[bitrate_index] * 1000 // sample_rate + padding
+    return length, 576, sample_rate, mono
+
+
+def _side_info_size(mpeg1: bool, mono: bool) -> int:
+    return (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+
+
+def _encoder_delay(data, pos: int, mpeg1: bool, mono: bool) -> Optional[int]:
+    """Frame Xing/Info in `pos`: encoder delay del tag LAME (None se non è un frame Xing)"""
+    tag = pos + 4 + _side_info_size(mpeg1, mono)
+    if bytes(data[tag:tag + 4]) not in (b'Xing', b'Info'):
+        return None
+    flags = struct.unpack_from('>I', data, tag + 4)[0]
+    lame = tag + 8 + 4 * bool(flags & 1) + 4 * bool(flags & 2) + 100 * bool(flags & 4) + 4 * bool(flags & 8)
+    if bytes(data[lame:lame + 4]) != b'LAME' or lame + 24 > len(data):
+        return 0  # Senza tag LAME il decoder non applica il gapless: nessun campione scartato
+    return (data[lame + 21] << 4) | (data[lame + 22] >> 4)
+
+
+class _FileWindow(io.RawIOBase):
+    """Il file visto a partire da un offset: il decoder lo apre come se iniziasse lì"""
+
+    def __init__(self, path: str, start: int):
+        self._file = open(path, 'rb')
+        self._start = start
+        self._size = os.path.getsize(path) - start
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        else:
+            self._pos = self._size + offset
+        return self._pos
+
+    def readinto(self, buffer):
+        self._file.seek(self._start + self._pos)
+        n = self._file.readinto(buffer)
+        self._pos += n
+        return n
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+class SeekIndex:
+    """Offset in byte dei frame audio di un MP3"""
+
+    RESERVOIR_BYTES = 511  # main_data_begin (9 bit): i dati di un frame iniziano fino a 511 byte prima
+    VERIFY_POINTS = 4  # Posizioni confrontate con la decodifica sequenziale
+    VERIFY_SECONDS = 60.0  # Tratto iniziale decodificato per la verifica
+
+    def __init__(self, offsets: np.ndarray, samples_per_frame: int, skip: int,
+                 overhead: int, file_size: int, mtime: float):
+        self.offsets = offsets
+        self.samples_per_frame = samples_per_frame
+        self.skip = skip  # Campioni iniziali scartati dalla decodifica sequenziale (gapless)
+        self.overhead = overhead  # Byte per frame che non sono dati audio (header, CRC, side info)
+        self.file_size = file_size
+        self.mtime = mtime
+
+    @classmethod
+    def build(cls, path: str) -> Optional['SeekIndex']:
+        """Scansione degli header dei frame (nessuna decodifica, ~0.1s per ora di audio)"""
+        stat = os.stat(path)
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            pos = 0
+            if bytes(data[:3]) == b'ID3':
+                pos = 10 + ((data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9])
+            # Primo frame: sincronizzazione confermata dal frame successivo
+            first = None
+            while pos + 4 <= len(data):
+                header = _parse_header(data, pos)
+                if header and _parse_header(data, pos + header[0]):
+                    first = header
+                    break
+                pos += 1
+            if first is None:
+                return None
+            samples_per_frame, sample_rate = first[1], first[2]
+            crc = 0 if data[pos + 1] & 1 else 2
+            overhead = 4 + crc + _side_info_size(samples_per_frame == 1152, first[3])
+            skip = 0
+            delay = _encoder_delay(data, pos, samples_per_frame == 1152, first[3])
+            if delay is not None:
+                skip = delay + _DECODER_DELAY if delay else 0
+                pos += first[0]  # Il frame Xing non contiene audio
+
+            offsets = []
+            end = len(data)
+            while pos + 4 <= end:
+                header = _parse_header(data, pos)
+                if header is None or header[2] != sample_rate:
+                    # Dati non audio (tag APE/ID3v1 in coda o byte corrotti): risincronizza
+                    pos += 1
+                    continue
+                offsets.append(pos)
+                pos += header[0]
+        return cls(np.array(offsets, dtype=np.int64), samples_per_frame, skip, overhead,
+                   stat.st_size, stat.st_mtime)
+
+    def matches(self, path: str) -> bool:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return stat.st_size == self.file_size and stat.st_mtime == self.mtime
+
+    def save(self, path: str):
+        with open(index_path(path), 'wb') as f:
+            np.savez_compressed(
+                f, offsets=self.offsets,
+                meta=np.array([INDEX_VERSION, self.samples_per_frame, self.skip, self.overhead,
+                               self.file_size], dtype=np.int64),
+                mtime=np.array([self.mtime], dtype=np.float64))
+
+    @classmethod
+    def load(cls, path: str) -> Optional['SeekIndex']:
+        """Indice salvato accanto al file (None se manca o se il file è cambiato)"""
+        try:
+            with np.load(index_path(path)) as data:
+                meta = [int(v) for v in data['meta']]
+                if meta[0] != INDEX_VERSION:
+                    return None
+                _, samples_per_frame, skip, overhead, file_size = meta
+                index = cls(data['offsets'], samples_per_frame, skip, overhead, file_size,
+                            float(data['mtime'][0]))
+        except (OSError, KeyError, ValueError):
+            return None
+        return index if index.matches(path) else None
+
+    @classmethod
+    def for_file(cls, path: str) -> Optional['SeekIndex']:
+        """Indice dalla cache, altrimenti costruito, verificato e salvato
+
+        Returns:
+            None se il file non è un MP3 valido o se l'indice non coincide con la
+            decodifica sequenziale (il seek resta quello del decoder)
+        """
+        index = cls.load(path)
+        if index is not None:
+            return index
+        index = cls.build(path)
+        if index is None or not index.verify(path):
+            return None
+        try:
+            index.save(path)
+        except OSError as e:
+            print(f"⚠️ Seek index non salvato ({os.path.basename(path)}): {e}")
+        return index
+
+    def locate(self, frame: int) -> Tuple[int, int]:
+        """(offset del frame da cui aprire il decoder, campioni da scartare) per il frame audio"""
+        raw = frame + self.skip
+        offsets = self.offsets
+        target = min(raw // self.samples_per_frame, len(offsets) - 1)
+        # Il frame prima del target serve per l'overlap dell'IMDCT e i suoi dati audio
+        # iniziano fino a 511 byte prima, contando solo i dati dei frame precedenti
+        # (bit reservoir): si torna indietro finché sono coperti, più un frame di margine
+        first = max(0, target - 1)
+        reservoir = 0
+        while first > 0 and reservoir < self.RESERVOIR_BYTES:
+            first -= 1
+            reservoir += int(offsets[first + 1] - offsets[first]) - self.overhead
+        first = max(0, first - 1)
+        return int(offsets[first]), raw - first * self.samples_per_frame
+
+    def open_at(self, path: str, frame: int) -> Tuple[sf.SoundFile, _FileWindow]:
+        """Decoder posizionato su `frame` (coordinate della decodifica sequenziale)
+
+        Returns:
+            (decoder, finestra sul file): chiudere entrambi dopo l'uso
+        """
+        offset, discard = self.locate(frame)
+        window = _FileWindow(path, offset)
+        decoder = sf.SoundFile(window)
+        while discard > 0:
+            n = len(decoder.read(min(discard, 65536), dtype='float32'))
+            if n == 0:
+                break
+            discard -= n
+        return decoder, window
+
+    def verify(self, path: str, chunk_frames: int = 4096, block: int = 2048) -> bool:
+        """Confronta con la decodifica sequenziale in più punti del tratto iniziale
+
+        Il riferimento è letto dall'inizio a chunk come fa MediaStream; i blocchi di
+        riferimento silenziosi non provano nulla e vengono saltati (almeno un
+        confronto su audio vero è necessario).
+        """
+        if len(self.offsets) < 4:
+            return False
+        try:
+            with sf.SoundFile(path) as reference:
+                limit = min(reference.frames, int(self.VERIFY_SECONDS * reference.samplerate))
+                chunks = []
+                total = 0
+                while total < limit:
+                    data = reference.read(chunk_frames, dtype='float32', always_2d=True)
+                    if not len(data):
+                        break
+                    chunks.append(data)
+                    total += len(data)
+            decoded = np.concatenate(chunks) if chunks else np.zeros((0, 1), dtype=np.float32)
+            span = len(decoded) - block
+            if span <= 0:
+                return False
+            # Punti non allineati ai frame MP3 (il caso peggiore per il calcolo degli scarti)
+            points = [span * (i + 1) // (self.VERIFY_POINTS + 1) + 37 * i for i in range(self.VERIFY_POINTS)]
+            compared = 0
+            for frame in points:
+                expected = decoded[frame:frame + block]
+                if np.abs(expected).max() < 1e-3:
+                    continue
+                decoder, window = self.open_at(path, frame)
+                try:
+                    got = decoder.read(block, dtype='float32', always_2d=True)
+                finally:
+                    decoder.close()
+                    window.close()
+                if got.shape != expected.shape or not np.allclose(got, expected, atol=1e-4):
+                    return False
+                compared += 1
+        except Exception:
+            return False
+        return compared > 0
@@ -0,0 +1,140 @@
+"""
+Stem Recorder - Registrazione multitraccia di canali e bus
+Ogni canale selezionato (pre o post fader) e ogni bus selezionato finisce in
+un file separato. Le tracce vengono alimentate alla fine di ogni ciclo
+dell'engine (ProMixer.render_cycle): un canale che in quel ciclo non ha
+prodotto audio riceve silenzio, così tutti i file restano allineati al
+campione. Un solo thread writer (StreamingRecorder) scrive tutte le tracce.
+
+Ogni sessione ha una cartella con i file e un manifest.json (tracce, sorgenti,
+tap, formato, durata e frame persi).
+"""
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from disk_recorder import StreamingRecorder
+
+
+class StemSession:
+    """Sessione di registrazione multitraccia (una traccia per canale/bus)"""
+
+    MANIFEST_NAME = "manifest.json"
+
+    def __init__(self, session_dir: str, sample_rate: int, channels: Dict[str, str],
+                 buses: List[str], tap: str = 'post', subtype: str = 'PCM_24',
+                 file_format: str = 'wav', quantum: int = 256):
+        """
+        Args:
+            session_dir: Cartella della sessione (creata se non esiste)
+            sample_rate: Sample rate dell'engine
+            channels: {channel_id: nome mostrato} dei canali da registrare
+            buses: Bus da registrare
+            tap: 'pre' (dopo gli effetti, prima di fader/pan) o 'post' fader
+            subtype: 'PCM_16', 'PCM_24' o 'FLOAT' (solo WAV)
+            file_format: 'wav' o 'flac'
+            quantum: Quanto dell'engine (dimensione del blocco di silenzio preallocato)
+        """
+        if tap not in ('pre', 'post'):
+            raise ValueError(f"Tap '{tap}' non valido (ammessi: 'pre', 'post')")
+        self.session_dir = session_dir
+        self.sample_rate = sample_rate
+        self.channel_ids = list(channels)
+        self.bus_ids = list(buses)
+        self.tap = tap
+        self.subtype = subtype
+        self.manifest_path = os.path.join(session_dir, self.MANIFEST_NAME)
+        self._silence = np.zeros((quantum, 2), dtype=np.float32)
+
+        self.recorder = StreamingRecorder(sample_rate)
+        self.tracks = []
+        try:
+            for ch_id, name in channels.items():
+                self._add_track(ch_id, 'channel', name, file_format)
+            for bus_name in buses:
+                self._add_track(bus_name, 'bus', bus_name, file_format)
+        except Exception:
+            self.recorder.stop()
+            raise
+
+        self.started_at = None
+        self.stopped_at = None
+        self.cycles = 0
+
+    def _add_track(self, source: str, kind: str, name: str, file_format: str):
+        path = os.path.join(self.session_dir, f"{kind}_{source}.{file_format}")
+        self.recorder.add_track(source, path, self.subtype)
+        self.tracks.append({
+            'source': source,
+            'kind': kind,
+            'name': name,
+            'tap': self.tap if kind == 'channel' else 'bus',
+            'file': os.path.basename(path),
+        })
+
+    def start(self):
+        self.started_at = time.time()
+        self.recorder.start()
+        self.write_manifest('recording')
+
+    def silence(self, frames: int) -> np.ndarray:
+        if frames > len(self._silence):
+            self._silence = np.zeros((frames, 2), dtype=np.float32)
+        return self._silence[:frames]
+
+    def capture_cycle(self, channels: dict, mixes: Dict[str, np.ndarray], frames: int):
+        """Accoda un ciclo dell'engine su tutte le tracce (thread audio, nessun I/O)
+
+        Args:
+            channels: Canali del mixer (il blocco catturato è in channel.stem_block)
+            mixes: Mix renderizzati in questo ciclo {bus_name: blocco}
+            frames: Frame del ciclo
+        """
+        push = self.recorder.push
+        for ch_id in self.channel_ids:
+            channel = channels.get(ch_id)
+            block = channel.stem_block if channel is not None else None
+            push(ch_id, block if block is not None else self.silence(frames))
+            if channel is not None:
+                channel.stem_block = None
+        for bus_name in self.bus_ids:
+            block = mixes.get(bus_name)
+            push(bus_name, block if block is not None else self.silence(frames))
+        self.cycles += 1
+
+    def stop(self) -> str:
+        """Ferma subito la sessione: il writer completa i file e il manifest in background"""
+        self.stopped_at = time.time()
+        self.recorder.on_complete = lambda: self.write_manifest('complete')
+        self.recorder.stop()
+        return self.manifest_path
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.recorder.wait(timeout)
+
+    def write_manifest(self, status: str):
+        """Scrive il manifest della sessione (all'avvio e alla chiusura dei file)"""
+        stats = self.recorder.get_stats()
+        tracks = []
+        for track in self.tracks:
+            info = dict(track)
+            track_stats = stats.get(track['source'], {})
+            info['seconds'] = round(track_stats.get('seconds_written', 0.0), 3)
+            info['dropped_frames'] = track_stats.get('dropped_frames', 0)
+            tracks.append(info)
+        manifest = {
+            'status': status,
+            'started': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at or time.time())),
+            'duration_sec': round((self.stopped_at or time.time()) - (self.started_at or time.time()), 3),
+            'sample_rate': self.sample_rate,
+            'subtype': self.subtype,
+            'channels': 2,
+            'tracks': tracks,
+        }
+        if self.recorder.error:
+            manifest['error'] = self.recorder.error
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,242 @@
+"""
+Time Stretch - Velocità e pitch del media player in tempo reale
+WSOLA (Waveform Similarity Overlap-Add) a blocchi: frame con finestra di Hann
+al 50% di sovrapposizione; ogni frame viene preso dall'ingresso vicino alla
+posizione nominale (velocità) dove la forma d'onda somiglia di più alla
+continuazione naturale del frame precedente, così non ci sono fasi che si
+cancellano. Il pitch è uno stretch seguito da un ricampionamento (interpolazione
+lineare) che riporta la durata a quella voluta.
+
+Costo per blocco limitato: ogni hop costa una correlazione di dimensione fissa
+(dipende solo dal preset) e per un blocco di 256 frame servono al massimo due hop.
+Tutti i buffer (ingresso, overlap-add, uscita e scratch di correlazione e
+ricampionamento) sono allocati alla scelta del preset per il caso peggiore di
+velocità/pitch: nel thread audio resta solo il piccolo risultato della correlazione.
+"""
+from typing import Callable
+
+import numpy as np
+from scipy import signal
+
+
+def _shift_to_start(buffer: np.ndarray, start: int, end: int):
+    """Sposta buffer[start:end] all'inizio a blocchi non sovrapposti (numpy non alloca
+    la copia temporanea che userebbe per sorgente e destinazione sovrapposte)"""
+    n = end - start
+    pos = 0
+    while pos < n:
+        k = min(start, n - pos)
+        buffer[pos:pos + k] = buffer[start + pos:start + pos + k]
+        pos += k
+
+
+class TimeStretcher:
+    """Time-stretch e pitch shift in streaming (WSOLA + ricampionamento)"""
+
+    # frame_ms: lunghezza del frame WSOLA, search_ms: finestra di ricerca (±),
+    # decimate: passo della correlazione (1 = ricerca al campione)
+    PRESETS = {
+        'fast': {'frame_ms': 30.0, 'search_ms': 5.0, 'decimate': 8},
+        'balanced': {'frame_ms': 40.0, 'search_ms': 10.0, 'decimate': 4},
+        'quality': {'frame_ms': 50.0, 'search_ms': 15.0, 'decimate': 1},
+    }
+    SPEED_RANGE = (0.5, 2.0)
+    PITCH_RANGE = (-12.0, 12.0)  # Semitoni
+
+    def __init__(self, sample_rate: int, preset: str = 'balanced'):
+        self.sample_rate = sample_rate
+        self.speed = 1.0
+        self.pitch_semitones = 0.0
+        self.pitch = 1.0  # Rapporto di frequenza
+        self.hops = 0
+        self.set_preset(preset)
+
+    @property
+    def active(self) -> bool:
+        """False a velocità 1x e pitch 0: l'audio passa senza elaborazione"""
+        return self.speed != 1.0 or self.pitch != 1.0
+
+    def set_preset(self, preset: str):
+        """Qualità/CPU: 'fast', 'balanced' o 'quality' (applicato dal prossimo blocco)"""
+        if preset not in self.PRESETS:
+            raise ValueError(f"Preset '{preset}' non valido (ammessi: {', '.join(self.PRESETS)})")
+        params = self.PRESETS[preset]
+        self.preset = preset
+        frame = int(params['frame_ms'] * self.sample_rate / 1000) // 2 * 2
+        self.frame = frame
+        self.hop = frame // 2
+        self.search = int(params['search_ms'] * self.sample_rate / 1000)
+        self.decimate = params['decimate']
+        # Hann periodica: con sovrapposizione al 50% la somma delle finestre è 1
+        n = np.arange(frame)
+        self.window = (0.5 - 0.5 * np.cos(2 * np.pi * n / frame)).astype(np.float32)[:, None]
+
+        # Buffer preallocati: ingresso, overlap-add, frame con finestra e scratch mono
+        # della correlazione (template e regione di ricerca, decimati)
+        max_analysis_hop = int(self.hop * self.SPEED_RANGE[1] / 2 ** (self.PITCH_RANGE[0] / 12)) + 1
+        self._in = np.zeros((2 * frame + 2 * self.search + 2 * max_analysis_hop + 8, 2), dtype=np.float32)
+        self._ola = np.zeros((frame, 2), dtype=np.float32)
+        self._windowed = np.zeros((frame, 2), dtype=np.float32)
+        self._template = np.zeros(-(-self.hop // self.decimate), dtype=np.float32)
+        self._region = np.zeros(-(-(2 * self.search + self.hop) // self.decimate) + 1, dtype=np.float32)
+        self._stretched_len = 0
+        self._stretched = np.zeros((0, 2), dtype=np.float32)
+        self._allocate_block(4096)
+        self.reset()
+
+    def _allocate_block(self, frames: int):
+        """Uscita dello stretch e scratch del ricampionamento per blocchi fino a `frames`
+
+        Dimensionati per il pitch massimo: nessun cambio di velocità/pitch li fa crescere.
+        """
+        max_pitch = 2.0 ** (self.PITCH_RANGE[1] / 12.0)
+        stretched = np.zeros((int(np.ceil(max_pitch * frames)) + 2 + self.hop, 2), dtype=np.float32)
+        stretched[:self._stretched_len] = self._stretched[:self._stretched_len]
+        self._stretched = stretched
+        self._ramp = np.arange(frames, dtype=np.float64)
+        self._idx = np.zeros(frames, dtype=np.float64)
+        self._i0 = np.zeros(frames, dtype=np.int64)
+        self._frac = np.zeros((frames, 1), dtype=np.float32)
+        self._gain = np.zeros((frames, 1), dtype=np.float32)
+        self._next = np.zeros((frames, 2), dtype=np.float32)
+
+    def set_speed(self, speed: float):
+        was_active = self.active
+        self.speed = float(np.clip(speed, *self.SPEED_RANGE))
+        if not was_active:
+            self.reset()
+
+    def set_pitch(self, semitones: float):
+        was_active = self.active
+        self.pitch_semitones = float(np.clip(semitones, *self.PITCH_RANGE))
+        self.pitch = 2.0 ** (self.pitch_semitones / 12.0)
+        if not was_active:
+            # Da bypass ad attivo: niente residui di una sessione precedente
+            self.reset()
+
+    def reset(self):
+        """Riparte da zero al prossimo blocco (seek, cambio traccia, cambio preset)"""
+        self._reset_pending = True
+
+    def _do_reset(self):
+        self._reset_pending = False
+        # Mezzo frame di silenzio davanti: il primo frame non parte in dissolvenza
+        self._in[:self.hop] = 0.0
+        self._in_len = self.hop
+        self._analysis = 0.0
+        self._natural = -1
+        self._ola[:] = 0.0
+        self._stretched_len = 0
+        self._phase = 0.0
+
+    @property
+    def buffered_input(self) -> int:
+        """Frame di ingresso letti dalla sorgente ma non ancora ascoltati (per la posizione)"""
+        if not self.active or self._reset_pending:
+            return 0
+        rate = self.speed / self.pitch
+        pending = self._in_len - self._analysis + (self._stretched_len + self.hop) * rate
+        return max(0, int(pending))
+
+    def _hop_once(self, rate: float, pull: Callable[[np.ndarray], None]):
+        """Un frame WSOLA: hop di uscita fisso, hop di ingresso = hop * rate"""
+        frame, hop, search = self.frame, self.hop, self.search
+        nominal = int(round(self._analysis))
+
+        # Ingresso necessario per la ricerca attorno alla posizione nominale
+        needed = nominal + search + frame + 1
+        if self._natural >= 0:
+            needed = max(needed, self._natural + frame)
+        if needed > self._in_len:
+            pull(self._in[self._in_len:needed])
+            self._in_len = needed
+
+        if self._natural < 0:
+            chosen = nominal
+        else:
+            # Correlazione (mono, decimata) tra la continuazione naturale del frame
+            # precedente e i candidati attorno alla posizione nominale
+            lo = max(0, nominal - search)
+            hi = nominal + search
+            step = self.decimate
+            source = self._in[self._natural:self._natural + hop:step]
+            template = self._template[:len(source)]
+            np.add(source[:, 0], source[:, 1], out=template)
+            source = self._in[lo:hi + hop:step]
+            region = self._region[:len(source)]
+            np.add(source[:, 0], source[:, 1], out=region)
+            corr = signal.correlate(region, template, mode='valid')
+            chosen = lo + int(np.argmax(corr)) * step
+
+        np.multiply(self._in[chosen:chosen + frame], self.window, out=self._windowed)
+        self._ola += self._windowed
+        end = self._stretched_len + hop
+        self._stretched[self._stretched_len:end] = self._ola[:hop]
+        self._stretched_len = end
+        self._ola[:frame - hop] = self._ola[hop:]
+        self._ola[frame - hop:] = 0.0
+
+        self._natural = chosen + hop
+        self._analysis += hop * rate
+        self.hops += 1
+
+        # Scarta l'ingresso che nessun frame futuro può più usare
+        drop = min(int(self._analysis) - search, self._natural)
+        if drop > frame:
+            keep = self._in_len - drop
+            _shift_to_start(self._in, drop, self._in_len)
+            self._in_len = keep
+            self._analysis -= drop
+            self._natural -= drop
+
+    def process(self, out: np.ndarray, pull: Callable[[np.ndarray], None]):
+        """Riempie `out` con l'audio a velocità/pitch correnti (thread audio)
+
+        Args:
+            out: Blocco di uscita (frames, 2)
+            pull: pull(buffer) riempie `buffer` con i prossimi frame della sorgente
+        """
+        if self._reset_pending:
+            self._do_reset()
+        frames = len(out)
+        if frames > len(self._ramp):
+            # Blocco più grande del previsto: unica allocazione, poi di nuovo a regime
+            self._allocate_block(frames)
+        pitch = self.pitch
+        rate = self.speed / pitch
+
+        # Campioni stirati necessari (+1 per l'interpolazione)
+        needed = int(np.floor(self._phase + pitch * (frames - 1))) + 2 if pitch != 1.0 else frames
+        while self._stretched_len < needed:
+            self._hop_once(rate, pull)
+
+        stretched = self._stretched
+        if pitch == 1.0:
+            out[:] = stretched[:frames]
+            consumed = frames
+        else:
+            # Interpolazione lineare negli scratch preallocati
+            idx = self._idx[:frames]
+            np.multiply(self._ramp[:frames], pitch, out=idx)
+            idx += self._phase
+            i0 = self._i0[:frames]
+            np.copyto(i0, idx, casting='unsafe')  # idx >= 0: troncamento = floor
+            frac = self._frac[:frames]
+            np.subtract(idx, i0, out=frac[:, 0], casting='unsafe')
+            gain = self._gain[:frames]
+            np.subtract(1.0, frac, out=gain)
+            np.take(stretched, i0, axis=0, out=out, mode='clip')
+            out *= gain
+            i0 += 1
+            following = self._next[:frames]
+            np.take(stretched, i0, axis=0, out=following, mode='clip')
+            following *= frac
+            out += following
+            position = self._phase + pitch * frames
+            consumed = int(position)
+            self._phase = position - consumed
+
+        remaining = self._stretched_len - consumed
+        if consumed:
+            _shift_to_start(stretched, consumed, self._stretched_len)
+        self._stretched_len = remaining
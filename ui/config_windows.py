@@ -5,6 +5,8 @@ import customtkinter as ctk
 from tkinter import messagebox
 import json
 
+from device_streams import channel_pairs, channel_pair_label, parse_channel_pair
+
 from .colors import COLORS
 
 
@@ -31,9 +33,11 @@ class MixerConfigWindow(ctk.CTkToplevel):
         # Get devices
         self.devices = pro_mixer.get_available_devices()
         
-        # Dizionari per salvare i dropdown
+        # Dizionari per salvare i dropdown (dispositivo e coppia di canali)
         self.input_dropdowns = {}
         self.output_dropdowns = {}
+        self.input_pair_menus = {}
+        self.output_pair_menus = {}
         
         self.setup_ui()
     
@@ -86,6 +90,11 @@ class MixerConfigWindow(ctk.CTkToplevel):
         for i in range(1, 3):
             self.create_input_config(scroll, f"VIRT{i}", f"Virtual {i}")
         
+        # Canali di input aggiunti dall'utente (ProMixer.add_channel)
+        for channel_id, channel in self.pro_mixer.channels.items():
+            if channel_id not in self.pro_mixer.builtin_strips and channel.channel_type in ('hardware', 'virtual'):
+                self.create_input_config(scroll, channel_id, channel.name)
+        
         # Output Buses
         bus_label = ctk.CTkLabel(
             scroll,
@@ -95,7 +104,7 @@ class MixerConfigWindow(ctk.CTkToplevel):
         )
         bus_label.pack(pady=(20, 5), anchor="w", padx=20)
         
-        for bus_name in ['A1', 'A2', 'A3', 'B1', 'B2']:
+        for bus_name in self.pro_mixer.buses:
             self.create_output_config(scroll, bus_name)
         
         # Close button
@@ -139,6 +148,20 @@ class MixerConfigWindow(ctk.CTkToplevel):
         )
         dropdown.pack(side="right", padx=15, pady=12)
         
+        # Coppia di canali del dispositivo (interfacce multicanale: 1-2, 3-4, ...)
+        pair_menu = ctk.CTkOptionMenu(
+            frame,
+            values=["1-2"],
+            width=80,
+            fg_color=COLORS["bg_secondary"],
+            button_color=COLORS["accent"],
+            button_hover_color=COLORS["accent_hover"],
+            dropdown_fg_color=COLORS["bg_card"],
+            command=lambda val, ch=channel_id: self.assign_input(ch, self.input_dropdowns[ch].get())
+        )
+        pair_menu.pack(side="right", pady=12)
+        self.input_pair_menus[channel_id] = pair_menu
+        
         # Salva riferimento al dropdown
         if not hasattr(self, 'input_dropdowns'):
             self.input_dropdowns = {}
@@ -152,6 +175,9 @@ class MixerConfigWindow(ctk.CTkToplevel):
                 if device.id == device_id and device.input_channels > 0:
                     device_str = f"[{device.id}] {device.name}"
                     dropdown.set(device_str)
+                    first = self.pro_mixer.input_channel_offsets.get(channel_id, 0)
+                    self._refresh_pairs(pair_menu, device_str, True,
+                                        channel_pair_label(first, device.input_channels))
                     print(f"✓ Canale {channel_id} preconfigurato: Device {device_id} ({device.name})")
                     break
     
@@ -185,6 +211,20 @@ class MixerConfigWindow(ctk.CTkToplevel):
         )
         dropdown.pack(side="right", padx=15, pady=12)
         
+        # Coppia di canali di output del dispositivo
+        pair_menu = ctk.CTkOptionMenu(
+            frame,
+            values=["1-2"],
+            width=80,
+            fg_color=COLORS["bg_secondary"],
+            button_color=COLORS["accent"],
+            button_hover_color=COLORS["accent_hover"],
+            dropdown_fg_color=COLORS["bg_card"],
+            command=lambda val, b=bus_name: self.assign_output(b, self.output_dropdowns[b].get())
+        )
+        pair_menu.pack(side="right", pady=12)
+        self.output_pair_menus[bus_name] = pair_menu
+        
         # Salva riferimento al dropdown
         self.output_dropdowns[bus_name] = dropdown
         
@@ -196,26 +236,39 @@ class MixerConfigWindow(ctk.CTkToplevel):
                 if device.id == bus.device_id and device.output_channels > 0:
                     device_str = f"[{device.id}] {device.name}"
                     dropdown.set(device_str)
+                    self._refresh_pairs(pair_menu, device_str, False,
+                                        channel_pair_label(bus.channel_offset, device.output_channels))
                     print(f"✓ Bus {bus_name} preconfigurato: Device {bus.device_id} ({device.name})")
                     break
     
+    def _refresh_pairs(self, pair_menu, device_str, is_input, selected=None):
+        """Aggiorna le coppie di canali disponibili per il dispositivo scelto
+        
+        Returns:
+            Primo canale (0-based) della coppia selezionata
+        """
+        try:
+            device_id = int(device_str.split("]")[0].replace("[", ""))
+        except ValueError:
+            return 0
+        device = next((d for d in self.devices if d.id == device_id), None)
+        count = 2
+        if device is not None:
+            count = device.input_channels if is_input else device.output_channels
+        values = [channel_pair_label(first, count) for first in channel_pairs(count)] or ["1-2"]
+        pair_menu.configure(values=values)
+        current = selected or pair_menu.get()
+        pair_menu.set(current if current in values else values[0])
+        return parse_channel_pair(pair_menu.get())
+    
     def assign_input(self, channel_id, device_str):
         """Assegna device a input"""
         if device_str == "None":
             print(f"⚠️ Rimozione dispositivo da {channel_id}")
             
             try:
-                # Ferma l'input stream se attivo
-                if channel_id in self.pro_mixer.input_streams:
-                    stream = self.pro_mixer.input_streams[channel_id]
-                    if stream:
-                        stream.stop()
-                        stream.close()
-                    del self.pro_mixer.input_streams[channel_id]
-                
-                # Rimuovi dalla mappa dispositivi
-                if channel_id in self.pro_mixer.input_device_map:
-                    del self.pro_mixer.input_device_map[channel_id]
+                # Stacca il canale dallo stream del dispositivo e dalla mappa dispositivi
+                self.pro_mixer.stop_input(channel_id)
                 
                 # Resetta nome canale
                 if channel_id in self.pro_mixer.channels:
@@ -243,10 +296,12 @@ class MixerConfigWindow(ctk.CTkToplevel):
         try:
             # Estrai ID
             device_id = int(device_str.split("]")[0].replace("[", ""))
-            print(f"🎤 Configurazione {channel_id} con device {device_id}...")
+            first_channel = self._refresh_pairs(self.input_pair_menus[channel_id], device_str, True)
+            print(f"🎤 Configurazione {channel_id} con device {device_id} "
+                  f"(canali {self.input_pair_menus[channel_id].get()})...")
             
-            # Avvia input
-            success = self.pro_mixer.start_input(channel_id, device_id)
+            # Avvia input (stream condiviso con gli altri canali/bus dello stesso dispositivo)
+            success = self.pro_mixer.start_input(channel_id, device_id, first_channel=first_channel)
             
             if success:
                 print(f"   ✓ Input {channel_id} avviato con successo")
@@ -303,9 +358,7 @@ class MixerConfigWindow(ctk.CTkToplevel):
                 if bus_name in self.pro_mixer.buses:
                     bus = self.pro_mixer.buses[bus_name]
                     if bus.stream:
-                        bus.stream.stop()
-                        bus.stream.close()
-                        bus.stream = None
+                        self.pro_mixer.stop_output(bus_name)
                     bus.device_id = None
                     
                     # Aggiorna UI se esiste
@@ -343,9 +396,10 @@ class MixerConfigWindow(ctk.CTkToplevel):
         try:
             # Estrai ID
             device_id = int(device_str.split("]")[0].replace("[", ""))
+            first_channel = self._refresh_pairs(self.output_pair_menus[bus_name], device_str, False)
             
             # Assegna
-            self.pro_mixer.set_bus_device(bus_name, device_id)
+            self.pro_mixer.set_bus_device(bus_name, device_id, first_channel=first_channel)
             
             # Aggiorna label nella UI
             if bus_name in self.bus_strips:
@@ -379,7 +433,8 @@ class MixerConfigWindow(ctk.CTkToplevel):
             # Salva configurazione
             self.parent.save_config()
             
-            msg = f"Bus {bus_name} → Device {device_id}\n\nRicorda di avviare il mixer!"
+            msg = (f"Bus {bus_name} → Device {device_id} (canali {self.output_pair_menus[bus_name].get()})"
+                   f"\n\nRicorda di avviare il mixer!")
             if bus_name in ['A1', 'A2']:
                 msg += f"\n\n🎯 Soundboard sincronizzata automaticamente!"
             
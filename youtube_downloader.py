@@ -14,6 +14,8 @@ import time
 import subprocess
 import shutil
 
+from seek_index import relocate_index, remove_index
+
 try:
     import yt_dlp
     YT_DLP_AVAILABLE = True
@@ -759,6 +761,7 @@ class YouTubeDownloader:
         """Mostra menu contestuale cartella"""
         menu = Menu(self.parent, tearoff=0)
         menu.add_command(label="📂 Apri", command=lambda: self._navigate_into(folder_path))
+        menu.add_command(label="▶️ Riproduci come playlist", command=lambda: self.parent.play_media_folder(folder_path))
         menu.add_command(label="📂 Apri in Esplora File", command=lambda: self._open_in_explorer(folder_path))
         menu.add_separator()
         menu.add_command(label="✏️ Rinomina", command=lambda: self._rename_item(folder_path, folder_name, is_folder=True))
@@ -771,6 +774,7 @@ class YouTubeDownloader:
         """Mostra menu contestuale file"""
         menu = Menu(self.parent, tearoff=0)
         menu.add_command(label="▶️ Carica", command=lambda: self._load_from_library(file_path, file_name))
+        menu.add_command(label="➕ Aggiungi alla coda", command=lambda: self.parent.enqueue_media(file_path))
         menu.add_command(label="📂 Apri in Esplora File", command=lambda: self._open_in_explorer(os.path.dirname(file_path)))
         menu.add_separator()
         menu.add_command(label="📋 Sposta in...", command=lambda: self._move_file(file_path, file_name))
@@ -804,6 +808,8 @@ class YouTubeDownloader:
             new_path = os.path.join(os.path.dirname(old_path), new_name)
             try:
                 os.rename(old_path, new_path)
+                if not is_folder:
+                    relocate_index(old_path, new_path)  # Seek index accanto al file
                 messagebox.showinfo("✓ Successo", f"Rinominato in '{new_name}'")
                 self._load_youtube_library()
                 self._update_library_ui()
@@ -820,6 +826,7 @@ class YouTubeDownloader:
             dest_path = os.path.join(dest_folder, file_name)
             try:
                 shutil.move(file_path, dest_path)
+                relocate_index(file_path, dest_path)
                 messagebox.showinfo("✓ Successo", f"File spostato in {dest_folder}")
                 self._load_youtube_library()
                 self._update_library_ui()
@@ -1013,6 +1020,7 @@ class YouTubeDownloader:
                 if os.path.dirname(src_path) != self.drop_target and src_path != self.drop_target:
                     try:
                         shutil.move(src_path, dest_path)
+                        relocate_index(src_path, dest_path)
                         print(f"✓ '{src_name}' spostato in '{os.path.basename(self.drop_target)}'")
                         messagebox.showinfo("✓ Drag&Drop", f"'{src_name}' spostato in '{os.path.basename(self.drop_target)}'!")
                         self._load_youtube_library()
@@ -1083,6 +1091,7 @@ class YouTubeDownloader:
         if messagebox.askyesno("Conferma", f"Eliminare il file?\n\n{os.path.basename(file_path)}"):
             try:
                 os.remove(file_path)
+                remove_index(file_path)
                 self._refresh_library()
                 messagebox.showinfo("✓ Eliminato", "File eliminato dalla libreria")
             except Exception as e: